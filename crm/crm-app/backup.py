@@ -0,0 +1,323 @@
+# backup.py
+"""
+Backups of a contacts database while it is in use.
+
+Copying contacts.db with cp while the app writes to it can give a torn file
+(and misses whatever is still in contacts.db-wal). Everything here goes
+through SQLite's online backup API instead, on any connection from
+connect_db() or the pool, CHUNK_PAGES pages per step with a short sleep in
+between, so a multi-GB file is copied without the app noticing.
+
+The copy is taken inside one read transaction on the source. With WAL that
+snapshot stays fixed while the app and other tools keep committing, so the
+backup never restarts and never blocks them; the result is the database
+exactly as it was when the backup began.
+
+    python3 backup.py copy contacts-backup.db       # one plain copy
+    python3 backup.py snapshot backups/             # compressed, incremental
+    python3 backup.py list backups/
+    python3 backup.py restore backups/ --at "2026-10-01 18:00"
+    python3 backup.py restore contacts-backup.db
+    python3 backup.py prune backups/ --keep 30
+
+Snapshots are content-addressed: the copied file is cut into CHUNK_SIZE
+pieces, each stored once, zlib-compressed, under objects/ by its SHA-256,
+and a manifest in snapshots/ lists the pieces of that snapshot. SQLite
+updates pages in place, so a snapshot after a day of edits adds only the
+chunks that changed. Restoring checks every chunk and the whole file
+against their hashes and runs PRAGMA quick_check before copying the
+snapshot over the database, again with the backup API, so programs that
+have it open see the restored data on their next query.
+"""
+
+import argparse, hashlib, json, os, sqlite3, sys, tempfile, time, zlib
+from datetime import datetime
+from pathlib import Path
+
+from db import connect_db, canonical_timestamp, now_str, BUSY_TIMEOUT, DB_PATH
+
+CHUNK_PAGES = 1024          # pages copied per backup step (4 MiB at the default page size)
+PAUSE = 0.005               # seconds between steps, so the app's queries get the disk in between
+CHUNK_SIZE = 1 << 16        # bytes per snapshot chunk: 16 pages; an edit rewrites a few pages all over the file
+LEVEL = 6                   # zlib compression level for snapshot chunks
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def copy_database(conn, dest, progress=None, cancel=None, pages=CHUNK_PAGES, pause=PAUSE):
+    """
+    Copy the database open on `conn` to the file `dest`, replacing it only
+    once the copy is complete. `conn` must not be in a transaction.
+        - progress(fraction, text) is called after each step
+        - cancel: optional threading.Event; raises BackupCancelled once set
+    Returns the size of the copy in bytes.
+    """
+    if conn.in_transaction:
+        raise ValueError("the connection has an open transaction")
+    part = f"{dest}.part"
+    if os.path.exists(part):
+        os.remove(part)
+    target = sqlite3.connect(part)
+    done = False
+
+    def step(status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled()
+        if progress:
+            progress((total - remaining) / (total or 1), f"{total - remaining:,} of {total:,} pages")
+
+    try:
+        # one read transaction for the whole copy: a fixed snapshot, however long it takes
+        conn.execute("BEGIN")
+        try:
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            conn.backup(target, pages=pages, progress=step, sleep=pause)
+        finally:
+            conn.rollback()
+        # a self-contained file: no -wal next to it when it is opened
+        target.execute("PRAGMA journal_mode=DELETE")
+        done = True
+    finally:
+        target.close()
+        if not done:
+            os.remove(part)
+    os.replace(part, dest)
+    return os.path.getsize(dest)
+
+
+# ---- Snapshots ----
+def _object_path(directory, digest):
+    return Path(directory, "objects", digest[:2], digest[2:])
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(path.name + ".part")
+    part.write_bytes(data)
+    os.replace(part, path)
+
+def take_snapshot(conn, directory, progress=None, cancel=None, pages=CHUNK_PAGES, pause=PAUSE):
+    """
+    Copy the database open on `conn` into the snapshot store `directory`
+    (created if needed), keeping only chunks it doesn't hold yet. Progress
+    and cancel as for copy_database(); the copy is the first 80 %.
+    Returns the manifest: name, created, size, sha256, chunks, new_chunks, new_bytes.
+    """
+    directory = Path(directory)
+    (directory / "snapshots").mkdir(parents=True, exist_ok=True)
+    created = now_str()
+    # a name of its own, so two snapshots into one directory don't share a file
+    fd, part = tempfile.mkstemp(suffix=".db", dir=directory)
+    os.close(fd)
+    report = (lambda f, text: progress(f * 0.8, "Copying: " + text)) if progress else None
+    try:
+        size = copy_database(conn, part, report, cancel, pages, pause)
+        whole = hashlib.sha256()
+        chunks, new_chunks, new_bytes = [], 0, 0
+        with open(part, "rb") as f:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise BackupCancelled()
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                whole.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                path = _object_path(directory, digest)
+                if not path.exists():
+                    packed = zlib.compress(data, LEVEL)
+                    _write_atomic(path, packed)
+                    new_chunks += 1
+                    new_bytes += len(packed)
+                chunks.append(digest)
+                if progress:
+                    progress(0.8 + 0.2 * f.tell() / (size or 1), f"Storing: {len(chunks):,} chunks")
+    finally:
+        os.remove(part)
+
+    name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    n = 1
+    while (directory / "snapshots" / f"{name}.json").exists():
+        n += 1
+        name = datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{n}"
+    manifest = {"name": name, "created": created, "size": size, "sha256": whole.hexdigest(),
+                "chunk_size": CHUNK_SIZE, "chunks": chunks, "new_chunks": new_chunks, "new_bytes": new_bytes}
+    _write_atomic(directory / "snapshots" / f"{name}.json", json.dumps(manifest, indent=1).encode())
+    return manifest
+
+def list_snapshots(directory):
+    """Manifests of the snapshots in `directory`, oldest first."""
+    manifests = []
+    for path in Path(directory, "snapshots").glob("*.json"):
+        with open(path, encoding="utf-8") as f:
+            manifests.append(json.load(f))
+    manifests.sort(key=lambda m: (m["created"], m["name"]))
+    return manifests
+
+def find_snapshot(directory, name=None, at=None):
+    """The snapshot called `name`, else the latest taken at or before `at`, else the latest; None if none."""
+    manifests = list_snapshots(directory)
+    if name:
+        return next((m for m in manifests if m["name"] == name), None)
+    if at:
+        at = canonical_timestamp(at)
+        manifests = [m for m in manifests if m["created"] <= at]
+    return manifests[-1] if manifests else None
+
+def _assemble(directory, manifest, dest, progress=None):
+    # the snapshot's file, each chunk and the whole checked against their hashes
+    whole = hashlib.sha256()
+    with open(dest, "wb") as out:
+        for i, digest in enumerate(manifest["chunks"], 1):
+            data = zlib.decompress(_object_path(directory, digest).read_bytes())
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"snapshot {manifest['name']}: chunk {digest} is damaged")
+            whole.update(data)
+            out.write(data)
+            if progress:
+                progress(0.3 * i / len(manifest["chunks"]), f"Unpacking: {i:,} of {len(manifest['chunks']):,} chunks")
+    if whole.hexdigest() != manifest["sha256"]:
+        raise ValueError(f"snapshot {manifest['name']} does not match its checksum")
+
+def restore(source, target=None, name=None, at=None, progress=None, pages=CHUNK_PAGES):
+    """
+    Replace the contents of the database `target` (default: contacts.db)
+    with `source`: a database file, or a snapshot directory (the snapshot
+    called `name`, else the latest at or before `at`, else the latest).
+    The source must pass PRAGMA quick_check first. Programs with the target
+    open see the restored data once it is done; their writes wait until
+    then, so there is no pause between steps. Returns the manifest, or None
+    for a file.
+    """
+    target = target or DB_PATH
+    manifest, unpacked = None, None
+    if os.path.isdir(source):
+        manifest = find_snapshot(source, name, at)
+        if manifest is None:
+            raise ValueError(f"no matching snapshot in {source}")
+        unpacked = f"{target}.restore"
+        try:
+            _assemble(source, manifest, unpacked, progress)
+        except BaseException:
+            os.remove(unpacked)
+            raise
+        source = unpacked
+    try:
+        src = sqlite3.connect(Path(os.path.abspath(source)).as_uri() + "?mode=ro", uri=True)
+        try:
+            problem = src.execute("PRAGMA quick_check").fetchone()[0]
+            if problem != "ok":
+                raise ValueError(f"{source} is damaged: {problem}")
+            dst = sqlite3.connect(target, timeout=BUSY_TIMEOUT)
+            try:
+                offset = 0.3 if unpacked else 0.0
+
+                def step(status, remaining, total):
+                    if progress:
+                        progress(offset + (1 - offset) * (total - remaining) / (total or 1),
+                                 f"Restoring: {total - remaining:,} of {total:,} pages")
+                src.backup(dst, pages=pages, progress=step, sleep=0)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    finally:
+        if unpacked:
+            os.remove(unpacked)
+    # an older snapshot is brought up to the current schema
+    conn, _ = connect_db(target)
+    conn.close()
+    return manifest
+
+def prune(directory, keep):
+    """Keep the newest `keep` snapshots; remove the others and the chunks only they used.
+    Returns (snapshots removed, chunks removed, bytes freed)."""
+    directory = Path(directory)
+    manifests = list_snapshots(directory)
+    old, kept = manifests[:max(0, len(manifests) - keep)], manifests[max(0, len(manifests) - keep):]
+    for m in old:
+        (directory / "snapshots" / f"{m['name']}.json").unlink()
+    used = {digest for m in kept for digest in m["chunks"]}
+    chunks = freed = 0
+    for path in (directory / "objects").glob("*/*"):
+        if path.parent.name + path.name not in used:
+            freed += path.stat().st_size
+            path.unlink()
+            chunks += 1
+    return len(old), chunks, freed
+
+
+def _size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Back up, snapshot and restore a contacts database while it is in use.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    copy = sub.add_parser("copy", help="copy the database to one plain file")
+    copy.add_argument("dest")
+    snap = sub.add_parser("snapshot", help="add a compressed, incremental snapshot to a directory")
+    snap.add_argument("directory")
+    snap.add_argument("--keep", type=int, help="then keep only the newest KEEP snapshots")
+    p = sub.add_parser("list", help="the snapshots in a directory")
+    p.add_argument("directory")
+    rest = sub.add_parser("restore", help="replace the database with a backup file or a snapshot")
+    rest.add_argument("source", help="a file from `copy`, or a snapshot directory")
+    rest.add_argument("--snapshot", help="the snapshot's name (default: the latest)")
+    rest.add_argument("--at", help="the latest snapshot taken at or before this time")
+    p = sub.add_parser("prune", help="remove old snapshots and the chunks only they use")
+    p.add_argument("directory")
+    p.add_argument("--keep", type=int, required=True)
+    for p in (copy, snap, rest):
+        p.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    for p in (copy, snap):
+        p.add_argument("--pause", type=float, default=PAUSE,
+                       help=f"seconds between steps of {CHUNK_PAGES} pages (default {PAUSE})")
+    args = ap.parse_args(argv)
+
+    def report(fraction, text):
+        print(f"\r{int(fraction * 100):3d}%  {text:<50}", end="", file=sys.stderr, flush=True)
+
+    t = time.perf_counter()
+    if args.command in ("copy", "snapshot"):
+        if args.db and not os.path.exists(args.db):
+            ap.error(f"no such database: {args.db}")
+        conn, _ = connect_db(args.db, readonly=True)
+        try:
+            if args.command == "copy":
+                size = copy_database(conn, args.dest, report, pause=args.pause)
+                print(f"\n{_size(size)} copied to {args.dest} in {time.perf_counter() - t:.1f} s", file=sys.stderr)
+            else:
+                m = take_snapshot(conn, args.directory, report, pause=args.pause)
+                print(f"\nsnapshot {m['name']}: {_size(m['size'])}, {m['new_chunks']:,} new chunks "
+                      f"({_size(m['new_bytes'])} stored), {time.perf_counter() - t:.1f} s", file=sys.stderr)
+        finally:
+            conn.close()
+        if args.command == "snapshot" and args.keep:
+            removed, chunks, freed = prune(args.directory, args.keep)
+            print(f"{removed:,} old snapshots removed, {_size(freed)} freed", file=sys.stderr)
+    elif args.command == "list":
+        for m in list_snapshots(args.directory):
+            print(f"{m['name']:<20} {m['created']}  {_size(m['size']):>10}  +{_size(m['new_bytes'])}")
+    elif args.command == "restore":
+        if not os.path.exists(args.source):
+            ap.error(f"no such backup: {args.source}")
+        try:
+            m = restore(args.source, args.db, args.snapshot, args.at, report)
+        except ValueError as e:
+            print(f"\n{e}", file=sys.stderr)
+            return 1
+        print(f"\nrestored {'snapshot ' + m['name'] if m else args.source} in {time.perf_counter() - t:.1f} s",
+              file=sys.stderr)
+    else:
+        removed, chunks, freed = prune(args.directory, args.keep)
+        print(f"{removed:,} snapshots and {chunks:,} chunks removed, {_size(freed)} freed", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# bench_indexes.py
+"""
+Filter latency before and after the contact indexes (schema migration 3).
+
+    python3 bench_indexes.py                                 # 10k, 100k, 1M rows
+    python3 bench_indexes.py --sizes 10000,100000 --json out.json
+
+Each size builds a database at schema version 1 (tables only) from
+benchmark.py's synthetic contacts, times the filters, runs the remaining
+migrations in place, and times them again.
+"""
+
+import argparse, json, os, sqlite3, statistics, tempfile, time
+
+import db
+from benchmark import synthetic_contacts
+
+
+def make_contacts_db(path, n, version=None, batch=50_000):
+    """
+    A new database at `path` with n synthetic contacts, loaded at schema
+    version 1 (no search index or secondary indexes); the remaining
+    migrations then run up to `version` (default: latest).
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    db.migrate(conn, cursor, target=1)
+    rows = synthetic_contacts(n)
+    while True:
+        chunk = [r for _, r in zip(range(batch), rows)]
+        if not chunk:
+            break
+        cursor.executemany("""
+            INSERT INTO contacts (name, email, phone, website, status, notes, date_added, date_called, date_emailed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, chunk)
+        conn.commit()
+    db.migrate(conn, cursor, target=db.SCHEMA_VERSION if version is None else version)
+    return conn, cursor
+
+
+def _queries(cursor):
+    return {
+        "status, newest 50": lambda: cursor.execute(
+            "SELECT id FROM contacts WHERE status=? ORDER BY date_added DESC LIMIT 50",
+            ("Called",)).fetchall(),
+        "count by status": lambda: cursor.execute(
+            "SELECT COUNT(*) FROM contacts WHERE status=?", ("Emailed",)).fetchone(),
+        "email lookup": lambda: db.find_contact_by_email(cursor, "nobody@example.com"),
+        "called in 30 days": lambda: cursor.execute(
+            "SELECT COUNT(*) FROM contacts WHERE date_called >= ? AND date_called < ?",
+            ("2024-03-01", "2024-03-31")).fetchone(),
+        "emailed in 30 days": lambda: cursor.execute(
+            "SELECT COUNT(*) FROM contacts WHERE date_emailed >= ? AND date_emailed < ?",
+            ("2024-03-01", "2024-03-31")).fetchone(),
+    }
+
+
+def _time_ms(fn, repeat):
+    fn()  # warm the page cache
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(sizes, repeat=5, workdir=None):
+    results = []
+    workdir = workdir or tempfile.mkdtemp(prefix="minicrm-bench-")
+    for n in sizes:
+        path = os.path.join(workdir, f"contacts-{n}.db")
+        conn, cursor = make_contacts_db(path, n, version=1)
+        before = {name: _time_ms(q, repeat) for name, q in _queries(cursor).items()}
+        t0 = time.perf_counter()
+        db.migrate(conn, cursor)
+        migrate_s = time.perf_counter() - t0
+        after = {name: _time_ms(q, repeat) for name, q in _queries(cursor).items()}
+        for name in before:
+            results.append({"rows": n, "query": name,
+                            "before_ms": round(before[name], 3), "after_ms": round(after[name], 3)})
+        print(f"\n{n:,} rows (migrations took {migrate_s:.1f}s)")
+        print(f"  {'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float("inf")
+            print(f"  {name:<22}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.0f}x")
+        conn.close()
+        os.remove(path)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+    results = run([int(s) for s in args.sizes.split(",")], args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
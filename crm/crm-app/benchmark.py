@@ -0,0 +1,433 @@
+# benchmark.py
+"""
+Reproducible benchmarks for the database and template hot paths.
+
+    python3 benchmark.py                              # 1k, 100k and 1M contacts
+    python3 benchmark.py --sizes 1k,100k -o results.json
+    python3 benchmark.py --check benchmark_thresholds.json --baseline old.json
+
+Synthetic databases (fixed random seed, so every run sees the same data) are
+built once per size and kept in --data-dir. Each benchmark times single calls
+and reports the median, 95th percentile and minimum in milliseconds:
+
+    get_all_contacts, get_contact_by_id, insert/update/delete_contact,
+    TemplateManager.list/get, template compile and render (open_action),
+    the keyset page and count queries, a contact's interaction timeline
+    (get_timeline), the dashboard summaries (dashboard.load, 90 days),
+    ContactRepository and ContactStore, dedupe.find_duplicates,
+    backup.copy_database, the HTTP API (server.py: a contact, the same
+    one again with If-None-Match, a page of the list), and the Treeview: VirtualTree refresh
+    (load_contacts) and scrolling, plus inserting every row into a plain
+    Treeview for comparison;
+    app startup: `crm.py --startup-time` run in a fresh process, from process
+    start to the window on screen and to the first page of contacts.
+
+The Treeview and startup benchmarks need a display. Without $DISPLAY, an Xvfb virtual
+display is started if Xvfb is installed; otherwise they are skipped.
+
+Results are JSON. --check compares each median with the limits in a
+thresholds file ({"name": {"1k": ms, ...}}); --baseline compares with an
+earlier results file and flags anything more than --tolerance slower. Either
+makes the exit status 1 on a regression.
+"""
+
+import argparse, asyncio, http.client, json, os, platform, random, shutil, sqlite3, statistics, subprocess, sys
+import tempfile, threading, time
+
+import dashboard, db
+from db import connect_db, insert_contacts_many, now_str
+from templates import TemplateManager
+from template_engine import CompiledTemplate
+from contact_repository import ContactRepository
+from contact_store import ContactStore
+from dedupe import find_duplicates
+from backup import copy_database
+from server import APIServer
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DEFAULT_SIZES = "1k,100k,1M"
+SEED = 1
+STATUSES = ("Not Contacted", "Called", "Emailed", "Called and Emailed")
+FIRST = ("Ada", "Grace", "Alan", "Edsger", "Barbara", "Donald", "Ken", "Margaret", "Linus", "Guido",
+         "Frances", "John", "Radia", "Tim", "Sophie", "Dennis", "Niklaus", "Leslie", "Shafi", "Whitfield")
+LAST = ("Lovelace", "Hopper", "Turing", "Dijkstra", "Liskov", "Knuth", "Thompson", "Hamilton", "Torvalds",
+        "van Rossum", "Allen", "McCarthy", "Perlman", "Berners-Lee", "Wilson", "Ritchie", "Wirth", "Lamport")
+TEMPLATE_NAME = "Benchmark"
+TEMPLATE = ("Follow-up {{first_name|there}}",
+            "Hi {{first_name|there}},\n\nThanks for talking with us on {{date_called|the phone}}. "
+            "We have {{email}} and {{phone|no number}} on file for {{name}} - reply if that changed.\n\nBest,\nMiniCRM")
+
+
+def parse_size(text):
+    return SIZES[text] if text in SIZES else int(text)
+
+
+# ---- synthetic data ----
+def synthetic_contacts(n, seed=SEED):
+    """n contact tuples in insert_contact() order, the same for a given seed."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        status = rnd.choice(STATUSES)
+        day = f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        yield (f"{first} {last}", f"{first.lower()}.{last.lower().replace(' ', '')}.{i}@example.com",
+               f"+1 555 {rnd.randint(0, 9999999):07d}", f"https://{last.lower().replace(' ', '')}{i}.example.org",
+               status, "Met at a conference. " * rnd.randint(0, 3), f"{day} {rnd.randint(8, 18):02d}:00:00",
+               day if "Called" in status else None, day if "Emailed" in status else None)
+
+
+def build_database(path, n, batch=50_000):
+    """Create `path` with n synthetic contacts and one template (reused if it already has them)."""
+    if os.path.exists(path):
+        conn, cursor = connect_db(path)
+        try:
+            if db.count_contacts(cursor) == n:
+                return
+        finally:
+            conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    conn, cursor = connect_db(path)
+    try:
+        rows = synthetic_contacts(n)
+        while True:
+            chunk = [r for _, r in zip(range(batch), rows)]
+            if not chunk:
+                break
+            insert_contacts_many(cursor, conn, chunk)
+        TemplateManager(conn, cursor).create(TEMPLATE_NAME, *TEMPLATE)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ---- timing ----
+def measure(fn, repeat, setup=None):
+    """Call fn() `repeat` times; returns the durations in milliseconds (setup() runs untimed first)."""
+    times = []
+    clock = time.perf_counter_ns
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        t = clock()
+        fn(*args)
+        times.append((clock() - t) / 1e6)
+    return times
+
+
+def summarize(name, size, times):
+    times = sorted(times)
+    return {"name": name, "size": size, "runs": len(times),
+            "median_ms": round(statistics.median(times), 4),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+            "min_ms": round(times[0], 4)}
+
+
+def run_database(path, size, n, quick=False):
+    """The db.py / TemplateManager / engine benchmarks for one database."""
+    conn, cursor = connect_db(path)
+    results = []
+    reps = 20 if quick else 200
+
+    def bench(name, fn, repeat=reps, setup=None):
+        results.append(summarize(name, size, measure(fn, repeat, setup)))
+        print(f"  {name:<28} {results[-1]['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    try:
+        rnd = random.Random(SEED)
+        ids = [rnd.randint(1, n) for _ in range(reps)]
+        tm = TemplateManager(conn, cursor)
+        tid = next(t[0] for t in tm.list() if t[1] == TEMPLATE_NAME)
+
+        bench("get_all_contacts", lambda: db.get_all_contacts(cursor), repeat=3 if n >= 100_000 else 10)
+        bench("count_contacts", lambda: db.count_contacts(cursor), repeat=20)
+        bench("get_contacts_page", lambda: db.get_contacts_page(cursor, None, 50))
+        bench("get_contacts_page_jump", lambda i: db.get_contacts_page(cursor, db.get_contact_id_at(cursor, i), 50),
+              setup=lambda i: (rnd.randrange(n),))
+        bench("get_contact_by_id", lambda cid: db.get_contact_by_id(cursor, cid), setup=lambda i: (ids[i],))
+        bench("get_timeline", lambda cid: db.get_timeline(cursor, cid, None, 50), setup=lambda i: (ids[i],))
+        bench("dashboard_load", lambda: dashboard.load(cursor, 90), repeat=reps // 4)
+        bench("search_contacts_page", lambda: db.search_contacts_page(cursor, "hopper", None, 50), repeat=reps // 4)
+
+        # writes: insert a batch of contacts, update them, then delete them again,
+        # so the database is back where it started
+        stamp = now_str()
+        new = [(f"Bench {i}", f"bench.{i}@example.net", "", "", "Not Contacted", "", stamp, None, None)
+               for i in range(reps)]
+        added = []
+        bench("insert_contact", lambda row: added.append(db.insert_contact(cursor, conn, row)),
+              setup=lambda i: (new[i],))
+        bench("update_contact", lambda cid: db.update_contact(
+                  cursor, conn, ("Bench", f"bench.{cid}@example.net", "", "", "Called", "", stamp[:10], None, cid)),
+              setup=lambda i: (added[i],))
+        bench("delete_contact", lambda cid: db.delete_contact(cursor, conn, cid), setup=lambda i: (added[i],))
+
+        bench("templates_list", tm.list)
+        bench("templates_get", lambda: tm.get(tid))
+        row = tm.get(tid)
+        bench("template_compile", lambda: CompiledTemplate(*row))
+        compiled = CompiledTemplate(*row)
+        recs = [db.get_contact_by_id(cursor, cid) for cid in ids]
+        bench("render_contact", lambda rec: compiled.render_contact(rec), setup=lambda i: (recs[i],))
+
+        repo = ContactRepository(conn, cursor)
+        bench("repository_get", lambda cid: repo.get(cid), setup=lambda i: (ids[i],))
+        bench("repository_cached", lambda cid: repo.cached(cid), setup=lambda i: (ids[i],))
+
+        bench("store_load", lambda: ContactStore.load(cursor), repeat=3)
+        # first sort of a column on a freshly loaded store, then re-sorts and filters reuse it
+        bench("store_sort_name", lambda store: store.view("name", False), repeat=3,
+              setup=lambda i: (ContactStore.load(cursor),))
+        store = ContactStore.load(cursor)
+        store.view("name", False)
+        bench("store_view_status", lambda: store.view("name", True, "Called"), repeat=10)
+
+        bench("dedupe_find", lambda: find_duplicates(path), repeat=1 if n >= 100_000 else 3)
+
+        # online backup of the whole file, without the pause between steps
+        with tempfile.TemporaryDirectory() as tmp:
+            bench("backup_copy", lambda: copy_database(conn, os.path.join(tmp, "copy.db"), pause=0), repeat=3)
+    finally:
+        conn.close()
+    return results
+
+
+# ---- HTTP API ----
+def run_server(path, size, n, quick=False):
+    """server.py on `path` with its event loop in a thread; one keep-alive client times requests."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    api = APIServer(path)
+    host, port = asyncio.run_coroutine_threadsafe(api.start("127.0.0.1", 0), loop).result()
+    client = http.client.HTTPConnection(host, port)
+    results = []
+    reps = 100 if quick else 1000
+
+    def get(url, headers={}):
+        client.request("GET", url, headers=headers)
+        response = client.getresponse()
+        response.read()
+        return response
+
+    def bench(name, fn, setup):
+        results.append(summarize(name, size, measure(fn, reps, setup)))
+        print(f"  {name:<28} {results[-1]['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    try:
+        rnd = random.Random(SEED)
+        bench("server_get_contact", get, setup=lambda i: (f"/contacts/{rnd.randint(1, n)}",))
+        etag = get("/contacts/1").getheader("ETag")
+        bench("server_get_contact_304", get, setup=lambda i: ("/contacts/1", {"If-None-Match": etag}))
+        bench("server_list_page", get, setup=lambda i: (f"/contacts?limit=50&before={rnd.randint(51, n)}",))
+    finally:
+        client.close()
+        asyncio.run_coroutine_threadsafe(api.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    return results
+
+
+# ---- Treeview (needs a display) ----
+class VirtualDisplay:
+    """Use $DISPLAY, else start Xvfb on a free display number; .available says whether Tk can open."""
+    def __init__(self):
+        self.proc = None
+        self.available = bool(os.environ.get("DISPLAY"))
+        if self.available or not shutil.which("Xvfb"):
+            return
+        for num in range(99, 120):
+            if os.path.exists(f"/tmp/.X{num}-lock"):
+                continue
+            self.proc = subprocess.Popen(["Xvfb", f":{num}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for _ in range(50):
+                if os.path.exists(f"/tmp/.X11-unix/X{num}"):
+                    os.environ["DISPLAY"] = f":{num}"
+                    self.available = True
+                    return
+                time.sleep(0.1)
+            self.close()
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            self.proc.wait()
+            self.proc = None
+
+
+def run_treeview(path, size, n, quick=False, full_limit=100_000):
+    import tkinter as tk
+    from tkinter import ttk
+    from gui.virtual_tree import VirtualTree, KeysetSource
+
+    results = []
+    reps = 10 if quick else 50
+
+    def bench(name, fn, repeat=reps, setup=None):
+        results.append(summarize(name, size, measure(fn, repeat, setup)))
+        print(f"  {name:<28} {results[-1]['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    conn, cursor = connect_db(path)
+    root = tk.Tk()
+    try:
+        columns = ("ID", "Name", "Email", "Phone", "Website", "Status",
+                   "Date Added", "Date Called", "Date Emailed", "Action")
+        tree = ttk.Treeview(root, columns=columns, show="headings", height=14)
+        vsb = ttk.Scrollbar(root, orient="vertical")
+        tree.pack()
+        table = VirtualTree(tree, vsb)
+        # queries inline (no executor), so the time covers SQL plus Treeview work
+        table.source = KeysetSource(
+            count=lambda: db.count_contacts(cursor),
+            page_below=lambda before, limit: db.get_contacts_page(cursor, before, limit),
+            page_above=lambda after, limit: db.get_contacts_page_above(cursor, after, limit),
+            key_at=lambda offset: db.get_contact_id_at(cursor, offset))
+
+        def refresh():
+            table.refresh()
+            root.update_idletasks()
+        bench("treeview_load_contacts", refresh)
+        rnd = random.Random(SEED)
+
+        def scroll(fraction):
+            table.yview("moveto", fraction)
+            root.update_idletasks()
+        bench("treeview_scroll_jump", scroll, setup=lambda i: (rnd.random(),))
+
+        def scroll_line():
+            table.yview("scroll", 1, "units")
+            root.update_idletasks()
+        bench("treeview_scroll_line", scroll_line, repeat=reps * 4)
+
+        # the pre-VirtualTree approach: every row becomes a Treeview item
+        limit = min(n, full_limit)
+        rows = db.get_all_contacts(cursor)[:limit]
+        plain = ttk.Treeview(root, columns=columns, show="headings", height=14)
+
+        def fill():
+            plain.delete(*plain.get_children())
+            for r in rows:
+                plain.insert("", "end", values=r)
+            root.update_idletasks()
+        bench("treeview_insert_all", fill, repeat=1 if limit >= 100_000 else 3)
+        results[-1]["rows"] = limit
+    finally:
+        root.destroy()
+        conn.close()
+    return results
+
+
+def run_startup(path, size, quick=False):
+    """Start the app on `path` in fresh processes; startup_window/startup_first_page in ms."""
+    env = dict(os.environ, MINICRM_DB=path)
+    env.pop("MINICRM_PROFILE", None)
+    here = os.path.dirname(os.path.abspath(__file__))
+    marks = {"window": [], "first_page": []}
+    for _ in range(3 if quick else 10):
+        out = subprocess.run([sys.executable, os.path.join(here, "crm.py"), "--startup-time"], env=env,
+                             cwd=here, capture_output=True, text=True, timeout=300, check=True).stdout
+        timings = json.loads(out.strip().splitlines()[-1])
+        for mark in marks:
+            marks[mark].append(timings[mark])
+    results = []
+    for mark, times in marks.items():
+        results.append(summarize(f"startup_{mark}", size, times))
+        print(f"  {'startup_' + mark:<28} {results[-1]['median_ms']:>10.3f} ms", file=sys.stderr)
+    return results
+
+
+# ---- checks ----
+def check_thresholds(results, thresholds):
+    """Results whose median is above the limit for their name and size."""
+    failures = []
+    for r in results:
+        limit = thresholds.get(r["name"], {}).get(r["size"])
+        if limit is not None and r["median_ms"] > limit:
+            failures.append(f"{r['name']}@{r['size']}: {r['median_ms']:.3f} ms > limit {limit} ms")
+    return failures
+
+
+def check_baseline(results, baseline, tolerance, floor_ms=0.05):
+    """Results more than `tolerance` slower than the same benchmark in an earlier run (tiny timings are ignored)."""
+    before = {(r["name"], r["size"]): r["median_ms"] for r in baseline.get("results", [])}
+    failures = []
+    for r in results:
+        old = before.get((r["name"], r["size"]))
+        if old is not None and r["median_ms"] > max(old * (1 + tolerance), floor_ms):
+            failures.append(f"{r['name']}@{r['size']}: {r['median_ms']:.3f} ms vs {old:.3f} ms before")
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the MiniCRM database and template hot paths.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated contact counts (default: {DEFAULT_SIZES})")
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "minicrm-bench"),
+                    help="where the synthetic databases are kept between runs")
+    ap.add_argument("-o", "--output", help="write the JSON results here (default: stdout)")
+    ap.add_argument("--quick", action="store_true", help="fewer repetitions")
+    ap.add_argument("--no-gui", action="store_true", help="skip the Treeview and startup benchmarks")
+    ap.add_argument("--check", metavar="THRESHOLDS", help="fail if a median exceeds its limit in this JSON file")
+    ap.add_argument("--baseline", help="fail if slower than this earlier results file")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --baseline (default 0.25)")
+    args = ap.parse_args(argv)
+
+    try:
+        sizes = [(s.strip(), parse_size(s.strip())) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        ap.error("--sizes takes counts like 1k,100k,1M or plain numbers")
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    display = None if args.no_gui else VirtualDisplay()
+    results, skipped = [], []
+    try:
+        for label, n in sizes:
+            path = os.path.join(args.data_dir, f"contacts-{n}.db")
+            print(f"{label} contacts ({path})", file=sys.stderr)
+            t = time.perf_counter()
+            build_database(path, n)
+            print(f"  database ready in {time.perf_counter() - t:.1f} s", file=sys.stderr)
+            results += run_database(path, label, n, args.quick)
+            results += run_server(path, label, n, args.quick)
+            if display is not None and display.available:
+                results += run_treeview(path, label, n, args.quick)
+                results += run_startup(path, label, args.quick)
+            elif label == sizes[0][0]:
+                skipped.append("treeview and startup (no display and no Xvfb)")
+    finally:
+        if display is not None:
+            display.close()
+
+    report = {
+        "created": now_str(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "journal_mode": db.JOURNAL_MODE,
+        "skipped": skipped,
+        "results": results,
+    }
+    failures = []
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            failures += check_thresholds(results, json.load(f))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += check_baseline(results, json.load(f), args.tolerance)
+    report["regressions"] = failures
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for line in failures:
+        print(f"regression: {line}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
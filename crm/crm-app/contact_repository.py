@@ -0,0 +1,168 @@
+# contact_repository.py
+"""
+Contact lookups through a bounded in-memory cache.
+
+The form is filled on every selection change, so arrowing through the table
+used to cost one get_contact_by_id() query per row. ContactRepository keeps
+the most recently used contacts as compact Contact tuples (same order as
+get_contact_by_id() rows) and loads a miss together with the rest of the
+rows on screen, so the next few selections are served from memory:
+
+    repo = ContactRepository(conn, cursor)
+    rec = repo.cached(cid)                      # any thread, never queries; None on a miss
+    rec = repo.get(cid, prefetch=visible_ids)   # on the connection's thread
+
+Cached rows belong to one data version. Writes made through the repository
+bump `version` and evict the contacts they touched. Commits by any other
+connection (imports and campaigns run on their own, so does a second app
+or a script) show up as a change in PRAGMA data_version, which get() checks
+before every read and sync() checks on demand; either drops the cache.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+import db
+
+Contact = namedtuple("Contact", db.EXPORT_COLUMNS[1:])
+
+DEFAULT_SIZE = 5000
+
+
+class ContactRepository:
+    """
+    Call everything except cached() on the thread that owns `conn` (the
+    DBExecutor worker in the GUI). Reads and writes of the cache itself are
+    locked, so cached() is safe from the Tk thread.
+    """
+    def __init__(self, conn, cursor, size=DEFAULT_SIZE):
+        self.conn = conn
+        self.cursor = cursor
+        self.size = size
+        self.version = 0
+        self._cache = OrderedDict()     # id -> Contact, least recently used first
+        self._lock = threading.Lock()
+        self._data_version = None       # read on first use, so this can be built on any thread
+
+    # ---- cache ----
+    def _read_data_version(self):
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
+    def sync(self):
+        """Drop the cache if another connection committed since the last check; returns True if so."""
+        current = self._read_data_version()
+        if current == self._data_version:
+            return False
+        first, self._data_version = self._data_version is None, current
+        if first:
+            return False
+        self.invalidate()
+        return True
+
+    def invalidate(self, ids=None):
+        """Bump the version and forget `ids` (default: everything)."""
+        with self._lock:
+            self.version += 1
+            if ids is None:
+                self._cache.clear()
+            else:
+                for cid in ids:
+                    self._cache.pop(int(cid), None)
+
+    def cached(self, cid):
+        """The cached Contact for an id, or None; never touches the database."""
+        cid = int(cid)
+        with self._lock:
+            rec = self._cache.get(cid)
+            if rec is not None:
+                self._cache.move_to_end(cid)
+            return rec
+
+    def _store(self, rows, version):
+        with self._lock:
+            if version != self.version:
+                return  # a write landed while these were read
+            cache = self._cache
+            for row in rows:
+                cache[row[0]] = Contact._make(row[1:])
+                cache.move_to_end(row[0])
+            while len(cache) > self.size:
+                cache.popitem(last=False)
+
+    # ---- reads ----
+    def get(self, cid, prefetch=()):
+        """
+        The Contact for an id, or None if it doesn't exist. On a miss, the
+        uncached ids in `prefetch` (e.g. the other visible rows) are loaded
+        in the same query.
+        """
+        self.sync()
+        cid = int(cid)
+        rec = self.cached(cid)
+        if rec is not None:
+            return rec
+        with self._lock:
+            ids = {cid}.union(i for i in map(int, prefetch) if i not in self._cache)
+            version = self.version
+        rows = db.get_contacts_by_ids(self.cursor, ids)
+        self._store(rows, version)
+        for row in rows:
+            if row[0] == cid:
+                return Contact._make(row[1:])
+        return None
+
+    # ---- writes (evict what they touch) ----
+    def insert(self, data):
+        """data in insert_contact() order; returns the new id."""
+        cid = db.insert_contact(self.cursor, self.conn, data)
+        self.invalidate(())
+        return cid
+
+    def insert_many(self, rows):
+        n = db.insert_contacts_many(self.cursor, self.conn, rows)
+        self.invalidate(())
+        return n
+
+    def update(self, data):
+        """data in update_contact() order; returns the id, or None if no row matched."""
+        try:
+            return db.update_contact(self.cursor, self.conn, data)
+        finally:
+            self.invalidate((data[-1],))
+
+    def update_status_many(self, ids, status, date=None):
+        try:
+            return db.update_status_many(self.cursor, self.conn, ids, status, date)
+        finally:
+            self.invalidate(ids)
+
+    def mark_emailed(self, ids, date=None, detail=None):
+        try:
+            return db.mark_emailed(self.cursor, self.conn, ids, date, detail)
+        finally:
+            self.invalidate(ids)
+
+    def log_interaction(self, cid, kind, detail=None):
+        try:
+            return db.log_interaction(self.cursor, self.conn, cid, kind, detail)
+        finally:
+            self.invalidate((cid,))
+
+    def set_follow_up(self, ids, when):
+        try:
+            return db.set_follow_up(self.cursor, self.conn, ids, when)
+        finally:
+            self.invalidate(ids)
+
+    def delete(self, cid):
+        try:
+            return db.delete_contact(self.cursor, self.conn, cid)
+        finally:
+            self.invalidate((cid,))
+
+    def delete_many(self, ids):
+        try:
+            return db.delete_contacts_many(self.cursor, self.conn, ids)
+        finally:
+            self.invalidate(ids)
@@ -0,0 +1,244 @@
+# contact_store.py
+"""
+Column-oriented in-memory copy of the contact list, for sorting and
+filtering without going back to SQLite.
+
+    store = ContactStore.load(cursor)                       # one pass over the table
+    order = store.view("name", descending=False, status="Called")
+    rows = [store.row(i) for i in order[:50]]               # list-query shaped rows
+
+Each column is kept once for the whole table rather than as one tuple of
+strings per contact: ids in an array, the free-text columns (name, email,
+phone, website) as plain lists, date_added (a time to the second, nearly
+unique per row) as 8-byte epoch seconds in an array, and the repetitive
+ones (status, the call and email dates, the touch count) as 4-byte codes
+into a list of their distinct values. Sorting a column builds a permutation
+of row numbers once; it is kept until the data changes, so flipping the
+direction or changing the status filter is a single pass over arrays.
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import islice
+
+from db import stream_contacts, LIST_COLUMNS, TIMESTAMP_FORMAT
+
+TEXT_COLUMNS = ("name", "email", "phone", "website")
+TIME_COLUMNS = ("date_added",)
+CODED_COLUMNS = ("status", "date_called", "date_emailed", "touch_count")
+
+
+def _sort_key(value):
+    # touch_count is the one numeric column; the others are text or None
+    return value if isinstance(value, int) else (value or "").casefold()
+
+
+class CodedColumn:
+    """A column with few distinct values: a code per row plus each value once."""
+    __slots__ = ("codes", "values", "_index")
+
+    def __init__(self):
+        self.codes = array("I")
+        self.values = []
+        self._index = {}
+
+    def code(self, value):
+        c = self._index.get(value)
+        if c is None:
+            c = self._index[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def find(self, value):
+        """The code of a value, or None if no row has it."""
+        return self._index.get(value)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __setitem__(self, i, value):
+        self.codes[i] = self.code(value)
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+    def extend(self, values):
+        self.codes.extend(map(self.code, values))
+
+    def insert(self, i, value):
+        self.codes.insert(i, self.code(value))
+
+    def sort_keys(self):
+        # rank of each distinct value, then one array lookup per row
+        rank = array("I", bytes(4 * len(self.values)))
+        for r, c in enumerate(sorted(range(len(self.values)), key=lambda c: _sort_key(self.values[c]))):
+            rank[c] = r
+        return array("I", (rank[c] for c in self.codes))
+
+
+class TimeColumn:
+    """Stored timestamps ("YYYY-MM-DD HH:MM:SS" or None) as seconds since 1970, 8 bytes a row."""
+    __slots__ = ("seconds",)
+    EPOCH = datetime(1970, 1, 1)
+    NONE = -2 ** 63     # sorts first, as None does in the other columns
+
+    def __init__(self):
+        self.seconds = array("q")
+
+    @classmethod
+    def encode(cls, value):
+        if value is None:
+            return cls.NONE
+        return (datetime.fromisoformat(value) - cls.EPOCH) // timedelta(seconds=1)
+
+    @classmethod
+    def decode(cls, s):
+        return None if s == cls.NONE else (cls.EPOCH + timedelta(seconds=s)).strftime(TIMESTAMP_FORMAT)
+
+    def __getitem__(self, i):
+        return self.decode(self.seconds[i])
+
+    def __setitem__(self, i, value):
+        self.seconds[i] = self.encode(value)
+
+    def append(self, value):
+        self.seconds.append(self.encode(value))
+
+    def extend(self, values):
+        self.seconds.extend(map(self.encode, values))
+
+    def insert(self, i, value):
+        self.seconds.insert(i, self.encode(value))
+
+    def sort_keys(self):
+        # the numbers sort as the stored text does
+        return self.seconds
+
+
+class ContactStore:
+    """
+    Rows are numbered in id order. Deleted contacts are only flagged (row
+    numbers stay valid for the permutations), so call discard() for deletes
+    and put() for inserts and edits. Not thread-safe: build it on the
+    database thread, then hand it to one thread.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.columns = {c: [] for c in TEXT_COLUMNS}
+        self.columns.update((c, TimeColumn()) for c in TIME_COLUMNS)
+        self.columns.update((c, CodedColumn()) for c in CODED_COLUMNS)
+        self._cols = [self.columns[c] for c in LIST_COLUMNS[1:]]
+        self._dead = bytearray()
+        self._deleted = 0
+        self._orders = {}       # column -> ascending permutation of row numbers
+
+    @classmethod
+    def load(cls, cursor, chunk_size=5000):
+        store = cls()
+        rows = stream_contacts(cursor, chunk_size=chunk_size, columns=LIST_COLUMNS)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # transpose a chunk at a time: one extend per column instead of one append per value
+            values = list(zip(*chunk))
+            store.ids.extend(values[0])
+            for col, column_values in zip(store._cols, values[1:]):
+                col.extend(column_values)
+        store._dead = bytearray(len(store.ids))
+        return store
+
+    def __len__(self):
+        return len(self.ids) - self._deleted
+
+    def row(self, i):
+        """Row number -> (id, name, email, phone, website, status, dates..., 'Email'), like the list queries."""
+        return (self.ids[i], *(c[i] for c in self._cols), "Email")
+
+    def status_values(self):
+        return [v for v in self.columns["status"].values if v]
+
+    # ---- sorting and filtering ----
+    def _ascending(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            n = len(self.ids)
+            if column == "id":
+                order = array("I", range(n))
+            else:
+                col = self.columns[column]
+                keys = col.sort_keys() if isinstance(col, (CodedColumn, TimeColumn)) else [_sort_key(v) for v in col]
+                # stable, so equal values stay in id order
+                order = array("I", sorted(range(n), key=keys.__getitem__))
+            self._orders[column] = order
+        return order
+
+    def view(self, column="id", descending=True, status=None):
+        """Row numbers of the live contacts, sorted by `column`, optionally only one status."""
+        order = self._ascending(column)
+        if descending:
+            order = order[::-1]
+        dead = self._dead
+        if status is not None:
+            col = self.columns["status"]
+            code = col.find(status)
+            if code is None:
+                return array("I")
+            codes = col.codes
+            return array("I", (i for i in order if codes[i] == code and not dead[i]))
+        if self._deleted:
+            return array("I", (i for i in order if not dead[i]))
+        return order
+
+    # ---- keeping in step with edits ----
+    def _find(self, cid):
+        i = bisect_left(self.ids, cid)
+        return i if i < len(self.ids) and self.ids[i] == cid else None
+
+    def put(self, row):
+        """Add or replace a contact from a list-shaped row (an extra action column is ignored)."""
+        cid = int(row[0])
+        values = row[1:len(LIST_COLUMNS)]
+        i = self._find(cid)
+        if i is None:
+            i = bisect_left(self.ids, cid)
+            if i < len(self.ids):
+                self._orders = {}   # row numbers after i shift; sort again when asked
+            self.ids.insert(i, cid)
+            for col, value in zip(self._cols, values):
+                col.insert(i, value)
+            self._dead.insert(i, 0)
+        else:
+            for order in self._orders.values():
+                order.remove(i)
+            for col, value in zip(self._cols, values):
+                col[i] = value
+            if self._dead[i]:
+                self._dead[i] = 0
+                self._deleted -= 1
+        # new ids are the largest, so usually the row is appended and the kept
+        # permutations only need it placed: a binary search instead of a re-sort
+        for column, order in self._orders.items():
+            key = self._sort_key_of(column)
+            order.insert(bisect_left(order, key(i), key=key), i)
+
+    def _sort_key_of(self, column):
+        # matches the stable sort in _ascending(): by value, then by id
+        ids = self.ids
+        if column == "id":
+            return ids.__getitem__
+        col = self.columns[column]
+        if isinstance(col, TimeColumn):
+            seconds = col.seconds
+            return lambda j: (seconds[j], ids[j])
+        return lambda j: (_sort_key(col[j]), ids[j])
+
+    def discard(self, ids):
+        """Forget deleted contacts."""
+        for cid in ids:
+            i = self._find(int(cid))
+            if i is not None and not self._dead[i]:
+                self._dead[i] = 1
+                self._deleted += 1
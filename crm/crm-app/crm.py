@@ -1,5 +1,9 @@
 # crm.py
+import sys, time
+STARTED = time.perf_counter()
+
 from gui.app import CRMApp
 
 if __name__ == "__main__":
-    CRMApp().run()
+    # --startup-time: print the startup milestones in ms as JSON and quit at the first page
+    CRMApp(measure_startup=STARTED if "--startup-time" in sys.argv[1:] else None).run()
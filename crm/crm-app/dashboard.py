@@ -0,0 +1,80 @@
+# dashboard.py
+"""
+Contacts per status and activity per day, for the Dashboard tab.
+
+Both come from summary tables (status_counts, daily_activity) that triggers
+on the contacts table keep up to date on every insert, delete and change of
+status, date added, date called or date emailed. Opening the dashboard reads
+a handful of rows, however many contacts there are, instead of grouping the
+whole table.
+
+    python3 dashboard.py                # counts and the last 30 days
+    python3 dashboard.py --days 90
+    python3 dashboard.py --check        # compare the summaries with a full count (exit 1 if they differ)
+    python3 dashboard.py --rebuild      # recount the summaries from the contacts table
+"""
+
+import argparse, sys
+from datetime import date, timedelta
+
+from db import connect_db, count_by_status, get_daily_activity, check_summaries, rebuild_summaries
+
+DAYS = 30
+
+
+def load(cursor, days=DAYS, today=None):
+    """
+    (status counts, activity) for the dashboard:
+        status counts   [(status, n)] ordered by status, None for no status
+        activity        [(day, added, calls, emails)] for each of the last
+                        `days` days up to `today`, oldest first, zeros included
+    """
+    today = today or date.today()
+    first = today - timedelta(days=days - 1)
+    found = {r[0]: r[1:] for r in get_daily_activity(cursor, first.isoformat(), today.isoformat())}
+    activity = []
+    for i in range(days):
+        day = (first + timedelta(days=i)).isoformat()
+        activity.append((day, *found.get(day, (0, 0, 0))))
+    return count_by_status(cursor), activity
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Show contacts per status and activity per day.")
+    ap.add_argument("--days", type=int, default=DAYS, help=f"days of activity to show (default {DAYS})")
+    ap.add_argument("--check", action="store_true", help="compare the summaries with a full count of the contacts")
+    ap.add_argument("--rebuild", action="store_true", help="recount the summaries from the contacts table")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    conn, cursor = connect_db(args.db)
+    try:
+        if args.rebuild:
+            rebuild_summaries(cursor, conn)
+            print("Summaries rebuilt.", file=sys.stderr)
+        if args.check:
+            problems = check_summaries(cursor)
+            for line in problems:
+                print(line)
+            print(f"{len(problems):,} difference{'s' if len(problems) != 1 else ''}", file=sys.stderr)
+            return 1 if problems else 0
+        if args.rebuild:
+            return 0
+
+        statuses, activity = load(cursor, args.days)
+        total = sum(n for _, n in statuses)
+        print(f"{'Status':<24}{'Contacts':>10}{'Share':>8}")
+        for status, n in statuses:
+            print(f"{status or '(none)':<24}{n:>10,}{n / total:>8.1%}")
+        print(f"{'Total':<24}{total:>10,}")
+        print()
+        print(f"{'Day':<12}{'Added':>8}{'Calls':>8}{'Emails':>8}")
+        for day, added, calls, emails in activity:
+            print(f"{day:<12}{added:>8,}{calls:>8,}{emails:>8,}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,167 @@
-import sqlite3, os
-from datetime import datetime
+import logging, sqlite3, os, re, queue, threading
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from datetime import date, datetime, timedelta
+from pathlib import Path
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "contacts.db")
+import diagnostics
 
-def connect_db():
-    conn = sqlite3.connect(DB_PATH)
+# MINICRM_DB points the GUI and the command-line tools at another database file
+DB_PATH = os.environ.get("MINICRM_DB") or os.path.join(os.path.dirname(__file__), "contacts.db")
+# MINICRM_SHARDS points them at a sharded directory instead (see shards.py)
+SHARDS_PATH = os.environ.get("MINICRM_SHARDS")
+log = logging.getLogger("minicrm.db")
+
+# ---- Connection settings ----
+# WAL lets readers (the GUI, exporter.py, ad-hoc scripts) run while one writer
+# commits, and synchronous=NORMAL is safe with WAL (a power cut can lose the
+# last commits, never corrupt the file). WAL needs a local filesystem: set
+# MINICRM_JOURNAL_MODE=DELETE for a database on a network share.
+JOURNAL_MODE = os.environ.get("MINICRM_JOURNAL_MODE", "WAL")
+BUSY_TIMEOUT = 10.0     # seconds to wait for another process's write lock
+PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -32000,       # KiB (32 MB) of page cache per connection
+    "mmap_size": 268435456,     # read through a 256 MB memory map
+    "temp_store": "MEMORY",
+}
+
+def connect_db(path=None, readonly=False, check_same_thread=True, factory=None):
+    """
+    Open the database with the settings above; returns (conn, cursor).
+    Writers bring the schema up to date. readonly=True opens the file
+    read-only (it must already exist) and skips the schema check.
+    With no path and MINICRM_SHARDS set, opens that sharded directory:
+    conn is its catalog, and the contact functions below called on it run
+    across the shards.
+    """
+    if path is None and SHARDS_PATH:
+        import shards   # imports this module
+        store = shards.ShardedDB(SHARDS_PATH, readonly=readonly, check_same_thread=check_same_thread)
+        return store.catalog, store.catalog.cursor()
+    path = path or DB_PATH
+    factory = factory or diagnostics.connection_factory()
+    if readonly:
+        uri = Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread,
+                               factory=factory)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread,
+                               factory=factory)
     cursor = conn.cursor()
-    _ensure_schema(conn, cursor)
+    if not readonly and JOURNAL_MODE:
+        cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    for name, value in PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    if not readonly:
+        _ensure_schema(conn, cursor)
     return conn, cursor
 
+# ---- Transactions ----
+_tx_depth = {}      # id(conn) -> open transaction() blocks (connections can't be weakly referenced)
+
+@contextmanager
+def transaction(conn):
+    """
+    Unit of work: every write inside the block is committed once, at the end,
+    or rolled back if the block raises. The mutators below join an enclosing
+    block instead of committing on their own:
+
+        with transaction(conn):
+            for data in rows:
+                insert_contact(cursor, conn, data)     # one commit for all rows
+
+    Blocks nest; an inner block is a savepoint, so it can fail on its own.
+    """
+    key = id(conn)
+    depth = _tx_depth.get(key, 0)
+    if depth:
+        conn.execute(f"SAVEPOINT tx{depth}")
+    elif not conn.in_transaction:
+        conn.execute("BEGIN")
+    _tx_depth[key] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth:
+            conn.execute(f"ROLLBACK TO tx{depth}")
+            conn.execute(f"RELEASE tx{depth}")
+        elif conn.in_transaction:
+            conn.rollback()
+        raise
+    else:
+        if depth:
+            conn.execute(f"RELEASE tx{depth}")
+        else:
+            conn.commit()
+    finally:
+        if depth:
+            _tx_depth[key] = depth
+        else:
+            del _tx_depth[key]
+
+class ConnectionPool:
+    """
+    One writer connection plus a few read-only connections, usable from any thread.
+
+        pool = ConnectionPool()
+        with pool.reader() as (conn, cursor):
+            rows = get_contacts_page(cursor)
+        with pool.writer() as (conn, cursor):
+            insert_contact(cursor, conn, data)
+
+    Writers take turns on a lock and roll back if the block raises. With WAL,
+    readers never wait for the writer and the writer never waits for readers.
+    """
+    def __init__(self, path=None, readers=2):
+        self.path = path        # None: connect_db()'s default, which may be sharded
+        self.conn, self.cursor = connect_db(self.path, check_same_thread=False)
+        self._write_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(connect_db(self.path, readonly=True, check_same_thread=False))
+
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            try:
+                yield self.conn, self.cursor
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection (waits if all are in use)."""
+        conn, cursor = self._readers.get()
+        try:
+            yield conn, cursor
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put((conn, cursor))
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        self.conn.close()
+
 def _ensure_schema(conn, cursor):
+    migrate(conn, cursor)
+    with transaction(conn):
+        ensure_unique_email_index(cursor)
+
+# ---- Schema migrations ----
+# Each migration upgrades the file by one PRAGMA user_version step and runs in
+# its own transaction, so an existing contacts.db is upgraded in place and an
+# interrupted upgrade simply resumes at the failed step next time.
+
+def _migration_base_tables(cursor):
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS contacts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,8 +186,6 @@ def _ensure_schema(conn, cursor):
     )
     """)
 
-    conn.commit()
-
     cursor.execute("SELECT COUNT(*) FROM templates")
     if cursor.fetchone()[0] == 0:
         cursor.execute(
@@ -43,19 +193,774 @@ def _ensure_schema(conn, cursor):
             ("Follow-up", "Following up with {{name}}",
              "Hi {{name}},\n\nJust following up on our previous conversation.\n\nBest,\nAli")
         )
+
+def _migration_search_index(cursor):
+    """
+    FTS5 index over the searchable contact fields, kept in sync by triggers and
+    built from existing rows. Only prefix-term queries are needed, so no
+    positions or column sizes are stored (detail=none, columnsize=0). Skipped if this sqlite build has no FTS5 (search
+    then falls back to LIKE).
+    """
+    if has_search_index(cursor):
+        return
+    try:
+        cursor.execute("""
+        CREATE VIRTUAL TABLE contacts_fts USING fts5(
+            name, email, phone, website, notes,
+            content='contacts', content_rowid='id', prefix='1 2 3',
+            detail=none, columnsize=0
+        )
+        """)
+    except sqlite3.OperationalError:
+        return
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+        INSERT INTO contacts_fts (rowid, name, email, phone, website, notes)
+        VALUES (new.id, new.name, new.email, new.phone, new.website, new.notes);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+        INSERT INTO contacts_fts (contacts_fts, rowid, name, email, phone, website, notes)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.website, old.notes);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF name, email, phone, website, notes ON contacts BEGIN
+        INSERT INTO contacts_fts (contacts_fts, rowid, name, email, phone, website, notes)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.website, old.notes);
+        INSERT INTO contacts_fts (rowid, name, email, phone, website, notes)
+        VALUES (new.id, new.name, new.email, new.phone, new.website, new.notes);
+    END
+    """)
+    cursor.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+
+def _migration_contact_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_status_added ON contacts (status, date_added)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_date_called ON contacts (date_called)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_date_emailed ON contacts (date_emailed)")
+    # One contact per email address (case-insensitive); blank emails are not indexed.
+    # Files that already hold duplicates get a plain index until they are cleaned
+    # up; ensure_unique_email_index() makes it unique once they are.
+    unique = not _has_duplicate_emails(cursor)
+    cursor.execute(f"""
+        CREATE {"UNIQUE" if unique else ""} INDEX IF NOT EXISTS idx_contacts_email
+        ON contacts (lower(email)) WHERE email <> ''
+    """)
+    if not unique:
+        log.warning("contacts share email addresses; one contact per email is not enforced "
+                    "until they are merged (python3 dedupe.py)")
+
+def _has_duplicate_emails(cursor):
+    cursor.execute("""
+        SELECT 1 FROM contacts WHERE email <> ''
+        GROUP BY lower(email) HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    return cursor.fetchone() is not None
+
+def ensure_unique_email_index(cursor):
+    """
+    Rebuild idx_contacts_email as a unique index if it was created plain
+    (duplicates at upgrade time) and none are left. True if it is unique.
+    Call inside a transaction; runs on connect and after dedupe merges.
+    """
+    cursor.execute("PRAGMA index_list(contacts)")
+    unique = {row[1]: row[2] for row in cursor.fetchall()}.get("idx_contacts_email")
+    if unique is None or unique:
+        return bool(unique)
+    if _has_duplicate_emails(cursor):
+        return False
+    cursor.execute("DROP INDEX idx_contacts_email")
+    cursor.execute("""
+        CREATE UNIQUE INDEX idx_contacts_email
+        ON contacts (lower(email)) WHERE email <> ''
+    """)
+    return True
+
+def _migration_job_queue(cursor):
+    """Durable background jobs (see jobqueue.py): one row per job, one per unit of work."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            state TEXT NOT NULL DEFAULT 'queued',
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            stats TEXT NOT NULL DEFAULT '{}',
+            error TEXT,
+            lease_owner TEXT,
+            lease_until REAL,
+            created TEXT,
+            updated TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL REFERENCES jobs(id),
+            key TEXT,
+            payload TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_items_job_state ON job_items (job_id, state, id)")
+
+def _migration_follow_ups(cursor):
+    """
+    Follow-up reminders (see reminders.py): when to get back to a contact,
+    "YYYY-MM-DD HH:MM:SS" or NULL. Only scheduled contacts are indexed, and
+    the index (by time, then id) is what reminders are read from.
+    """
+    cursor.execute("PRAGMA table_info(contacts)")
+    if "next_follow_up" not in {r[1] for r in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN next_follow_up TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_next_follow_up
+        ON contacts (next_follow_up) WHERE next_follow_up IS NOT NULL
+    """)
+
+INTERACTION_SUMMARY_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS interactions_summary AFTER INSERT ON interactions
+    WHEN new.kind IN ('call', 'email') BEGIN
+        UPDATE contacts SET
+            touch_count = touch_count + 1,
+            last_called = CASE WHEN new.kind = 'call' AND (last_called IS NULL OR new.ts > last_called)
+                               THEN new.ts ELSE last_called END,
+            last_emailed = CASE WHEN new.kind = 'email' AND (last_emailed IS NULL OR new.ts > last_emailed)
+                                THEN new.ts ELSE last_emailed END
+        WHERE id = new.contact_id;
+    END
+"""
+
+def _migration_interactions(cursor):
+    """
+    Append-only interaction history (calls, emails, status changes) with a
+    per-contact summary on the contacts row: touch_count (calls + emails),
+    last_called and last_emailed. A trigger keeps the summary up to date on
+    every insert, so the list reads it without aggregating the log. Existing
+    call and email dates become the first entries.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            detail TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_interactions_contact_ts ON interactions (contact_id, ts)")
+    # entries are never changed, and only removed with their contact; contact_id
+    # may move (merging duplicates)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS interactions_no_update BEFORE UPDATE OF ts, kind, detail ON interactions
+        BEGIN SELECT RAISE(ABORT, 'interactions are append-only'); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS interactions_no_delete BEFORE DELETE ON interactions
+        WHEN EXISTS (SELECT 1 FROM contacts WHERE id = old.contact_id)
+        BEGIN SELECT RAISE(ABORT, 'interactions are append-only'); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS contacts_interactions_ad AFTER DELETE ON contacts
+        BEGIN DELETE FROM interactions WHERE contact_id = old.id; END
+    """)
+    cursor.execute("PRAGMA table_info(contacts)")
+    have = {r[1] for r in cursor.fetchall()}
+    for column, decl in (("last_called", "TEXT"), ("last_emailed", "TEXT"),
+                         ("touch_count", "INTEGER NOT NULL DEFAULT 0")):
+        if column not in have:
+            cursor.execute(f"ALTER TABLE contacts ADD COLUMN {column} {decl}")
+    # backfill with set-based statements, then start maintaining the summary per insert
+    _log_contact_dates(cursor, 0, "Recorded before history")
+    cursor.execute("""
+        UPDATE contacts SET last_called = NULLIF(trim(date_called), ''),
+               last_emailed = NULLIF(trim(date_emailed), ''),
+               touch_count = (NULLIF(trim(date_called), '') IS NOT NULL)
+                             + (NULLIF(trim(date_emailed), '') IS NOT NULL)
+        WHERE NULLIF(trim(date_called), '') IS NOT NULL OR NULLIF(trim(date_emailed), '') IS NOT NULL
+    """)
+    cursor.execute(INTERACTION_SUMMARY_TRIGGER)
+
+# dashboard summaries: contacts per status, and contacts added / called / emailed per day
+# (the day part of date_added, date_called and date_emailed)
+SUMMARY_DAY_COLUMNS = (("date_added", "added"), ("date_called", "calls"), ("date_emailed", "emails"))
+
+def _summary_status(ref, sign):
+    return f"""
+        INSERT INTO status_counts (status, n) VALUES (COALESCE({ref}.status, ''), {sign})
+        ON CONFLICT (status) DO UPDATE SET n = n + excluded.n;"""
+
+def _summary_day(ref, column, counter, sign):
+    return f"""
+        INSERT INTO daily_activity (day, {counter}) SELECT substr({ref}.{column}, 1, 10), {sign}
+        WHERE {ref}.{column} <> ''
+        ON CONFLICT (day) DO UPDATE SET {counter} = {counter} + excluded.{counter};"""
+
+def _summary_triggers():
+    """(name, CREATE TRIGGER sql) keeping status_counts and daily_activity in step with contacts."""
+    triggers = [
+        ("contacts_summary_ai", "AFTER INSERT ON contacts",
+         _summary_status("new", 1) + "".join(_summary_day("new", c, k, 1) for c, k in SUMMARY_DAY_COLUMNS)),
+        ("contacts_summary_ad", "AFTER DELETE ON contacts",
+         _summary_status("old", -1) + "".join(_summary_day("old", c, k, -1) for c, k in SUMMARY_DAY_COLUMNS)),
+        ("contacts_summary_au_status", "AFTER UPDATE OF status ON contacts WHEN old.status IS NOT new.status",
+         _summary_status("old", -1) + _summary_status("new", 1)),
+    ]
+    for column, counter in SUMMARY_DAY_COLUMNS:
+        changed = f"old.{column} IS NOT new.{column}"
+        triggers.append((f"contacts_summary_au_{column}", f"AFTER UPDATE OF {column} ON contacts WHEN {changed}",
+                         _summary_day("old", column, counter, -1) + _summary_day("new", column, counter, 1)))
+    return [(name, f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN{body}\n    END")
+            for name, event, body in triggers]
+
+def _summary_rows_sql(where):
+    # (status, n) and (day, added, calls, emails) of the contacts matching `where`
+    days = " UNION ALL ".join(
+        f"SELECT substr({column}, 1, 10) AS day, {i} AS k FROM contacts WHERE {column} <> '' AND {where}"
+        for i, (column, _) in enumerate(SUMMARY_DAY_COLUMNS))
+    return (f"SELECT COALESCE(status, '') AS status, COUNT(*) AS n FROM contacts WHERE {where} GROUP BY 1",
+            f"SELECT day, SUM(k = 0), SUM(k = 1), SUM(k = 2) FROM ({days}) WHERE true GROUP BY day")
+
+def _add_to_summaries(cursor, where="1", params=()):
+    """Count the contacts matching `where` into the summaries in two set-based statements (bulk inserts)."""
+    status_sql, day_sql = _summary_rows_sql(where)
+    cursor.execute(f"""
+        INSERT INTO status_counts (status, n) {status_sql}
+        ON CONFLICT (status) DO UPDATE SET n = n + excluded.n
+    """, params)
+    cursor.execute(f"""
+        INSERT INTO daily_activity (day, added, calls, emails) {day_sql}
+        ON CONFLICT (day) DO UPDATE SET added = added + excluded.added, calls = calls + excluded.calls,
+                                        emails = emails + excluded.emails
+    """, params * len(SUMMARY_DAY_COLUMNS))
+
+def _migration_dashboard(cursor):
+    """
+    Summary tables for the dashboard, filled once here and then kept up to
+    date by triggers on every insert, delete and change of status or dates,
+    so the dashboard reads a few rows instead of grouping the contacts table.
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS status_counts (status TEXT PRIMARY KEY, n INTEGER NOT NULL) "
+                   "WITHOUT ROWID")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_activity (
+            day TEXT PRIMARY KEY,
+            added INTEGER NOT NULL DEFAULT 0,
+            calls INTEGER NOT NULL DEFAULT 0,
+            emails INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    _add_to_summaries(cursor)
+    for _, sql in _summary_triggers():
+        cursor.execute(sql)
+
+CONVERT_BATCH = 10_000     # rows read and rewritten at a time by _migration_canonical_dates
+
+def _migration_canonical_dates(cursor):
+    """
+    Every contact date in its one stored form (see Dates below), so date
+    ranges are plain index seeks. Blank dates become NULL; the rest are
+    rewritten in place, CONVERT_BATCH rows at a time, skipping rows that are
+    already in form. A date that can't be read is blanked and its text kept
+    in the notes. Call and email history copied from converted dates is
+    converted with them. Triggers then refuse any other form.
+    """
+    forms = {"date_added": _TIMESTAMP_GLOB, "date_called": _DATE_GLOB, "date_emailed": _DATE_GLOB}
+    for column in DATE_COLUMNS:
+        cursor.execute(f"UPDATE contacts SET {column} = NULL WHERE trim({column}) = ''")
+    misfit = " OR ".join(f"{column} NOT GLOB '{glob}'" for column, glob in forms.items())
+    last_id = 0
+    while True:
+        cursor.execute(f"""
+            SELECT id, notes, {", ".join(DATE_COLUMNS)} FROM contacts
+            WHERE id > ? AND ({misfit}) ORDER BY id LIMIT ?
+        """, (last_id, CONVERT_BATCH))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        dates, notes = [], []
+        for cid, note, *old in rows:
+            new = _canonical_contact((None,) * 5 + (note, *old), strict=False)
+            dates.append((*new[6:], cid))
+            if new[5] != note:
+                notes.append((new[5], cid))
+        cursor.executemany("UPDATE contacts SET date_added=?, date_called=?, date_emailed=? WHERE id=?", dates)
+        cursor.executemany("UPDATE contacts SET notes=? WHERE id=?", notes)
+
+    # the history holds copies of the old call and email dates; entries are
+    # append-only, so the guards are lifted for this one rewrite. Blank ones
+    # (from files upgraded to 6 before blanks were skipped) never were a call
+    # or an email and go; the rest are converted where they can be read.
+    cursor.execute("""
+        SELECT id, contact_id, ts FROM interactions
+        WHERE kind IN ('call', 'email') AND ts NOT GLOB ? AND ts NOT GLOB ?
+    """, (_DATE_GLOB, _TIMESTAMP_GLOB))
+    fixes, blanks, contacts = [], [], set()
+    for iid, cid, ts in cursor.fetchall():
+        try:
+            new = canonical_timestamp(ts) if ":" in ts else canonical_date(ts)
+        except ValueError:
+            continue    # left as it was; the entry still says what happened
+        if new:
+            fixes.append((new, iid))
+        else:
+            blanks.append((iid,))
+        contacts.add(cid)
+    if contacts:
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' "
+                       "AND name IN ('interactions_no_update', 'interactions_no_delete')")
+        guards = cursor.fetchall()
+        for name, _ in guards:
+            cursor.execute(f"DROP TRIGGER {name}")
+        cursor.executemany("DELETE FROM interactions WHERE id=?", blanks)
+        cursor.executemany("UPDATE interactions SET ts=? WHERE id=?", fixes)
+        for _, sql in guards:
+            cursor.execute(sql)
+        rebuild_interaction_summary(cursor, contacts)
+
+    # range queries on date_added alone (idx_contacts_status_added needs a status first)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_date_added ON contacts (date_added)")
+    misfit = " OR ".join(f"new.{column} NOT GLOB '{glob}'" for column, glob in forms.items())
+    for name, event in (("contacts_dates_bi", "BEFORE INSERT ON contacts"),
+                        ("contacts_dates_bu", "BEFORE UPDATE OF date_added, date_called, date_emailed ON contacts")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event} WHEN {misfit}
+            BEGIN SELECT RAISE(ABORT, 'dates must be YYYY-MM-DD, date_added YYYY-MM-DD HH:MM:SS'); END
+        """)
+
+MIGRATIONS = [
+    _migration_base_tables,         # 1
+    _migration_search_index,        # 2
+    _migration_contact_indexes,     # 3
+    _migration_job_queue,           # 4
+    _migration_follow_ups,          # 5
+    _migration_interactions,        # 6
+    _migration_dashboard,           # 7
+    _migration_canonical_dates,     # 8
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def migrate(conn, cursor, target=SCHEMA_VERSION):
+    """Apply pending migrations up to `target`; returns the resulting version."""
+    version = schema_version(cursor)
+    while version < target:
+        step = MIGRATIONS[version]
+        version += 1
+        cursor.execute("BEGIN")
+        try:
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+        except BaseException:
+            conn.rollback()
+            raise
         conn.commit()
+    return version
+
+def has_search_index(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='contacts_fts'")
+    return cursor.fetchone() is not None
 
 def now_str():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+# ---- Sharded databases ----
+def _on_shards(fn):
+    """
+    Route `fn` to the ShardedDB method of the same name (same arguments,
+    without cursor and conn) when its cursor belongs to a sharded catalog.
+    """
+    takes_conn = fn.__code__.co_varnames[:2] == ("cursor", "conn")
+
+    @wraps(fn)
+    def routed(cursor, *args, **kwargs):
+        store = getattr(cursor.connection, "shards", None)
+        if store is None:
+            return fn(cursor, *args, **kwargs)
+        return getattr(store, fn.__name__)(*(args[1:] if takes_conn else args), **kwargs)
+    return routed
+
+# ---- Dates ----
+# Stored as text in one form each, so comparing strings compares times and a
+# range is one index seek: date_added "YYYY-MM-DD HH:MM:SS", date_called and
+# date_emailed "YYYY-MM-DD", NULL when unknown (never ''). The write functions
+# below convert whatever they are given; triggers refuse anything else.
+DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_COLUMNS = ("date_added", "date_called", "date_emailed")
+_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-1][0-9]-[0-3][0-9]"
+_TIMESTAMP_GLOB = _DATE_GLOB + " [0-2][0-9]:[0-5][0-9]:[0-5][0-9]"
+# values already in form (nearly all of them) are passed through without parsing
+_DATE_RE = re.compile(r"\d{4}-[01]\d-[0-3]\d")
+_TIMESTAMP_RE = re.compile(r"\d{4}-[01]\d-[0-3]\d [0-2]\d:[0-5]\d:[0-5]\d")
+# tried in order after ISO 8601; month before day, as tkcalendar and US spreadsheets write them
+PARSE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d", "%Y/%m/%d %H:%M:%S",
+                 "%m/%d/%Y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%m/%d/%y",
+                 "%d.%m.%Y", "%d.%m.%Y %H:%M", "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y")
+
+def parse_date(value):
+    """
+    A datetime for a date or time in any of the forms seen in the wild (ISO
+    8601, 3/14/2025, 14.03.2025, Mar 14, 2025, ...); None for None or blank.
+    Times with a UTC offset become local time. Raises ValueError otherwise.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return _parse_other(text)
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+# an imported file writes its dates one way, so the format that matched last is tried first
+_last_format = PARSE_FORMATS[0]
+
+def _parse_other(text):
+    global _last_format
+    for fmt in (_last_format, *PARSE_FORMATS):
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        _last_format = fmt
+        return parsed
+    raise ValueError(f"unrecognised date: {text!r}") from None
+
+# the same few thousand dates recur across a large import; each is parsed once
+@lru_cache(maxsize=8192)
+def _canonical_text(text, fmt):
+    parsed = parse_date(text)
+    return parsed.strftime(fmt) if parsed else None
+
+def canonical_date(value):
+    """"YYYY-MM-DD" for anything parse_date() reads; None for None or blank."""
+    if isinstance(value, str):
+        return value if _DATE_RE.fullmatch(value) else _canonical_text(value, DATE_FORMAT)
+    parsed = parse_date(value)
+    return parsed.strftime(DATE_FORMAT) if parsed else None
+
+def canonical_timestamp(value):
+    """"YYYY-MM-DD HH:MM:SS" (midnight for a bare date) for anything parse_date() reads; None for None or blank."""
+    if isinstance(value, str):
+        return value if _TIMESTAMP_RE.fullmatch(value) else _canonical_text(value, TIMESTAMP_FORMAT)
+    parsed = parse_date(value)
+    return parsed.strftime(TIMESTAMP_FORMAT) if parsed else None
+
+def days_ago(days):
+    """The date `days` days before today, "YYYY-MM-DD": since=days_ago(29) is the last 30 days, today included."""
+    return (date.today() - timedelta(days=days)).strftime(DATE_FORMAT)
+
+def _canonical_contact(data, columns=DATE_COLUMNS, strict=True):
+    """
+    `data` (a contact tuple in insert or update order) with its date fields,
+    `columns` from index 6 on, in their stored form. strict=False blanks a
+    date it can't read and keeps the text in the notes (index 5) instead of
+    raising ValueError.
+    """
+    data = list(data)
+    for i, column in enumerate(columns, 6):
+        convert = canonical_timestamp if column == "date_added" else canonical_date
+        try:
+            data[i] = convert(data[i])
+        except ValueError:
+            if strict:
+                raise ValueError(f"{column}: unrecognised date {data[i]!r}") from None
+            data[5] = _note_unreadable(data[5], column, data[i])
+            data[i] = None
+    return tuple(data)
+
+def _note_unreadable(notes, column, value):
+    label = column.replace("_", " ").capitalize()
+    return (notes + "\n" if notes else "") + f"{label}: {value}"
+
+def _date_range(column, since=None, until=None):
+    """
+    WHERE terms and params for `column` from `since` to `until`, both days
+    included (dates, datetimes or strings parse_date() reads). Compared as
+    `column >= since AND column < the day after until`, which suits both
+    stored forms and stays a range seek on the column's index.
+    """
+    if column not in DATE_COLUMNS:
+        raise ValueError(f"not a date column: {column!r}")
+    where, params = [], []
+    if since:
+        where.append(f"{column} >= ?"); params.append(canonical_date(since))
+    if until:
+        where.append(f"{column} < ?"); params.append((parse_date(until) + timedelta(days=1)).strftime(DATE_FORMAT))
+    return where, params
 
 def get_all_contacts(cursor):
     cursor.execute("""
         SELECT id, name, email, phone, website, status,
-               date_added, date_called, date_emailed, 'Email' AS action
+               date_added, date_called, date_emailed, touch_count, 'Email' AS action
         FROM contacts ORDER BY id DESC
     """)
     return cursor.fetchall()
 
+# Keyset pagination (list order is id DESC, same rows as get_all_contacts)
+PAGE_SIZE = 200
+# columns of the list queries below, before their trailing 'Email' action column
+LIST_COLUMNS = ("id", "name", "email", "phone", "website", "status",
+                "date_added", "date_called", "date_emailed", "touch_count")
+
+@_on_shards
+def count_contacts(cursor):
+    cursor.execute("SELECT COUNT(*) FROM contacts")
+    return cursor.fetchone()[0]
+
+@_on_shards
+def count_by_status(cursor):
+    """[(status, number of contacts)] ordered by status (None first), from the status_counts summary."""
+    cursor.execute("SELECT NULLIF(status, ''), n FROM status_counts WHERE n > 0 ORDER BY status")
+    return cursor.fetchall()
+
+@_on_shards
+def get_daily_activity(cursor, since=None, until=None):
+    """[(day, added, calls, emails)] for the days with any, oldest first, from the daily_activity summary."""
+    cursor.execute("""
+        SELECT day, added, calls, emails FROM daily_activity
+        WHERE day >= ? AND day <= ? AND (added > 0 OR calls > 0 OR emails > 0)
+        ORDER BY day
+    """, (since or "", until or "9999"))
+    return cursor.fetchall()
+
+@_on_shards
+def check_summaries(cursor):
+    """Differences between the dashboard summaries and a full count of the contacts table ([] if none)."""
+    status_sql, day_sql = _summary_rows_sql("1")
+    problems = []
+    for table, key, sql in (("status_counts", "status", status_sql), ("daily_activity", "day", day_sql)):
+        cursor.execute(sql)
+        expected = {r[0]: r[1:] for r in cursor.fetchall()}
+        cursor.execute(f"SELECT * FROM {table}")
+        stored = {r[0]: r[1:] for r in cursor.fetchall() if any(r[1:])}
+        for k in sorted(expected.keys() | stored.keys()):
+            if expected.get(k) != stored.get(k):
+                problems.append(f"{table} {key}={k!r}: stored {stored.get(k)}, counted {expected.get(k)}")
+    return problems
+
+@_on_shards
+def rebuild_summaries(cursor, conn):
+    """Recount the dashboard summaries from the contacts table in one transaction."""
+    with transaction(conn):
+        cursor.execute("DELETE FROM status_counts")
+        cursor.execute("DELETE FROM daily_activity")
+        _add_to_summaries(cursor)
+
+@_on_shards
+def get_contacts_page(cursor, before_id=None, limit=PAGE_SIZE):
+    """Next page going down the list: rows with id < before_id (or from the top)."""
+    if before_id is None:
+        cursor.execute("""
+            SELECT id, name, email, phone, website, status,
+                   date_added, date_called, date_emailed, touch_count, 'Email' AS action
+            FROM contacts ORDER BY id DESC LIMIT ?
+        """, (limit,))
+    else:
+        cursor.execute("""
+            SELECT id, name, email, phone, website, status,
+                   date_added, date_called, date_emailed, touch_count, 'Email' AS action
+            FROM contacts WHERE id < ? ORDER BY id DESC LIMIT ?
+        """, (before_id, limit))
+    return cursor.fetchall()
+
+@_on_shards
+def get_contacts_page_above(cursor, after_id, limit=PAGE_SIZE):
+    """Previous page going up the list: rows with id > after_id, still in list order."""
+    cursor.execute("""
+        SELECT id, name, email, phone, website, status,
+               date_added, date_called, date_emailed, touch_count, 'Email' AS action
+        FROM contacts WHERE id > ? ORDER BY id ASC LIMIT ?
+    """, (after_id, limit))
+    return cursor.fetchall()[::-1]
+
+@_on_shards
+def list_contacts_page(cursor, before_id=None, limit=PAGE_SIZE, status=None, date_from=None, date_to=None):
+    """
+    LIST_COLUMNS rows (no action column), newest first, filtered like
+    stream_contacts(). The primary key is walked downwards from before_id,
+    so every page costs the same however deep it is.
+    """
+    where, params = _contact_filter(status, date_from, date_to)
+    if before_id is not None:
+        where.append("id < ?"); params.append(before_id)
+    cursor.execute(f"""
+        SELECT {', '.join(LIST_COLUMNS)} FROM contacts
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY id DESC LIMIT ?
+    """, params + [limit])
+    return cursor.fetchall()
+
+def count_contacts_between(cursor, column, since=None, until=None):
+    """Contacts whose `column` (one of DATE_COLUMNS) falls from since to until, inclusive; counted on its index."""
+    where, params = _date_range(column, since, until)
+    cursor.execute(f"SELECT COUNT(*) FROM contacts WHERE {column} IS NOT NULL "
+                   + "".join(" AND " + w for w in where), params)
+    return cursor.fetchone()[0]
+
+def get_contacts_between(cursor, column, since=None, until=None, before=None, limit=PAGE_SIZE):
+    """
+    Up to `limit` contacts (list query shape) whose `column` falls from since
+    to until, latest first, e.g. emailed in the last 30 days:
+
+        get_contacts_between(cursor, "date_emailed", days_ago(29))
+
+    Pages are read by keyset on the index: `before` is the (date, id) of the
+    last row of the previous page.
+    """
+    where, params = _date_range(column, since, until)
+    where.append(f"{column} IS NOT NULL")
+    if before is not None:
+        where.append(f"({column} < ? OR ({column} = ? AND id < ?))")
+        params += [before[0], before[0], before[1]]
+    cursor.execute(f"""
+        SELECT id, name, email, phone, website, status,
+               date_added, date_called, date_emailed, touch_count, 'Email' AS action
+        FROM contacts INDEXED BY idx_contacts_{column}
+        WHERE {" AND ".join(where)}
+        ORDER BY {column} DESC, id DESC LIMIT ?
+    """, (*params, limit))
+    return cursor.fetchall()
+
+@_on_shards
+def get_contact_id_at(cursor, offset):
+    """
+    Id of the row at a list position, for a scrollbar jump. OFFSET still steps
+    over every row before it, so the cost grows with the position (about
+    linearly; no row data is read, only the rowid b-tree). Paging from there on
+    is keyset-based and doesn't pay it again.
+    """
+    cursor.execute("SELECT id FROM contacts ORDER BY id DESC LIMIT 1 OFFSET ?", (offset,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+# Search (FTS5 prefix match, newest first; LIKE scan if FTS5 is unavailable)
+SEARCH_LIMIT = 5000
+
+def search_terms(text):
+    """Split user input into word tokens, e.g. 'ali@exa' -> ['ali', 'exa']."""
+    return re.findall(r"[^\W_]+", text or "")
+
+def _search_sql(cursor, text):
+    # returns (FROM ..., WHERE ..., params, id column)
+    terms = search_terms(text)
+    if has_search_index(cursor):
+        match = " ".join('"%s"*' % t for t in terms)
+        return ("contacts_fts f JOIN contacts c ON c.id = f.rowid",
+                "contacts_fts MATCH ?", [match], "f.rowid")
+    fields = ("c.name", "c.email", "c.phone", "c.website", "c.notes")
+    where, params = [], []
+    for t in terms:
+        where.append("(" + " OR ".join(f"{f} LIKE ?" for f in fields) + ")")
+        params.extend(["%" + t + "%"] * len(fields))
+    return "contacts c", " AND ".join(where) or "1", params, "c.id"
+
+@_on_shards
+def count_search(cursor, text, limit=SEARCH_LIMIT):
+    """Number of matches, capped at `limit` so short prefixes stay cheap."""
+    if not search_terms(text):
+        return 0
+    frm, where, params, id_col = _search_sql(cursor, text)
+    cursor.execute(f"SELECT COUNT(*) FROM (SELECT {id_col} FROM {frm} WHERE {where} LIMIT ?)",
+                   params + [limit])
+    return cursor.fetchone()[0]
+
+@_on_shards
+def search_contacts_page(cursor, text, before_id=None, limit=PAGE_SIZE):
+    frm, where, params, id_col = _search_sql(cursor, text)
+    if before_id is not None:
+        where += f" AND {id_col} < ?"
+        params = params + [before_id]
+    cursor.execute(f"""
+        SELECT c.id, c.name, c.email, c.phone, c.website, c.status,
+               c.date_added, c.date_called, c.date_emailed, c.touch_count, 'Email' AS action
+        FROM {frm} WHERE {where} ORDER BY {id_col} DESC LIMIT ?
+    """, params + [limit])
+    return cursor.fetchall()
+
+@_on_shards
+def search_contacts_page_above(cursor, text, after_id, limit=PAGE_SIZE):
+    frm, where, params, id_col = _search_sql(cursor, text)
+    cursor.execute(f"""
+        SELECT c.id, c.name, c.email, c.phone, c.website, c.status,
+               c.date_added, c.date_called, c.date_emailed, c.touch_count, 'Email' AS action
+        FROM {frm} WHERE {where} AND {id_col} > ? ORDER BY {id_col} ASC LIMIT ?
+    """, params + [after_id, limit])
+    return cursor.fetchall()[::-1]
+
+@_on_shards
+def search_contact_id_at(cursor, text, offset):
+    frm, where, params, id_col = _search_sql(cursor, text)
+    cursor.execute(f"SELECT {id_col} FROM {frm} WHERE {where} ORDER BY {id_col} DESC LIMIT 1 OFFSET ?",
+                   params + [offset])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+@_on_shards
+def find_contact_by_email(cursor, email):
+    """Id of the contact with this email (case-insensitive), or None. Uses idx_contacts_email."""
+    cursor.execute("SELECT id FROM contacts WHERE lower(email) = lower(?) AND email <> ''", (email,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+# Streaming export
+EXPORT_COLUMNS = ("id", "name", "email", "phone", "website", "status", "notes",
+                  "date_added", "date_called", "date_emailed", "next_follow_up")
+
+@_on_shards
+def stream_contacts(cursor, status=None, date_from=None, date_to=None, chunk_size=1000,
+                    columns=EXPORT_COLUMNS, after_id=None):
+    """
+    Yield contact rows (`columns`, default EXPORT_COLUMNS) in id order, fetching
+    `chunk_size` rows at a time so memory stays flat on any table size.
+    date_from / date_to filter on date_added (inclusive, "YYYY-MM-DD" prefixes work);
+    after_id starts after that id.
+    """
+    where, params = _contact_filter(status, date_from, date_to)
+    if after_id is not None:
+        where.append("id > ?"); params.append(after_id)
+    sql = f"SELECT {', '.join(columns)} FROM contacts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cursor.execute(sql + " ORDER BY id", params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+@_on_shards
+def get_contacts_by_ids(cursor, ids):
+    """Full contact rows (EXPORT_COLUMNS order) for the ids that exist, in id order."""
+    rows = []
+    for chunk in _chunks([int(i) for i in ids]):
+        cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM contacts WHERE id IN ({','.join('?' * len(chunk))})",
+                       chunk)
+        rows.extend(cursor.fetchall())
+    rows.sort()
+    return rows
+
+def _contact_filter(status=None, date_from=None, date_to=None):
+    where, params = _date_range("date_added", date_from, date_to)
+    if status:
+        where.insert(0, "status = ?"); params.insert(0, status)
+    return where, params
+
+@_on_shards
 def get_contact_by_id(cursor, cid):
     cursor.execute("""
         SELECT name, email, phone, website, status, notes,
@@ -64,25 +969,319 @@ def get_contact_by_id(cursor, cid):
     """, (cid,))
     return cursor.fetchone()
 
-def insert_contact(cursor, conn, data):
+@_on_shards
+def get_contact_row(cursor, cid):
+    """One contact in the same shape as the list queries (for updating a single table row)."""
     cursor.execute("""
-        INSERT INTO contacts (name, email, phone, website, status, notes, date_added, date_called, date_emailed)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, data)
-    conn.commit()
+        SELECT id, name, email, phone, website, status,
+               date_added, date_called, date_emailed, touch_count, 'Email' AS action
+        FROM contacts WHERE id=?
+    """, (cid,))
+    return cursor.fetchone()
+
+@_on_shards
+def insert_contact(cursor, conn, data, cid=None):
+    """Returns the new contact id; `cid` picks it (sharded storage allocates ids itself)."""
+    data = _canonical_contact(data)
+    with transaction(conn):
+        cursor.execute("""
+            INSERT INTO contacts (id, name, email, phone, website, status, notes, date_added, date_called, date_emailed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (cid, *data))
+        cid = cursor.lastrowid
+        _log_changes(cursor, [(cid, (data[4], None, None), (data[4], data[7], data[8]))])
+        return cid
+
+@_on_shards
+def insert_contacts_many(cursor, conn, rows, ids=None):
+    """Insert contact tuples (insert_contact order) in one transaction; returns the number inserted.
+    Rows whose email already exists are skipped. `ids`: one id per row, as for insert_contact()."""
+    with transaction(conn):
+        return _insert_contact_rows(cursor, rows, ids)
+
+def _insert_contact_rows(cursor, rows, ids=None):
+    """
+    Insert many contact tuples (insert_contact order) without committing.
+    Rows whose email already exists are skipped by the unique email index.
+    Dates are converted to their stored form; one that can't be read is
+    left blank and its text added to the contact's notes.
+    Their call and email dates are logged as interactions. Returns the number
+    inserted. Explicit `ids` must all be above the table's current largest id.
 
+    The per-row FTS and dashboard triggers dominate bulk insert time, so they
+    are dropped for the batch, the new rows are indexed and counted with a few
+    INSERT ... SELECT statements, then the triggers are restored. All of it
+    happens in the caller's transaction, so other connections never see
+    contacts without their search rows or counts.
+    """
+    if not cursor.connection.in_transaction:
+        # sqlite3 does not open a transaction before DDL on its own
+        cursor.execute("BEGIN")
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM contacts")
+    last_id = cursor.fetchone()[0]
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' "
+                   "AND name IN ('contacts_fts_ai', 'contacts_summary_ai')")
+    triggers = dict(cursor.fetchall())
+    for name in triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+    rows = (_canonical_contact(row, strict=False) for row in rows)
+    if ids is None:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO contacts (name, email, phone, website, status, notes, date_added, date_called, date_emailed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    else:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO contacts (id, name, email, phone, website, status, notes, date_added, date_called,
+                                            date_emailed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ((cid, *row) for cid, row in zip(ids, rows)))
+    inserted = cursor.rowcount
+    if "contacts_fts_ai" in triggers:
+        cursor.execute("""
+            INSERT INTO contacts_fts (rowid, name, email, phone, website, notes)
+            SELECT id, name, email, phone, website, notes FROM contacts WHERE id > ?
+        """, (last_id,))
+    if "contacts_summary_ai" in triggers:
+        _add_to_summaries(cursor, "id > ?", (last_id,))
+    for sql in triggers.values():
+        cursor.execute(sql)
+    # imported call and email dates start the new contacts' history
+    _log_contact_dates(cursor, last_id, "Imported")
+    return inserted
+
+@_on_shards
+def existing_emails(cursor, emails):
+    """Lower-cased subset of `emails` already on a contact (index lookups, 500 per query)."""
+    emails = [e.lower() for e in emails if e]
+    found = set()
+    for chunk in _chunks(emails):
+        marks = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT lower(email) FROM contacts WHERE lower(email) IN ({marks}) AND email <> ''", chunk)
+        found.update(r[0] for r in cursor.fetchall())
+    return found
+
+@_on_shards
 def update_contact(cursor, conn, data):
-    cursor.execute("""
-        UPDATE contacts
-        SET name=?, email=?, phone=?, website=?, status=?, notes=?,
-            date_called=?, date_emailed=?
-        WHERE id=?
-    """, data)
-    conn.commit()
+    """
+    data ends with the contact id; returns that id, or None if no row matched.
+    A changed status, call date or email date is added to the contact's history.
+    """
+    data = _canonical_contact(data, DATE_COLUMNS[1:])
+    cid = int(data[-1])
+    with transaction(conn):
+        cursor.execute("SELECT status, date_called, date_emailed FROM contacts WHERE id=?", (cid,))
+        old = cursor.fetchone()
+        cursor.execute("""
+            UPDATE contacts
+            SET name=?, email=?, phone=?, website=?, status=?, notes=?,
+                date_called=?, date_emailed=?
+            WHERE id=?
+        """, data)
+        changed = cursor.rowcount
+        if changed and old:
+            _log_changes(cursor, [(cid, old, (data[4], data[6], data[7]))])
+    return cid if changed else None
 
+@_on_shards
+def update_status_many(cursor, conn, ids, status, date=None):
+    """
+    Set `status` on many contacts in one transaction; returns the number changed.
+    Contacts moved to a Called/Emailed status without a date for it get `date`
+    (default: today). The changes are added to each contact's history.
+    """
+    date = canonical_date(date) or days_ago(0)
+    called, emailed = "Called" in status, "Emailed" in status
+    changed = 0
+    with transaction(conn):
+        for chunk in _chunks([int(i) for i in ids]):
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id, status, date_called, date_emailed FROM contacts WHERE id IN ({marks})", chunk)
+            _log_changes(cursor, [(r[0], r[1:], (status, r[2] or (date if called else None),
+                                                 r[3] or (date if emailed else None)))
+                                  for r in cursor.fetchall()])
+            cursor.execute(f"""
+                UPDATE contacts
+                SET status=?,
+                    date_called = CASE WHEN ? AND date_called IS NULL THEN ? ELSE date_called END,
+                    date_emailed = CASE WHEN ? AND date_emailed IS NULL THEN ? ELSE date_emailed END
+                WHERE id IN ({",".join("?" * len(chunk))})
+            """, (status, called, date, emailed, date, *chunk))
+            changed += cursor.rowcount
+    return changed
+
+@_on_shards
+def mark_emailed(cursor, conn, ids, date=None, detail=None):
+    """
+    Record a sent email on many contacts in one transaction: sets date_emailed
+    (default: today), moves the status to Emailed, or Called and Emailed, and
+    logs an email interaction with `detail` (and the status change, if any).
+    Returns the number changed.
+    """
+    date = canonical_date(date)
+    ts = date or now_str()
+    date = date or days_ago(0)
+    new_status = "CASE WHEN status LIKE 'Called%' THEN 'Called and Emailed' ELSE 'Emailed' END"
+    changed = 0
+    with transaction(conn):
+        for chunk in _chunks([int(i) for i in ids]):
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT id, status, {new_status} FROM contacts WHERE id IN ({marks})", chunk)
+            # the email itself is logged below, with its detail
+            _log_changes(cursor, [(cid, (old, None, None), (new, None, None))
+                                  for cid, old, new in cursor.fetchall()])
+            cursor.execute(f"""
+                INSERT INTO interactions (contact_id, ts, kind, detail)
+                SELECT id, ?, 'email', ? FROM contacts WHERE id IN ({marks})
+            """, (ts, detail, *chunk))
+            cursor.execute(f"""
+                UPDATE contacts
+                SET date_emailed=?, status = {new_status}
+                WHERE id IN ({marks})
+            """, (date, *chunk))
+            changed += cursor.rowcount
+    return changed
+
+@_on_shards
 def delete_contact(cursor, conn, cid):
-    cursor.execute("DELETE FROM contacts WHERE id=?", (cid,))
-    conn.commit()
+    """Returns the deleted id, or None if no row matched."""
+    with transaction(conn):
+        cursor.execute("DELETE FROM contacts WHERE id=?", (cid,))
+        changed = cursor.rowcount
+    return int(cid) if changed else None
+
+@_on_shards
+def delete_contacts_many(cursor, conn, ids):
+    """Delete many contacts in one transaction; returns the ids that existed."""
+    deleted = []
+    with transaction(conn):
+        for chunk in _chunks([int(i) for i in ids]):
+            cursor.execute(f"DELETE FROM contacts WHERE id IN ({','.join('?' * len(chunk))}) RETURNING id", chunk)
+            deleted.extend(r[0] for r in cursor.fetchall())
+    return deleted
+
+# Interactions (append-only history, see _migration_interactions)
+@_on_shards
+def log_interaction(cursor, conn, cid, kind, detail=None, ts=None):
+    """Append an entry ("call", "email", "status", "note", ...) to a contact's history; returns its id."""
+    with transaction(conn):
+        cursor.execute("INSERT INTO interactions (contact_id, ts, kind, detail) VALUES (?, ?, ?, ?)",
+                       (int(cid), ts or now_str(), kind, detail))
+        return cursor.lastrowid
+
+def _log_changes(cursor, changes):
+    """
+    History entries for edits: changes are (id, (status, date_called, date_emailed)
+    before, the same after). A new call or email date is logged on that date.
+    """
+    rows, ts = [], now_str()
+    for cid, old, new in changes:
+        if new[0] != old[0] and old[0] is not None:
+            rows.append((cid, ts, "status", f"{old[0]} → {new[0]}"))
+        if new[1] and new[1] != old[1]:
+            rows.append((cid, new[1], "call", None))
+        if new[2] and new[2] != old[2]:
+            rows.append((cid, new[2], "email", None))
+    cursor.executemany("INSERT INTO interactions (contact_id, ts, kind, detail) VALUES (?, ?, ?, ?)", rows)
+
+def _log_contact_dates(cursor, after_id, detail):
+    # call and email entries from the date columns of contacts with id > after_id (bulk inserts);
+    # older files may hold '' for "no date", which is not one
+    cursor.execute("""
+        INSERT INTO interactions (contact_id, ts, kind, detail)
+        SELECT id, date_called, 'call', ? FROM contacts
+        WHERE id > ? AND NULLIF(trim(date_called), '') IS NOT NULL
+        UNION ALL
+        SELECT id, date_emailed, 'email', ? FROM contacts
+        WHERE id > ? AND NULLIF(trim(date_emailed), '') IS NOT NULL
+    """, (detail, after_id, detail, after_id))
+
+@_on_shards
+def get_timeline(cursor, cid, before=None, limit=PAGE_SIZE):
+    """
+    A contact's history, newest first, as (id, ts, kind, detail). For the next
+    page, pass the (ts, id) of the last row as `before`.
+    """
+    if before is None:
+        cursor.execute("""
+            SELECT id, ts, kind, detail FROM interactions WHERE contact_id = ?
+            ORDER BY ts DESC, id DESC LIMIT ?
+        """, (cid, limit))
+    else:
+        cursor.execute("""
+            SELECT id, ts, kind, detail FROM interactions
+            WHERE contact_id = ? AND ts <= ? AND (ts < ? OR id < ?)
+            ORDER BY ts DESC, id DESC LIMIT ?
+        """, (cid, before[0], before[0], before[1], limit))
+    return cursor.fetchall()
+
+@_on_shards
+def get_interaction_summary(cursor, cid):
+    """(touch_count, last_called, last_emailed) of a contact, or None."""
+    cursor.execute("SELECT touch_count, last_called, last_emailed FROM contacts WHERE id=?", (cid,))
+    return cursor.fetchone()
+
+def rebuild_interaction_summary(cursor, ids=None):
+    """Recompute the summary columns from the history (for `ids`, default every contact), without committing."""
+    sql = """
+        UPDATE contacts SET
+            touch_count = (SELECT COUNT(*) FROM interactions i
+                           WHERE i.contact_id = contacts.id AND i.kind IN ('call', 'email')),
+            last_called = (SELECT MAX(ts) FROM interactions i WHERE i.contact_id = contacts.id AND i.kind = 'call'),
+            last_emailed = (SELECT MAX(ts) FROM interactions i WHERE i.contact_id = contacts.id AND i.kind = 'email')
+    """
+    if ids is None:
+        cursor.execute(sql)
+        return
+    for chunk in _chunks([int(i) for i in ids]):
+        cursor.execute(sql + f" WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+# Follow-ups
+@_on_shards
+def set_follow_up(cursor, conn, ids, when):
+    """Schedule the next follow-up ("YYYY-MM-DD HH:MM:SS"; None clears it); returns the number changed."""
+    changed = 0
+    with transaction(conn):
+        for chunk in _chunks([int(i) for i in ids]):
+            cursor.execute(f"UPDATE contacts SET next_follow_up=? WHERE id IN ({','.join('?' * len(chunk))})",
+                           (when, *chunk))
+            changed += cursor.rowcount
+    return changed
+
+@_on_shards
+def get_follow_ups(cursor, after=None, until=None, limit=PAGE_SIZE):
+    """
+    Scheduled follow-ups as (next_follow_up, id, name), earliest first, read
+    from the follow-up index: the `limit` next ones after the (time, id) key
+    `after` (or from the start), up to and including time `until`.
+    """
+    where, params = ["next_follow_up IS NOT NULL"], []
+    if after is not None:
+        where.append("next_follow_up >= ? AND (next_follow_up > ? OR id > ?)")
+        params += [after[0], after[0], after[1]]
+    if until is not None:
+        where.append("next_follow_up <= ?")
+        params.append(until)
+    cursor.execute(f"""
+        SELECT next_follow_up, id, name FROM contacts
+        WHERE {" AND ".join(where)}
+        ORDER BY next_follow_up, id LIMIT ?
+    """, (*params, limit))
+    return cursor.fetchall()
+
+def get_follow_ups_by_ids(cursor, ids):
+    """{id: (next_follow_up, name)} for the contacts that still exist."""
+    found = {}
+    for chunk in _chunks([int(i) for i in ids]):
+        cursor.execute(f"SELECT id, next_follow_up, name FROM contacts WHERE id IN ({','.join('?' * len(chunk))})",
+                       chunk)
+        found.update((r[0], r[1:]) for r in cursor.fetchall())
+    return found
+
+def _chunks(items, size=500):
+    # stay well under SQLite's bound-parameter limit
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 # Templates
 def list_templates(cursor):
@@ -94,12 +1293,12 @@ def get_template_by_id(cursor, tid):
     return cursor.fetchone()
 
 def upsert_template(cursor, conn, tid, name, subject, body):
-    if tid:
-        cursor.execute("UPDATE templates SET name=?, subject=?, body=? WHERE id=?", (name, subject, body, tid))
-    else:
-        cursor.execute("INSERT INTO templates (name, subject, body) VALUES (?, ?, ?)", (name, subject, body))
-    conn.commit()
+    with transaction(conn):
+        if tid:
+            cursor.execute("UPDATE templates SET name=?, subject=?, body=? WHERE id=?", (name, subject, body, tid))
+        else:
+            cursor.execute("INSERT INTO templates (name, subject, body) VALUES (?, ?, ?)", (name, subject, body))
 
 def delete_template(cursor, conn, tid):
-    cursor.execute("DELETE FROM templates WHERE id=?", (tid,))
-    conn.commit()
+    with transaction(conn):
+        cursor.execute("DELETE FROM templates WHERE id=?", (tid,))
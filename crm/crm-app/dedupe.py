@@ -0,0 +1,456 @@
+# dedupe.py
+"""
+Duplicate-contact detection and merging.
+
+Comparing every pair of contacts is O(N²), so contacts are first grouped
+into blocks that share a normalized key, and only pairs inside a block are
+compared:
+
+    email     lower case, "+tag" dropped, dots ignored for Gmail
+    phone     digits only, last 10 (so "+1 (555) 010-9999" == "555.010.9999")
+    website   host without "www." plus path, no scheme or trailing slash
+    name      the first three letters of each word, sorted, so "Lovelace, Ada"
+              and "Ada Lovelce" share a block
+
+Two contacts in a block are duplicates when:
+
+    - their normalized emails are equal, or
+    - they share a phone or website and their names are similar
+      (difflib ratio of the normalized names >= --threshold, default 0.88), or
+    - they share a name block, their names are nearly equal (>= 0.90) and no
+      email or phone says they are different people.
+
+Blocks bigger than MAX_BLOCK (a common name, an office switchboard) say
+little and are skipped. Duplicates are chained into groups, except that a
+name-only match never joins groups holding different emails or phones.
+The oldest contact of a group is kept.
+
+Reading the keys and comparing the blocks run in a process pool. The keys
+go through a temporary table, so memory stays small on large tables and
+the database file is only read:
+
+    python3 dedupe.py -o merges.jsonl       # suggest merges, one group per line
+    python3 dedupe.py --apply merges.jsonl  # merge them (delete lines to skip a group)
+
+Applying merges every group in one transaction. The kept contact gets the
+blanks filled from the others, the most advanced status, the latest call
+and email dates, the earliest date added and follow-up; the others'
+notes and differing details are appended to its notes.
+"""
+
+import argparse, json, os, re, sys, unicodedata, zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+
+from db import (connect_db, transaction, get_contacts_by_ids, now_str, rebuild_interaction_summary,
+                ensure_unique_email_index, _chunks)
+
+EMAIL, PHONE, WEBSITE, NAME = 1, 2, 3, 4
+KINDS = {EMAIL: "email", PHONE: "phone", WEBSITE: "website", NAME: "name"}
+
+NAME_THRESHOLD = 0.88       # names of contacts sharing a phone or website
+NAME_ONLY_THRESHOLD = 0.90  # names of contacts that share nothing else
+MAX_BLOCK = 500             # bigger blocks are skipped
+KEY_CHUNK = 50_000          # contacts (by id range) per key-reading task
+COMPARE_CHUNK = 5_000       # contacts per block-comparing task
+MIN_PHONE_DIGITS = 7
+
+_NON_DIGIT = re.compile(r"\D+")
+_NON_WORD = re.compile(r"\W+")
+_GMAIL = ("gmail.com", "googlemail.com")
+# [scheme:][//][user@][www.]host[:port][/path] -> host, /path (cheaper than urlsplit)
+_URL = re.compile(r"(?:[a-z][a-z0-9+.\-]*:)?(?://)?(?:[^@/?#\s]*@)?(?:www\.)?([^:/?#\s]+)(?::\d*)?(/[^?#\s]*)?")
+
+
+# ---- normalizing ----
+def normalize_email(email):
+    email = (email or "").strip().lower()
+    local, _, domain = email.rpartition("@")
+    if not local or not domain:
+        return ""
+    local = local.split("+", 1)[0]
+    if domain in _GMAIL:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone):
+    digits = _NON_DIGIT.sub("", phone or "")
+    # the last 10 digits drop country codes and trunk prefixes ("+1", "0044", "0")
+    return digits[-10:] if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def normalize_website(url):
+    m = _URL.match((url or "").strip().lower())
+    return m.group(1) + (m.group(2) or "").rstrip("/") if m else ""
+
+
+def normalize_name(name):
+    """Lower-case words without accents or punctuation, sorted: "Lovelace, Ádá" -> "ada lovelace"."""
+    name = name or ""
+    if not name.isascii():
+        name = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c))
+    return " ".join(sorted(w for w in _NON_WORD.split(name.casefold()) if w))
+
+
+def normalized(row):
+    """(id, name, email, phone, website) -> (name, email, phone, website), normalized."""
+    return normalize_name(row[1]), normalize_email(row[2]), normalize_phone(row[3]), normalize_website(row[4])
+
+
+def blocking_keys(rec):
+    """(kind, key) pairs for a normalized record."""
+    name, email, phone, website = rec
+    keys = []
+    if email:
+        keys.append((EMAIL, email))
+    if phone:
+        keys.append((PHONE, phone))
+    if website:
+        keys.append((WEBSITE, website))
+    words = [w for w in name.split() if len(w) > 1]     # initials don't block
+    if len(words) > 1:
+        keys.append((NAME, "".join(sorted(w[:3] for w in words))))
+    return keys
+
+
+def key_hash(kind, key):
+    # 64 bits, stable across processes (unlike hash()); a collision only costs extra comparisons
+    data = f"{kind}:{key}".encode()
+    return (zlib.crc32(data) << 32 | zlib.adler32(data)) - (1 << 63)
+
+
+# ---- matching ----
+def name_similarity(a, b, cutoff=0.0):
+    if a == b:
+        return 1.0
+    m = SequenceMatcher(None, a, b, autojunk=False)
+    if m.real_quick_ratio() < cutoff or m.quick_ratio() < cutoff:
+        return 0.0
+    return m.ratio()
+
+
+def match(kind, a, b, threshold=NAME_THRESHOLD):
+    """(reason, score) if normalized records a and b from a `kind` block are duplicates, else None."""
+    if a[1] and a[1] == b[1]:
+        return "email", 1.0
+    if kind in (PHONE, WEBSITE):
+        if not a[0] or not b[0]:
+            return KINDS[kind], threshold
+        score = name_similarity(a[0], b[0], threshold)
+        return (KINDS[kind], score) if score >= threshold else None
+    if kind == NAME:
+        if (a[1] and b[1] and a[1] != b[1]) or (a[2] and b[2] and a[2] != b[2]):
+            return None
+        score = name_similarity(a[0], b[0], NAME_ONLY_THRESHOLD)
+        return ("name", score) if score >= NAME_ONLY_THRESHOLD else None
+    return None
+
+
+# ---- process pool workers ----
+_worker_cursor = None
+
+
+def _init_worker(path):
+    global _worker_cursor
+    _, _worker_cursor = connect_db(path, readonly=True)
+
+
+def _read_keys(lo, hi):
+    """Blocking keys of the contacts with lo <= id < hi, as (kinds, hashes, ids) arrays."""
+    kinds, hashes, ids = array("b"), array("q"), array("q")
+    _worker_cursor.execute("SELECT id, name, email, phone, website FROM contacts WHERE id >= ? AND id < ?", (lo, hi))
+    for row in _worker_cursor.fetchall():
+        for kind, key in blocking_keys(normalized(row)):
+            kinds.append(kind)
+            hashes.append(key_hash(kind, key))
+            ids.append(row[0])
+    return kinds, hashes, ids
+
+
+def _compare_blocks(blocks, threshold):
+    """
+    Duplicate pairs (a, b, reason, score) within each (kind, ids) block, the
+    normalized (email, phone) of every contact in a pair, and the number of
+    pairs compared.
+    """
+    wanted = {cid for _, ids in blocks for cid in ids}
+    recs = {}
+    for chunk in _chunks(sorted(wanted)):
+        _worker_cursor.execute("SELECT id, name, email, phone, website FROM contacts "
+                               f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        for row in _worker_cursor.fetchall():
+            recs[row[0]] = normalized(row)
+    pairs, compared = [], 0
+    for kind, ids in blocks:
+        for a, b in _block_pairs(kind, [cid for cid in ids if cid in recs], recs):
+            compared += 1
+            found = match(kind, recs[a], recs[b], threshold)
+            if found:
+                pairs.append((a, b) + found)
+    details = {}
+    for a, b, _, _ in pairs:
+        details[a], details[b] = recs[a][1:3], recs[b][1:3]
+    return pairs, details, compared
+
+
+def _block_pairs(kind, ids, recs):
+    # (a, b) with a < b; contacts with different emails can't match by name,
+    # so name blocks only pair contacts where at least one has no email
+    if kind == NAME:
+        others = [cid for cid in ids if recs[cid][1]]
+        ids = [cid for cid in ids if not recs[cid][1]]
+        for a in ids:
+            for b in others:
+                yield (a, b) if a < b else (b, a)
+    for i, a in enumerate(ids):
+        for b in ids[i + 1:]:
+            yield a, b
+
+
+# ---- finding ----
+class DedupeStats:
+    __slots__ = ("contacts", "keys", "blocks", "skipped", "pairs", "groups", "duplicates")
+
+    def __init__(self):
+        self.contacts = self.keys = self.blocks = self.pairs = self.groups = self.duplicates = 0
+        self.skipped = {}   # kind -> blocks over MAX_BLOCK
+
+    def __str__(self):
+        text = (f"{self.groups:,} groups, {self.duplicates:,} contacts to merge "
+                f"({self.contacts:,} contacts, {self.blocks:,} blocks, {self.pairs:,} pairs compared)")
+        if self.skipped:
+            text += "; skipped " + ", ".join(f"{n:,} {KINDS[k]} blocks" for k, n in sorted(self.skipped.items()))
+            text += f" over {MAX_BLOCK}"
+        return text
+
+
+def find_duplicates(path=None, workers=None, threshold=NAME_THRESHOLD, progress=None):
+    """
+    Returns (groups, stats). Each group is {"ids": [kept id, duplicate ids...],
+    "reasons": [...], "score": lowest pair score}, largest groups first.
+    progress(fraction, text) is called as the work advances.
+    """
+    conn, cursor = connect_db(path, readonly=True)
+    stats = DedupeStats()
+    report = progress or (lambda fraction, text: None)
+    try:
+        path = cursor.execute("PRAGMA database_list").fetchone()[2]
+        cursor.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM contacts")
+        lo, hi, stats.contacts = cursor.fetchone()
+        if not stats.contacts:
+            return [], stats
+        # a few million keys: keep them (and the GROUP BY sort) in a temp file, not in memory
+        cursor.execute("PRAGMA temp_store=FILE")
+        cursor.execute("CREATE TEMP TABLE dedupe_keys (kind INTEGER, k INTEGER, id INTEGER)")
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path,)) as pool:
+            ranges = range(lo, hi + 1, KEY_CHUNK)
+            for n, (kinds, hashes, ids) in enumerate(pool.map(_read_keys, ranges, [s + KEY_CHUNK for s in ranges])):
+                cursor.executemany("INSERT INTO dedupe_keys VALUES (?, ?, ?)", zip(kinds, hashes, ids))
+                stats.keys += len(ids)
+                report(0.4 * (n + 1) / len(ranges), f"Reading keys: {stats.keys:,}")
+
+            report(0.4, "Grouping blocks")
+            cursor.execute("""
+                SELECT kind, COUNT(*), CASE WHEN COUNT(*) <= ? THEN group_concat(id) END
+                FROM dedupe_keys GROUP BY kind, k HAVING COUNT(*) > 1
+            """, (MAX_BLOCK,))
+            tasks, batch, size = [], [], 0
+            for kind, n, ids in cursor:
+                if ids is None:
+                    stats.skipped[kind] = stats.skipped.get(kind, 0) + 1
+                    continue
+                stats.blocks += 1
+                batch.append((kind, sorted(map(int, ids.split(",")))))
+                size += n
+                if size >= COMPARE_CHUNK:
+                    tasks.append(pool.submit(_compare_blocks, batch, threshold))
+                    batch, size = [], 0
+            if batch:
+                tasks.append(pool.submit(_compare_blocks, batch, threshold))
+            cursor.execute("DROP TABLE dedupe_keys")
+
+            best, details = {}, {}
+            for n, task in enumerate(tasks):
+                pairs, found, compared = task.result()
+                details.update(found)
+                stats.pairs += compared
+                for a, b, reason, score in pairs:
+                    if best.get((a, b), ("", -1))[1] < score:
+                        best[a, b] = (reason, score)
+                report(0.4 + 0.6 * (n + 1) / len(tasks), f"Comparing blocks: {n + 1:,} of {len(tasks):,}")
+    finally:
+        conn.close()
+
+    groups = _group(best, details)
+    stats.groups = len(groups)
+    stats.duplicates = sum(len(g["ids"]) - 1 for g in groups)
+    report(1.0, str(stats))
+    return groups, stats
+
+
+def _group(pairs, details):
+    # union-find over the duplicate pairs; the smallest (oldest) id is each group's root.
+    # Name-only pairs come last and only join groups whose emails and phones agree.
+    parent = {}
+    known = {}      # root -> ({emails}, {phones}) of the group
+
+    def root(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def seen(r):
+        return known.get(r) or (set(), set())
+
+    def agree(a, b):
+        return not (a and b and a.isdisjoint(b))
+
+    strong = [p for p, (reason, _) in pairs.items() if reason != "name"]
+    weak = [p for p, (reason, _) in pairs.items() if reason == "name"]
+    for a, b in strong:
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    for x in details:
+        email, phone = details[x]
+        emails, phones = known.setdefault(root(x), (set(), set()))
+        if email:
+            emails.add(email)
+        if phone:
+            phones.add(phone)
+    for a, b in list(weak):
+        ra, rb = root(a), root(b)
+        (ea, pa), (eb, pb) = seen(ra), seen(rb)
+        if ra == rb:
+            continue
+        if not (agree(ea, eb) and agree(pa, pb)):
+            del pairs[a, b]
+            continue
+        keep, gone = min(ra, rb), max(ra, rb)
+        parent[gone] = keep
+        known[keep] = (ea | eb, pa | pb)
+        known.pop(gone, None)
+    members = {}
+    for x in parent:
+        members.setdefault(root(x), []).append(x)
+    groups = {r: {"ids": sorted(ids), "reasons": set(), "score": 1.0}
+              for r, ids in members.items() if len(ids) > 1}
+    for (a, _), (reason, score) in pairs.items():
+        g = groups[root(a)]
+        g["reasons"].add(reason)
+        g["score"] = min(g["score"], round(score, 3))
+    for g in groups.values():
+        g["reasons"] = sorted(g["reasons"])
+    return sorted(groups.values(), key=lambda g: (-len(g["ids"]), g["ids"][0]))
+
+
+# ---- merging ----
+def merge_rows(rows, keep):
+    """The merged EXPORT_COLUMNS row for `keep` from the full rows of one group."""
+    rows = sorted(rows, key=lambda r: r[0] != keep)     # the kept contact first
+    merged = list(rows[0])
+    notes = [merged[6]] if merged[6] else []
+    for r in rows[1:]:
+        for i in (1, 2, 3, 4):      # name, email, phone, website
+            if not merged[i] and r[i]:
+                merged[i] = r[i]
+        if r[6] and r[6] not in notes:
+            notes.append(r[6])
+        other = [v for i, v in ((2, r[2]), (3, r[3]), (4, r[4])) if v and v != merged[i]]
+        notes.append(f"Merged duplicate #{r[0]} on {now_str()[:10]}" + (": " + ", ".join(other) if other else ""))
+    statuses = {r[5] or "" for r in rows}
+    called = any("Called" in s for s in statuses)
+    emailed = any("Emailed" in s for s in statuses)
+    merged[5] = ("Called and Emailed" if called and emailed else "Called" if called
+                 else "Emailed" if emailed else merged[5])
+    merged[6] = "\n".join(notes) or None
+    merged[7] = min((r[7] for r in rows if r[7]), default=None)
+    merged[8] = max((r[8] for r in rows if r[8]), default=None)
+    merged[9] = max((r[9] for r in rows if r[9]), default=None)
+    merged[10] = min((r[10] for r in rows if r[10]), default=None)
+    return merged
+
+
+def apply_merges(conn, cursor, groups):
+    """
+    Merge each group (a list of ids, the first one kept) in one transaction;
+    ids that no longer exist are ignored. Returns (groups merged, contacts removed).
+    """
+    merged = removed = 0
+    with transaction(conn):
+        for ids in groups:
+            keep = int(ids[0])
+            rows = get_contacts_by_ids(cursor, ids)
+            if len(rows) < 2 or not any(r[0] == keep for r in rows):
+                continue
+            row = merge_rows(rows, keep)
+            drop = [r[0] for r in rows if r[0] != keep]
+            # the kept contact takes over their history before they go (deleting a
+            # contact deletes its interactions); delete first: the kept contact may
+            # take over an email from the unique index
+            for chunk in _chunks(drop):
+                marks = ",".join("?" * len(chunk))
+                cursor.execute(f"UPDATE interactions SET contact_id=? WHERE contact_id IN ({marks})", [keep, *chunk])
+                cursor.execute(f"DELETE FROM contacts WHERE id IN ({marks})", chunk)
+            cursor.execute("""
+                UPDATE contacts SET name=?, email=?, phone=?, website=?, status=?, notes=?,
+                       date_added=?, date_called=?, date_emailed=?, next_follow_up=?
+                WHERE id=?
+            """, row[1:] + [keep])
+            rebuild_interaction_summary(cursor, [keep])
+            merged += 1
+            removed += len(drop)
+        # a file upgraded with duplicate emails gets its unique index once they are gone
+        ensure_unique_email_index(cursor)
+    return merged, removed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Find duplicate contacts and merge them.")
+    ap.add_argument("-o", "--output", default="-", help="write the suggested merges here, one JSON group per line "
+                                                        "(default: stdout)")
+    ap.add_argument("--apply", metavar="MERGES", help="merge the groups in this file instead")
+    ap.add_argument("--threshold", type=float, default=NAME_THRESHOLD,
+                    help=f"name similarity for contacts sharing a phone or website (default {NAME_THRESHOLD})")
+    ap.add_argument("--workers", type=int, help="processes to use (default: one per CPU)")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    if args.apply:
+        with open(args.apply, encoding="utf-8") as f:
+            groups = [json.loads(line)["ids"] for line in f if line.strip()]
+        conn, cursor = connect_db(args.db)
+        try:
+            merged, removed = apply_merges(conn, cursor, groups)
+        finally:
+            conn.close()
+        print(f"{merged:,} groups merged, {removed:,} contacts removed", file=sys.stderr)
+        return 0
+
+    def report(fraction, text):
+        print(f"\r{int(fraction * 100):3d}%  {text:<60}", end="", file=sys.stderr, flush=True)
+
+    if args.db and not os.path.exists(args.db):
+        ap.error(f"no such database: {args.db}")
+    groups, stats = find_duplicates(args.db, args.workers, args.threshold, report)
+    print(file=sys.stderr)
+    conn, cursor = connect_db(args.db, readonly=True)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for g in groups:
+            # the contacts themselves, for reviewing the file before --apply
+            g["contacts"] = [list(r[:5]) for r in get_contacts_by_ids(cursor, g["ids"])]
+            out.write(json.dumps(g, ensure_ascii=False) + "\n")
+    finally:
+        conn.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
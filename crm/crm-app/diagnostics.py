@@ -0,0 +1,247 @@
+# diagnostics.py
+"""
+Opt-in timing of SQL statements, GUI actions and Tk event handlers.
+
+Off unless the app starts with MINICRM_PROFILE=1. Then:
+
+  - connect_db() returns connections whose cursors time every statement
+    (execute plus the fetches that read its rows), keyed by the SQL text;
+  - span("load_contacts") ... .end() times a GUI action from the event to
+    the callback that shows its result, across the database thread;
+  - every Tk callback (bindings, commands, after() jobs) is timed;
+  - anything slower than MINICRM_SLOW_MS (default 50) is written to a
+    rotating log, minicrm-perf.log next to the database (or
+    MINICRM_PROFILE_LOG), and a p50/p95/p99 summary is written on exit.
+
+Help > Diagnostics shows the same summary and the slowest statements live.
+When profiling is off, connect_db() uses plain sqlite3 connections and
+span() returns a shared no-op, so the cost is one flag check per action.
+"""
+
+import logging, logging.handlers, os, re, sqlite3, threading, time
+from collections import deque
+
+ENABLED = os.environ.get("MINICRM_PROFILE", "") not in ("", "0")
+SLOW_MS = float(os.environ.get("MINICRM_SLOW_MS", 50))
+SAMPLES = 2000          # most recent timings kept per name for the percentiles
+SLOW_KEPT = 200         # most recent slow events kept for the panel
+
+log = logging.getLogger("minicrm.perf")
+clock = time.perf_counter
+
+
+class Recorder:
+    """Thread-safe store of recent timings per name, plus the recent slow events."""
+
+    def __init__(self, samples=SAMPLES, slow_ms=SLOW_MS):
+        self.samples = samples
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats = {}        # name -> [count, total_ms, max_ms, deque of recent ms]
+        self.slow = deque(maxlen=SLOW_KEPT)     # (wall time, kind, name, ms)
+
+    def add(self, kind, name, ms):
+        key = f"{kind}: {name}"
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None:
+                st = self._stats[key] = [0, 0.0, 0.0, deque(maxlen=self.samples)]
+            st[0] += 1
+            st[1] += ms
+            st[2] = max(st[2], ms)
+            st[3].append(ms)
+            if ms >= self.slow_ms:
+                self.slow.append((time.time(), kind, name, ms))
+        if ms >= self.slow_ms:
+            log.warning("slow %s %.1f ms: %s", kind, ms, name)
+
+    def summary(self):
+        """Rows of (name, count, p50, p95, p99, max, total) in ms, slowest total first."""
+        with self._lock:
+            items = [(k, st[0], st[1], st[2], sorted(st[3])) for k, st in self._stats.items()]
+        rows = [(k, n, _pct(s, 50), _pct(s, 95), _pct(s, 99), mx, total) for k, n, total, mx, s in items]
+        rows.sort(key=lambda r: r[6], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow.clear()
+
+
+def _pct(values, p):
+    # nearest-rank percentile of sorted values
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))]
+
+
+recorder = Recorder()
+
+
+# ---- spans ----
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = clock()
+
+    def end(self):
+        recorder.add("action", self.name, (clock() - self.start) * 1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Start timing `name`; call .end() when done (or use it as a with block)."""
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+# ---- SQL ----
+_WS = re.compile(r"\s+")
+
+
+def _statement(sql):
+    return _WS.sub(" ", sql).strip()[:200]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records each statement's time, including reading its rows."""
+
+    def _timed(self, fn, sql, *args):
+        self._sql = _statement(sql)
+        t = clock()
+        try:
+            return fn(sql, *args)
+        finally:
+            recorder.add("sql", self._sql, (clock() - t) * 1000)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._timed(super().executescript, sql_script)
+
+    def _fetch(self, fn, *args):
+        t = clock()
+        try:
+            return fn(*args)
+        finally:
+            ms = (clock() - t) * 1000
+            if ms >= 0.05:  # fetching a row that execute() already stepped to is not worth a sample
+                recorder.add("fetch", getattr(self, "_sql", "?"), ms)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (and conn.execute) are TimedCursors; commits are timed too."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        t = clock()
+        try:
+            super().commit()
+        finally:
+            recorder.add("sql", "COMMIT", (clock() - t) * 1000)
+
+
+def connection_factory():
+    """factory= for sqlite3.connect(): TimedConnection when profiling, else the default."""
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+# ---- Tk ----
+def instrument_tk():
+    """Time every Tk callback (commands, bindings, after() jobs) by wrapping tkinter.CallWrapper."""
+    if not ENABLED:
+        return
+    import tkinter
+    wrapper = tkinter.CallWrapper
+    if getattr(wrapper, "_minicrm_timed", False):
+        return
+    call = wrapper.__call__
+
+    def timed_call(self, *args):
+        t = clock()
+        try:
+            return call(self, *args)
+        finally:
+            func = self.func
+            name = getattr(func, "__qualname__", None) or repr(func)
+            recorder.add("tk", f"{getattr(func, '__module__', '') or ''}.{name}".lstrip("."),
+                         (clock() - t) * 1000)
+
+    wrapper.__call__ = timed_call
+    wrapper._minicrm_timed = True
+
+
+# ---- log ----
+def start(db_path, max_bytes=1_000_000, backups=3):
+    """Set up the rotating log (and Tk timing) when profiling is on; returns the log path or None."""
+    if not ENABLED:
+        return None
+    path = os.environ.get("MINICRM_PROFILE_LOG") or os.path.join(
+        os.path.dirname(os.path.abspath(db_path)), "minicrm-perf.log")
+    if not log.handlers:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    instrument_tk()
+    log.info("profiling on (slow threshold %.0f ms)", SLOW_MS)
+    return path
+
+
+def log_summary(limit=40):
+    """Write the p50/p95/p99 table to the log (called on exit)."""
+    if not ENABLED:
+        return
+    lines = [f"{'ms':>8} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  name"]
+    for name, n, p50, p95, p99, mx, total in recorder.summary()[:limit]:
+        lines.append(f"{total:8.0f} {n:7d} {p50:8.2f} {p95:8.2f} {p99:8.2f} {mx:8.1f}  {name}")
+    log.info("summary (total ms, slowest first):\n%s", "\n".join(lines))
@@ -0,0 +1,85 @@
+# exporter.py
+"""
+Streaming contact export to CSV or JSON Lines.
+
+Rows are read with fetchmany() and written as they arrive, so memory use is
+the same for ten contacts or ten million. Runs headless:
+
+    python3 exporter.py -o contacts.csv
+    python3 exporter.py --format jsonl --status "Not Contacted" --from 2025-01-01 > leads.jsonl
+"""
+
+import argparse, csv, json, os, sys
+
+from db import connect_db, canonical_date, stream_contacts, EXPORT_COLUMNS
+
+FORMATS = ("csv", "jsonl")
+
+
+def export_contacts(cursor, out, fmt="csv", status=None, date_from=None, date_to=None,
+                    progress=None, cancel=None, every=10000):
+    """
+    Write contacts to the open text file `out`; returns the number of rows written.
+        - progress(rows_written) is called every `every` rows
+        - cancel: optional threading.Event checked at the same points
+    """
+    rows = stream_contacts(cursor, status, date_from, date_to)
+    return write_rows(rows, out, fmt, progress, cancel, every)
+
+
+def write_rows(rows, out, fmt="csv", progress=None, cancel=None, every=10000):
+    """Write EXPORT_COLUMNS rows from any iterable (e.g. shards.ShardedDB.stream_contacts()), as above."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r} (use csv or jsonl).")
+    n = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        write = writer.writerow
+    else:
+        dumps = json.dumps
+        write = lambda r: out.write(dumps(dict(zip(EXPORT_COLUMNS, r)), ensure_ascii=False) + "\n")
+    for r in rows:
+        write(r)
+        n += 1
+        if n % every == 0:
+            if progress:
+                progress(n)
+            if cancel is not None and cancel.is_set():
+                break
+    if progress:
+        progress(n)
+    return n
+
+
+def format_for(path, default="csv"):
+    ext = os.path.splitext(path or "")[1].lower()
+    return {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}.get(ext, default)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export contacts to CSV or JSON Lines.")
+    ap.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    ap.add_argument("--format", choices=FORMATS, help="default: from the output extension, else csv")
+    ap.add_argument("--status", help='only contacts with this status, e.g. "Not Contacted"')
+    ap.add_argument("--from", dest="date_from", type=canonical_date, help="date_added on or after (YYYY-MM-DD)")
+    ap.add_argument("--to", dest="date_to", type=canonical_date, help="date_added on or before (YYYY-MM-DD)")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or format_for(args.output)
+    conn, cursor = connect_db(args.db)
+    try:
+        if args.output == "-":
+            n = export_contacts(cursor, sys.stdout, fmt, args.status, args.date_from, args.date_to)
+        else:
+            with open(args.output, "w", newline="", encoding="utf-8") as out:
+                n = export_contacts(cursor, out, fmt, args.status, args.date_from, args.date_to)
+    finally:
+        conn.close()
+    print(f"{n:,} contacts exported", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
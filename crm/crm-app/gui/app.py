@@ -1,17 +1,24 @@
 # gui/app.py
 import tkinter as tk
-from tkinter import ttk
-from db import connect_db
+from tkinter import ttk, messagebox
+from db import get_follow_ups, now_str
+from gui.db_executor import DBExecutor
 from templates import TemplateManager
+from template_engine import TemplateEngine
+from contact_repository import ContactRepository
 from gui.common import apply_theme
 from gui.contact_view import ContactView
-from gui.template_view import TemplateView
+from gui.diagnostics_view import open_diagnostics
+from gui.reminder_view import ReminderScheduler, FollowUpsWindow
+import diagnostics, json, time
 
 class CRMApp:
-    def __init__(self):
-        self.conn, self.cursor = connect_db()
-        self.tm = TemplateManager(self.conn, self.cursor)
-
+    def __init__(self, measure_startup=None):
+        # measure_startup: time.perf_counter() at process start (see crm.py --startup-time);
+        # the app then prints how long each startup step took and quits at the first page
+        self._started = measure_startup
+        self._timings = {}
+        self._mark("imports")
         self.root = tk.Tk()
         self.root.title("Ali's Mini CRM")
         screen_width = self.root.winfo_screenwidth()
@@ -22,20 +29,132 @@ class CRMApp:
         # apply theme / styling
         apply_theme(self.root)
 
+        # all database access runs on this worker thread (see gui/db_executor.py)
+        self.db = DBExecutor(self.root)
+        # MINICRM_PROFILE=1: time statements, actions and Tk handlers (see diagnostics.py)
+        self.perf_log = diagnostics.start(self.db.pool.path)
+        # neither constructor queries, so nothing here waits on the database thread
+        self.tm = TemplateManager(self.db.conn, self.db.cursor)
+        self.engine = TemplateEngine(self.tm)
+        self.contacts = ContactRepository(self.db.conn, self.db.cursor)
+        self.template_view = None
+        self.dashboard_view = None
+        self.follow_ups_window = None
+        self._mark("database")
+
     def run(self):
-        notebook = ttk.Notebook(self.root)
+        self.notebook = notebook = ttk.Notebook(self.root)
         contacts_tab = ttk.Frame(notebook)
-        templates_tab = ttk.Frame(notebook)
+        self.templates_tab = ttk.Frame(notebook)
+        self.dashboard_tab = ttk.Frame(notebook)
         notebook.add(contacts_tab, text="Contacts")
-        notebook.add(templates_tab, text="Templates")
+        notebook.add(self.templates_tab, text="Templates")
+        notebook.add(self.dashboard_tab, text="Dashboard")
         notebook.pack(fill="both", expand=True)
+        # the Templates and Dashboard tabs are built the first time they are opened
+        notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         # create views
-        self.contact_view = ContactView(contacts_tab, self.conn, self.cursor, self.tm)
+        self.contact_view = ContactView(contacts_tab, self.db, self.engine, self.contacts,
+                                        on_follow_ups_changed=self._follow_ups_changed)
         self.contact_view.pack(fill="both", expand=True)
+        # follow-up reminders: one timer for the next due follow-up (see gui/reminder_view.py)
+        self.reminders = ReminderScheduler(self.root, self.db, on_due=self._follow_ups_due)
+
+        self._build_menu()
+        self._mark("widgets")
+
+        # the first page is read once the window is on screen, not before it
+        self._map_binding = self.root.bind("<Map>", self._on_first_map, add="+")
 
-        self.template_view = TemplateView(templates_tab, self.tm, on_templates_changed=self.contact_view.refresh_templates)
-        self.template_view.pack(fill="both", expand=True)
+        # imports and campaigns interrupted by a crash or quit can pick up where they stopped
+        if self._started is None:
+            self.root.after(500, lambda: self.contact_view.resume_jobs(quiet=True))
+            self.root.after(1000, self.reminders.start)
 
         # start
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.db.close()
+            diagnostics.log_summary()
+
+    def _on_first_map(self, event):
+        if event.widget is not self.root:
+            return  # <Map> on the root also fires for every child widget
+        self.root.unbind("<Map>", self._map_binding)
+        self._mark("window")
+        self.root.after_idle(self.contact_view.load_contacts, self._first_page_shown)
+
+    def _first_page_shown(self):
+        self._mark("first_page")
+        if self._started is not None:
+            print(json.dumps({k: round(v * 1000, 1) for k, v in self._timings.items()}), flush=True)
+            self.root.after_idle(self.root.destroy)
+
+    def _follow_ups_changed(self, ids, when):
+        if ids is None:
+            self.reminders.reload()
+        else:
+            self.reminders.schedule(ids, when)
+
+    def _follow_ups_due(self, due):
+        if self.follow_ups_window is None or not self.follow_ups_window.exists():
+            self.follow_ups_window = FollowUpsWindow(self.root, on_open=self.contact_view.show_contact,
+                                                     on_reschedule=self.contact_view.set_follow_up)
+        self.follow_ups_window.add(due)
+
+    def show_due_follow_ups(self):
+        def loaded(rows):
+            if rows:
+                self._follow_ups_due(rows)
+            else:
+                messagebox.showinfo("Follow-Ups", "No follow-ups are due.")
+        self.db.submit(get_follow_ups, self.db.cursor, None, now_str(), FollowUpsWindow.MAX_ROWS, callback=loaded)
+
+    def _on_tab_changed(self, event=None):
+        if self.template_view is None and self.notebook.select() == str(self.templates_tab):
+            from gui.template_view import TemplateView
+            self.template_view = TemplateView(self.templates_tab, self.db, self.tm,
+                                              on_templates_changed=self.contact_view.refresh_templates)
+            self.template_view.pack(fill="both", expand=True)
+        elif self.notebook.select() == str(self.dashboard_tab):
+            # read from the summary tables, so cheap enough to redo on every visit
+            if self.dashboard_view is None:
+                from gui.dashboard_view import DashboardView
+                self.dashboard_view = DashboardView(self.dashboard_tab, self.db)
+                self.dashboard_view.pack(fill="both", expand=True)
+            self.dashboard_view.refresh()
+
+    # backup.py (hashlib, zlib) is only imported when a backup is asked for
+    def back_up_database(self):
+        from gui.backup_view import back_up_database
+        back_up_database(self.root, self.db.pool)
+
+    def take_snapshot(self):
+        from gui.backup_view import take_snapshot
+        take_snapshot(self.root, self.db.pool)
+
+    def _mark(self, step):
+        # startup milestones in seconds since process start, kept only when measuring
+        if self._started is not None:
+            self._timings[step] = time.perf_counter() - self._started
+
+    def _build_menu(self):
+        menubar = tk.Menu(self.root)
+        file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Import Contacts from CSV...", command=self.contact_view.import_csv)
+        file_menu.add_command(label="Export Contacts...", command=self.contact_view.export_contacts)
+        file_menu.add_separator()
+        file_menu.add_command(label="Email Campaign...", command=self.contact_view.send_campaign)
+        file_menu.add_separator()
+        file_menu.add_command(label="Resume Unfinished Jobs...", command=self.contact_view.resume_jobs)
+        file_menu.add_command(label="Follow-Ups Due...", command=self.show_due_follow_ups)
+        file_menu.add_separator()
+        file_menu.add_command(label="Back Up Database...", command=self.back_up_database)
+        file_menu.add_command(label="Take Snapshot...", command=self.take_snapshot)
+        menubar.add_cascade(label="File", menu=file_menu)
+        help_menu = tk.Menu(menubar, tearoff=0)
+        help_menu.add_command(label="Diagnostics...", command=lambda: open_diagnostics(self.root, self.perf_log))
+        menubar.add_cascade(label="Help", menu=help_menu)
+        self.root.config(menu=menubar)
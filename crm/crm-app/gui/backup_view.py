@@ -0,0 +1,51 @@
+# gui/backup_view.py
+"""
+File > Back Up Database / Take Snapshot: backup.py on a background thread
+with a progress window. The copy reads through a pooled read-only
+connection, so contacts can be edited while it runs. Restoring is left to
+`python3 backup.py restore`, with the app closed.
+"""
+
+from tkinter import filedialog, messagebox
+
+import backup
+from gui.common import run_in_thread, ProgressDialog
+
+
+def _run(root, pool, title, text, work, finished):
+    dlg = ProgressDialog(root, title, text)
+
+    def job(report):
+        with pool.reader() as (conn, cursor):
+            return work(conn, report, dlg.cancelled)
+
+    def done(result, error):
+        dlg.close()
+        if isinstance(error, backup.BackupCancelled):
+            return
+        if error:
+            messagebox.showerror(title, f"The backup failed:\n{error}")
+        else:
+            messagebox.showinfo(title, finished(result))
+
+    run_in_thread(root, job, on_progress=dlg.update, on_done=done)
+
+
+def back_up_database(root, pool):
+    path = filedialog.asksaveasfilename(parent=root, title="Back Up Database", defaultextension=".db",
+                                        initialfile="contacts-backup.db", filetypes=[("SQLite database", "*.db")])
+    if not path:
+        return
+    _run(root, pool, "Back Up Database", "Copying to " + path,
+         lambda conn, report, cancel: backup.copy_database(conn, path, report, cancel),
+         lambda size: f"Backed up {size / 1e6:,.1f} MB to {path}.")
+
+
+def take_snapshot(root, pool):
+    directory = filedialog.askdirectory(parent=root, title="Snapshot Folder")
+    if not directory:
+        return
+    _run(root, pool, "Take Snapshot", "Snapshot into " + directory,
+         lambda conn, report, cancel: backup.take_snapshot(conn, directory, report, cancel),
+         lambda m: f"Snapshot {m['name']} taken: {m['new_bytes'] / 1e6:,.1f} MB stored "
+                   f"for {m['size'] / 1e6:,.1f} MB of data.")
@@ -0,0 +1,96 @@
+# gui/campaign_dialog.py
+"""
+Modal dialog for an email campaign: which template, which contacts, and the
+SMTP server to send through (pre-filled from the MINICRM_SMTP_* variables).
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from gui.common import PALETTE, style_tk_widget
+from campaign import SMTPSettings
+
+ALL = "All contacts"
+
+
+def campaign_dialog(root, templates, statuses):
+    """
+    Arguments:
+        - root: Toplevel parent
+        - templates: rows of (id, name, subject, body)
+        - statuses: status values offered as the contact filter
+    Returns:
+        (template row, status or None, SMTPSettings, max emails per second or None)
+        or None if cancelled
+    """
+    if not templates:
+        messagebox.showwarning("No templates", "Create a template first in the Templates tab.")
+        return None
+
+    defaults = SMTPSettings()
+    dlg = tk.Toplevel(root)
+    dlg.title("Email Campaign")
+    dlg.transient(root)
+    dlg.grab_set()
+
+    form = tk.Frame(dlg, padx=12, pady=10)
+    form.pack(fill="both", expand=True)
+
+    def row(r, label, widget):
+        tk.Label(form, text=label).grid(row=r, column=0, sticky="e", pady=3)
+        widget.grid(row=r, column=1, sticky="we", padx=6, pady=3)
+        if isinstance(widget, tk.Entry):
+            style_tk_widget(widget)
+        return widget
+
+    names = [t[1] or "(no name)" for t in templates]
+    tpl_combo = row(0, "Template:", ttk.Combobox(form, values=names, state="readonly", width=34))
+    tpl_combo.current(0)
+    status_combo = row(1, "Send to:", ttk.Combobox(form, values=[ALL] + list(statuses), state="readonly", width=34))
+    status_combo.set("Not Contacted" if "Not Contacted" in statuses else ALL)
+
+    ttk.Separator(form).grid(row=2, column=0, columnspan=2, sticky="we", pady=8)
+    sender = row(3, "From:", tk.Entry(form, width=36))
+    sender.insert(0, defaults.sender)
+    host = row(4, "SMTP server:", tk.Entry(form, width=36))
+    host.insert(0, defaults.host)
+    port = row(5, "Port:", tk.Entry(form, width=36))
+    port.insert(0, str(defaults.port))
+    user = row(6, "Username:", tk.Entry(form, width=36))
+    user.insert(0, defaults.user)
+    password = row(7, "Password:", tk.Entry(form, width=36, show="*"))
+    password.insert(0, defaults.password)
+    starttls = tk.BooleanVar(value=defaults.starttls)
+    tk.Checkbutton(form, text="Use STARTTLS", variable=starttls).grid(row=8, column=1, sticky="w")
+    rate = row(9, "Max emails/second:", tk.Entry(form, width=36))
+    rate.insert(0, "0")
+    tk.Label(form, text="0 = no limit; many providers cap sending rates").grid(row=10, column=1, sticky="w")
+
+    result = {"value": None}
+
+    def send():
+        if not sender.get().strip():
+            messagebox.showwarning("Missing sender", "Enter a From address.", parent=dlg)
+            return
+        try:
+            port_no = int(port.get())
+            max_rate = float(rate.get() or 0)
+        except ValueError:
+            messagebox.showwarning("Invalid number", "Port and rate must be numbers.", parent=dlg)
+            return
+        status = status_combo.get()
+        settings = SMTPSettings(host.get().strip(), port_no, sender.get().strip(),
+                                user.get().strip(), password.get(), starttls.get())
+        result["value"] = (templates[tpl_combo.current()], None if status == ALL else status, settings,
+                           max_rate or None)
+        dlg.destroy()
+
+    btn_row = tk.Frame(dlg)
+    btn_row.pack(fill="x", padx=12, pady=8)
+    tk.Button(btn_row, text="Send", bg=PALETTE.get("BTN_BG", "#D5D8DA"),
+              fg=PALETTE.get("BTN_FG", "#202124"), command=send).pack(side="left")
+    tk.Button(btn_row, text="Cancel", bg=PALETTE.get("BTN_BG", "#D5D8DA"),
+              fg=PALETTE.get("BTN_FG", "#202124"), command=dlg.destroy).pack(side="right")
+
+    dlg.wait_window()
+    return result["value"]
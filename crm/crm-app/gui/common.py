@@ -6,10 +6,13 @@ This file:
  - forces a neutral light/grey QuickBooks-like theme so Dark Mode won't change it
  - exposes style_tk_widget() for plain tk widgets
  - exposes apply_tree_row_striping() to stripe treeview rows
- - exposes choose_template_dialog(root, template_manager) used by ContactView
+ - exposes choose_template_dialog(root, templates) used by ContactView
+ - exposes run_in_thread() and ProgressDialog for long jobs (imports, exports)
 """
 
+import queue
 import subprocess
+import threading
 import tkinter as tk
 from tkinter import ttk, font, messagebox
 
@@ -118,21 +121,15 @@ def apply_tree_row_striping(tree, even_bg="#FFFFFF", odd_bg="#F3F3F3"):
     except Exception:
         pass
 
-def choose_template_dialog(root, template_manager):
+def choose_template_dialog(root, templates):
     """
     Modal dialog for choosing a template.
     Arguments:
         - root: the application root (Toplevel parent)
-        - template_manager: an instance with list() and get(tid)
+        - templates: rows of (id, name, subject, body), e.g. TemplateEngine.list()
     Returns:
-        (subject, body) or None
+        the chosen row, or None
     """
-    try:
-        templates = template_manager.list()
-    except Exception as e:
-        messagebox.showerror("Templates Error", f"Could not load templates: {e}")
-        return None
-
     if not templates:
         messagebox.showwarning("No templates", "Create a template first in the Templates tab.")
         return None
@@ -147,9 +144,7 @@ def choose_template_dialog(root, template_manager):
     box = tk.Listbox(dlg, height=14)
     box.pack(fill="both", expand=True, padx=10, pady=5)
 
-    modal_ids = []
     for t in templates:
-        modal_ids.append(t[0])
         name = t[1] if t[1] else "(no name)"
         box.insert(tk.END, name)
 
@@ -160,14 +155,7 @@ def choose_template_dialog(root, template_manager):
         if not sel:
             messagebox.showwarning("No selection", "Choose a template.")
             return
-        idx = sel[0]
-        tid = modal_ids[idx]
-        try:
-            rec = template_manager.get(tid)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not load template: {e}")
-            return
-        result["tpl"] = rec
+        result["tpl"] = templates[sel[0]]
         dlg.destroy()
 
     btn_row = tk.Frame(dlg)
@@ -178,7 +166,70 @@ def choose_template_dialog(root, template_manager):
               fg=PALETTE.get("BTN_FG", "#202124"), command=dlg.destroy).pack(side="right")
 
     dlg.wait_window()
-    if result["tpl"]:
-        _, _, subject, body = result["tpl"]
-        return subject or "", body or ""
-    return None
+    return result["tpl"]
+
+def run_in_thread(widget, work, on_progress=None, on_done=None, poll_ms=100):
+    """
+    Run work(report) on a background thread so the Tk main loop keeps running.
+    work may call report(*args) from the thread; each call is delivered to
+    on_progress(*args) on the Tk thread. When work returns, on_done(result, error)
+    is called on the Tk thread (error is the exception, or None).
+    """
+    events = queue.Queue()
+
+    def target():
+        try:
+            result = work(lambda *args: events.put(("progress", args)))
+        except Exception as e:
+            events.put(("done", (None, e)))
+        else:
+            events.put(("done", (result, None)))
+
+    def poll():
+        try:
+            while True:
+                kind, args = events.get_nowait()
+                if kind == "progress":
+                    if on_progress:
+                        on_progress(*args)
+                else:
+                    if on_done:
+                        on_done(*args)
+                    return
+        except queue.Empty:
+            pass
+        widget.after(poll_ms, poll)
+
+    threading.Thread(target=target, daemon=True).start()
+    widget.after(poll_ms, poll)
+
+class ProgressDialog:
+    """
+    Small non-modal progress window with a Cancel button.
+    `cancelled` is a threading.Event the background job can check.
+    """
+    def __init__(self, root, title, text=""):
+        self.cancelled = threading.Event()
+        self.win = tk.Toplevel(root)
+        self.win.title(title)
+        self.win.geometry("420x130")
+        self.win.transient(root)
+        self.win.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.label = tk.Label(self.win, text=text, anchor="w", justify="left")
+        self.label.pack(fill="x", padx=10, pady=(12, 6))
+        self.bar = ttk.Progressbar(self.win, mode="determinate", maximum=1.0)
+        self.bar.pack(fill="x", padx=10)
+        tk.Button(self.win, text="Cancel", bg=PALETTE.get("BTN_BG", "#D5D8DA"),
+                  fg=PALETTE.get("BTN_FG", "#202124"), command=self.cancel).pack(pady=10)
+
+    def update(self, fraction, text=None):
+        self.bar["value"] = max(0.0, min(1.0, fraction))
+        if text is not None:
+            self.label.config(text=text)
+
+    def cancel(self):
+        self.cancelled.set()
+        self.label.config(text="Cancelling...")
+
+    def close(self):
+        self.win.destroy()
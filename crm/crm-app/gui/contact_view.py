@@ -1,22 +1,79 @@
 # gui/contact_view.py
+import os
+import sqlite3
+from datetime import date
 import tkinter as tk
-from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
+from tkinter import ttk, messagebox, filedialog, simpledialog
 
-from db import get_all_contacts, get_contact_by_id, insert_contact, update_contact, delete_contact, now_str
-from gui.common import style_tk_widget, apply_tree_row_striping, choose_template_dialog
+from db import (connect_db, get_contact_row, now_str,
+                count_contacts, get_contacts_page, get_contacts_page_above, get_contact_id_at,
+                search_terms, count_search, search_contacts_page, search_contacts_page_above,
+                search_contact_id_at, SEARCH_LIMIT)
+from gui.common import style_tk_widget, choose_template_dialog, run_in_thread, ProgressDialog
+from gui.virtual_tree import VirtualTree, KeysetSource, SequenceSource
+from template_engine import TemplateError
 from utils import open_email_mac_mail, confirm_delete
+import diagnostics
+# tkcalendar, contact_store and the import/export/campaign/job modules (asyncio,
+# smtplib, email) are imported where they are first used, to keep startup quick
+
+def _insert_and_fetch(contacts, data):
+    return get_contact_row(contacts.cursor, contacts.insert(data))
+
+def _update_and_fetch(contacts, data):
+    cid = contacts.update(data)
+    return None if cid is None else get_contact_row(contacts.cursor, cid)
+
+def _set_follow_up(contacts, ids, when):
+    contacts.set_follow_up(ids, when)
+    return ids
+
+def _log_and_fetch(contacts, cid, kind, detail):
+    contacts.log_interaction(cid, kind, detail)
+    return get_contact_row(contacts.cursor, cid)
+
+def _set_status_and_fetch(contacts, ids, status):
+    contacts.update_status_many(ids, status)
+    rows = (get_contact_row(contacts.cursor, cid) for cid in ids)
+    return [row for row in rows if row is not None]
+
+STATUSES = ["Called","Emailed","Called and Emailed","Not Contacted"]
+ALL_STATUSES = "All"
+FOLLOW_UPS = [("Tomorrow", 1), ("In 3 Days", 3), ("Next Week", 7), ("In 2 Weeks", 14), ("In a Month", 30)]
+
+# table heading -> contact_store column (sortable headings)
+SORT_COLUMNS = {"ID": "id", "Name": "name", "Email": "email", "Phone": "phone", "Website": "website",
+                "Status": "status", "Date Added": "date_added", "Date Called": "date_called",
+                "Date Emailed": "date_emailed", "Touches": "touch_count"}
 
 class ContactView(tk.Frame):
-    def __init__(self, parent, conn, cursor, template_manager, *args, **kwargs):
+    WATCH_MS = 2000     # how often to look for commits by other connections
+
+    def __init__(self, parent, db, template_engine, contacts, *args, on_follow_ups_changed=None, **kwargs):
+        # db: gui.db_executor.DBExecutor; every query below is submitted to its worker thread
+        # contacts: contact_repository.ContactRepository on db's connection (cached form lookups)
+        # on_follow_ups_changed(ids, when): follow-ups set here; (None, None) when another
+        # connection committed and any of them may have changed
         super().__init__(parent, *args, **kwargs)
-        self.conn = conn
-        self.cursor = cursor
-        self.tm = template_manager
+        self.on_follow_ups_changed = on_follow_ups_changed
+        self.db = db
+        self.conn = db.conn
+        self.cursor = db.cursor
+        self.engine = template_engine
+        self.contacts = contacts
         self.selected_contact_id = tk.StringVar()
+        self._watching = False
+        # sorting by a heading or filtering by status works on an in-memory copy of the
+        # table (contact_store.py), loaded on first use; newest-first and unfiltered is
+        # the default and reads pages from SQLite as you scroll
+        self._sort = ("id", True)           # (column, descending)
+        self._status_filter = None
+        self._store = None
+        self._store_loading = False
 
+        # the owner calls load_contacts() once the window is on screen
         self._build_ui()
-        self.load_contacts()
+        self.after(self.WATCH_MS, self._watch_changes)
 
     def _build_ui(self):
         # Form
@@ -44,24 +101,25 @@ class ContactView(tk.Frame):
         style_tk_widget(self.website_entry)
 
         tk.Label(form, text="Status:").grid(row=2, column=0, sticky="e")
-        self.status_combo = ttk.Combobox(form, values=["Called","Emailed","Called and Emailed","Not Contacted"], width=27, state="readonly")
+        self.status_combo = ttk.Combobox(form, values=STATUSES, width=27, state="readonly")
         self.status_combo.grid(row=2, column=1, padx=5, pady=3)
         self.status_combo.set("Not Contacted")
         self.status_combo.bind("<<ComboboxSelected>>", self._update_date_visibility)
 
+        tk.Label(form, text="Follow Up:").grid(row=2, column=2, sticky="e")
+        self.follow_up_label = tk.Label(form, text="—", anchor="w")
+        self.follow_up_label.grid(row=2, column=3, sticky="w", padx=5)
+
         tk.Label(form, text="Notes:").grid(row=3, column=0, sticky="ne")
         self.notes_text = tk.Text(form, height=4, width=70)
         self.notes_text.grid(row=3, column=1, columnspan=3, padx=5, pady=3)
         style_tk_widget(self.notes_text)
 
-        # date fields
+        # date fields (the DateEntry widgets are created the first time they are needed)
+        self._form = form
+        self._date_entries = {}
         self.date_called_label = tk.Label(form, text="Date Called:")
-        self.date_called_entry = DateEntry(form, width=18, state="readonly")
-        style_tk_widget(self.date_called_entry)
-
         self.date_emailed_label = tk.Label(form, text="Date Emailed:")
-        self.date_emailed_entry = DateEntry(form, width=18, state="readonly")
-        style_tk_widget(self.date_emailed_entry)
 
         # Buttons
         btns = tk.Frame(self, pady=6)
@@ -69,63 +127,273 @@ class ContactView(tk.Frame):
         self.save_btn = tk.Button(btns, text="Save / Update", command=self.save_contact)
         self.clear_btn = tk.Button(btns, text="Clear", command=self.clear_form)
         self.delete_btn = tk.Button(btns, text="Delete", command=self.delete_selected)
-        for b in (self.save_btn, self.clear_btn, self.delete_btn):
+        # Set Status applies to every selected row (Ctrl/Shift-click to select several)
+        self.status_btn = tk.Menubutton(btns, text="Set Status", relief="raised")
+        status_menu = tk.Menu(self.status_btn, tearoff=0)
+        for st in STATUSES:
+            status_menu.add_command(label=st, command=lambda st=st: self.set_status_selected(st))
+        self.status_btn["menu"] = status_menu
+        # Follow Up schedules a reminder for every selected row (see gui/reminder_view.py)
+        self.follow_up_btn = tk.Menubutton(btns, text="Follow Up", relief="raised")
+        follow_up_menu = tk.Menu(self.follow_up_btn, tearoff=0)
+        for label, days in FOLLOW_UPS:
+            follow_up_menu.add_command(label=label, command=lambda d=days: self.follow_up_selected(d))
+        follow_up_menu.add_separator()
+        follow_up_menu.add_command(label="Clear", command=lambda: self.follow_up_selected(None))
+        self.follow_up_btn["menu"] = follow_up_menu
+        self.history_btn = tk.Button(btns, text="History...", command=self.show_history)
+        for b in (self.save_btn, self.clear_btn, self.delete_btn, self.status_btn, self.follow_up_btn,
+                  self.history_btn):
             b.pack(side="left", padx=8, pady=4)
             style_tk_widget(b)
+        tk.Label(btns, text="Show:").pack(side="left", padx=(16, 0))
+        self.filter_combo = ttk.Combobox(btns, values=[ALL_STATUSES] + STATUSES, width=18, state="readonly")
+        self.filter_combo.set(ALL_STATUSES)
+        self.filter_combo.pack(side="left", padx=4)
+        self.filter_combo.bind("<<ComboboxSelected>>", self._filter_changed)
+
+        # Search (filters the table as you type)
+        self.search_var = tk.StringVar()
+        self._search_job = None
+        self.search_count_label = tk.Label(btns, text="")
+        self.search_count_label.pack(side="right", padx=8)
+        self.search_entry = tk.Entry(btns, width=30, textvariable=self.search_var)
+        self.search_entry.pack(side="right", padx=4)
+        self.search_entry.bind("<KeyRelease>", self._schedule_search)
+        self.search_entry.bind("<Escape>", self._clear_search)
+        style_tk_widget(self.search_entry)
+        tk.Label(btns, text="Search:").pack(side="right")
 
         # Table
-        columns = ("ID","Name","Email","Phone","Website","Status","Date Added","Date Called","Date Emailed","Action")
+        columns = ("ID","Name","Email","Phone","Website","Status","Date Added","Date Called","Date Emailed","Touches","Action")
         self.tree = ttk.Treeview(self, columns=columns, show="headings", height=14)
 
-        widths = {"ID": 60, "Name":180, "Email":220, "Phone":120, "Website":160, "Status":140, "Date Added":140, "Date Called":120, "Date Emailed":120, "Action":100}
+        widths = {"ID": 60, "Name":180, "Email":220, "Phone":120, "Website":160, "Status":140, "Date Added":140, "Date Called":120, "Date Emailed":120, "Touches":70, "Action":100}
         for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=widths.get(col,120), anchor="center" if col in ("ID","Status","Action") else "w")
+            if col in SORT_COLUMNS:
+                self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(SORT_COLUMNS[c]))
+            else:
+                self.tree.heading(col, text=col)
+            self.tree.column(col, width=widths.get(col,120), anchor="center" if col in ("ID","Status","Touches","Action") else "w")
 
-        vsb = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=vsb.set)
+        vsb = ttk.Scrollbar(self, orient="vertical")
         vsb.pack(side="right", fill="y")
         self.tree.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Bind: selection changes and mouse clicks
-        # <<TreeviewSelect>> fires when selection changes — use this to populate the form
-        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        # Only the visible rows live in the Treeview; pages are read by id as you scroll.
+        # Selection changes (<<TreeviewSelect>>) are forwarded to on_tree_select to populate the form
+        self.table = VirtualTree(self.tree, vsb, on_select=self.on_tree_select)
+        self._all_contacts = KeysetSource(
+            count=lambda: count_contacts(self.cursor),
+            page_below=lambda before, limit: get_contacts_page(self.cursor, before, limit),
+            page_above=lambda after, limit: get_contacts_page_above(self.cursor, after, limit),
+            key_at=lambda offset: get_contact_id_at(self.cursor, offset),
+            executor=self.db,
+        )
+        self.table.source = self._all_contacts
+
         # Bind mouse release to capture clicks inside the Action column only
         self.tree.bind("<ButtonRelease-1>", self.on_tree_click_for_action)
 
     # ---- methods ----
+    def _date_entry(self, which):
+        entry = self._date_entries.get(which)
+        if entry is None:
+            from tkcalendar import DateEntry
+            entry = self._date_entries[which] = DateEntry(self._form, width=18, state="readonly")
+            style_tk_widget(entry)
+        return entry
+
+    @property
+    def date_called_entry(self):
+        return self._date_entry("called")
+
+    @property
+    def date_emailed_entry(self):
+        return self._date_entry("emailed")
+
+    def _hide_dates(self, called=True, emailed=True):
+        # only widgets that exist can be on screen
+        if called:
+            self.date_called_label.grid_forget()
+            if "called" in self._date_entries:
+                self._date_entries["called"].grid_forget()
+        if emailed:
+            self.date_emailed_label.grid_forget()
+            if "emailed" in self._date_entries:
+                self._date_entries["emailed"].grid_forget()
+
     def _update_date_visibility(self, event=None):
         choice = self.status_combo.get()
         if choice in ("Called", "Called and Emailed"):
             self.date_called_label.grid(row=4, column=0, sticky="e")
             self.date_called_entry.grid(row=4, column=1, padx=5, pady=3)
         else:
-            self.date_called_label.grid_forget(); self.date_called_entry.grid_forget()
+            self._hide_dates(emailed=False)
         if choice in ("Emailed", "Called and Emailed"):
             self.date_emailed_label.grid(row=4, column=2, sticky="e")
             self.date_emailed_entry.grid(row=4, column=3, padx=5, pady=3)
         else:
-            self.date_emailed_label.grid_forget(); self.date_emailed_entry.grid_forget()
+            self._hide_dates(called=False)
+
+    def load_contacts(self, done=None):
+        # Re-counts and re-reads only the visible window (striping is applied per row);
+        # a sorted or filtered list reloads its in-memory copy first.
+        # done() is called once the rows are on screen
+        span = diagnostics.span("load_contacts")
+
+        def shown():
+            span.end()
+            if done:
+                done()
+        self._store = None
+        if isinstance(self.table.source, SequenceSource):
+            self._show_list(keep_position=True, done=shown)
+        else:
+            self.table.refresh(shown)
+
+    # ---- sorting / status filter ----
+    def sort_by(self, column):
+        # a second click on the same heading flips the direction
+        current, descending = self._sort
+        self._sort = (column, not descending if column == current else column in ("id", "date_added"))
+        self._show_list()
+
+    def _filter_changed(self, event=None):
+        status = self.filter_combo.get()
+        self._status_filter = None if status == ALL_STATUSES else status
+        self._show_list()
 
-    def load_contacts(self):
-        self.tree.delete(*self.tree.get_children())
-        rows = get_all_contacts(self.cursor)
-        for r in rows:
-            self.tree.insert("", "end", values=r)
-        # Add alternating row colors for readability
-        apply_tree_row_striping(self.tree, even_bg="#FFFFFF", odd_bg="#F3F3F3")
+    def _show_list(self, keep_position=False, done=None):
+        """Show all contacts in the current sort order and status filter (ends any search)."""
+        column, descending = self._sort
+        status = self._status_filter
+        if self.search_var.get():
+            self.search_var.set("")
+        for heading, col in SORT_COLUMNS.items():
+            arrow = (" \u25bc" if descending else " \u25b2") if col == column and self._sort != ("id", True) else ""
+            self.tree.heading(heading, text=heading + arrow)
+
+        if self._sort == ("id", True) and status is None:
+            self.search_count_label.config(text="")
+            if self.table.source is not self._all_contacts:
+                self.table.set_source(self._all_contacts, done)
+            elif done:
+                done()
+            return
+        store = self._store
+        if store is None:
+            self._load_store(keep_position, done)
+            return
+        source = SequenceSource(lambda: store.view(column, descending, status), store.row)
+
+        def shown():
+            if status is not None:
+                n = len(source)
+                self.search_count_label.config(text=f"{n:,} contact" + ("" if n == 1 else "s"))
+            else:
+                self.search_count_label.config(text="")
+            if done:
+                done()
+        if keep_position:
+            self.table.source = source
+            self.table.refresh(shown)
+        else:
+            self.table.set_source(source, shown)
+
+    def _load_store(self, keep_position, done=None):
+        if self._store_loading:
+            return  # the load in flight shows the list in whatever order is current then
+        self._store_loading = True
+        self.search_count_label.config(text="Loading...")
+
+        def loaded(store):
+            self._store_loading = False
+            self._store = store
+            self._show_list(keep_position, done)
+
+        def failed(error):
+            self._store_loading = False
+            self.search_count_label.config(text="")
+            messagebox.showerror("Database Error", str(error))
+        from contact_store import ContactStore
+        self.db.submit(ContactStore.load, self.cursor, callback=loaded, errback=failed)
+
+    def _watch_changes(self):
+        # imports, campaigns and other processes write on their own connections:
+        # when one commits, the contact cache is dropped and the table re-read
+        def checked(changed):
+            self._watching = False
+            if changed:
+                if isinstance(self.table.source, SequenceSource):
+                    # reloading the whole in-memory copy on every commit of a running
+                    # import would keep the database thread busy: it is reloaded on the
+                    # next sort, filter or load_contacts() instead
+                    self._store = None
+                else:
+                    self.load_contacts()
+                if self.on_follow_ups_changed:
+                    self.on_follow_ups_changed(None, None)
+
+        def failed(error):
+            self._watching = False
+
+        if not self._watching:
+            self._watching = True
+            self.db.submit(self.contacts.sync, callback=checked, errback=failed)
+        self.after(self.WATCH_MS, self._watch_changes)
+
+    # ---- search ----
+    def _schedule_search(self, event=None):
+        # debounce: only query once typing pauses
+        if self._search_job:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        text = self.search_var.get().strip()
+        if not search_terms(text):
+            self.search_count_label.config(text="")
+            self._show_list()
+            return
+        source = KeysetSource(
+            count=lambda: count_search(self.cursor, text),
+            page_below=lambda before, limit: search_contacts_page(self.cursor, text, before, limit),
+            page_above=lambda after, limit: search_contacts_page_above(self.cursor, text, after, limit),
+            key_at=lambda offset: search_contact_id_at(self.cursor, text, offset),
+            page_size=50,
+            executor=self.db,
+        )
+
+        def counted():
+            if source is not self.table.source:
+                return  # superseded by a newer search
+            n = len(source)
+            if n >= SEARCH_LIMIT:
+                self.search_count_label.config(text=f"first {SEARCH_LIMIT:,} matches")
+            else:
+                self.search_count_label.config(text=f"{n:,} match" + ("" if n == 1 else "es"))
+
+        self.table.set_source(source, counted)
+
+    def _clear_search(self, event=None):
+        self.search_var.set("")
+        self._run_search()
 
     def clear_form(self):
+        self._clear_fields()
+        # Deselect any selected row (including rows scrolled out of view)
+        self.table.clear_selection()
+
+    def _clear_fields(self):
         self.selected_contact_id.set("")
         for w in (self.name_entry, self.email_entry, self.phone_entry, self.website_entry):
             w.delete(0, tk.END)
         self.status_combo.set("Not Contacted")
         self.notes_text.delete("1.0", tk.END)
-        self.date_called_label.grid_forget(); self.date_called_entry.grid_forget()
-        self.date_emailed_label.grid_forget(); self.date_emailed_entry.grid_forget()
-        # Deselect any selected row
-        for item in self.tree.selection():
-            self.tree.selection_remove(item)
+        self.follow_up_label.config(text="—")
+        self._hide_dates()
 
     def save_contact(self):
         name = self.name_entry.get().strip()
@@ -139,43 +407,168 @@ class ContactView(tk.Frame):
             return
         date_called = self.date_called_entry.get_date().strftime("%Y-%m-%d") if self.date_called_label.winfo_ismapped() else None
         date_emailed = self.date_emailed_entry.get_date().strftime("%Y-%m-%d") if self.date_emailed_label.winfo_ismapped() else None
-        if self.selected_contact_id.get():
-            update_contact(self.cursor, self.conn, (name,email,phone,website,status,notes,date_called,date_emailed,self.selected_contact_id.get()))
-            messagebox.showinfo("Updated","Contact updated.")
+
+        span = diagnostics.span("save_contact")
+
+        def failed(error):
+            span.end()
+            # the executor has already rolled back
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showwarning("Duplicate email", f"Another contact already uses {email}.")
+            else:
+                messagebox.showerror("Database Error", str(error))
+
+        editing = self.selected_contact_id.get()
+        if editing:
+            def updated(row):
+                span.end()
+                if row is not None and self._store is not None:
+                    self._store.put(row)
+                if isinstance(self.table.source, SequenceSource):
+                    self.table.refresh()    # the row may sort or filter differently now
+                elif row is not None:
+                    self.table.update_row(row)
+                if self.selected_contact_id.get() == editing:
+                    self.clear_form()
+                messagebox.showinfo("Updated","Contact updated.")
+            self.db.submit(_update_and_fetch, self.contacts,
+                           (name,email,phone,website,status,notes,date_called,date_emailed,editing),
+                           callback=updated, errback=failed)
         else:
+            def added(row):
+                span.end()
+                if self._store is not None:
+                    self._store.put(row)
+                if self.table.source is self._all_contacts:
+                    # newest id sorts first
+                    self.table.insert_row(row, 0)
+                else:
+                    # the new contact may or may not match the current search
+                    self.table.refresh()
+                if not self.selected_contact_id.get():
+                    self.clear_form()
+                messagebox.showinfo("Added","Contact added.")
             date_added = now_str()
-            insert_contact(self.cursor, self.conn, (name,email,phone,website,status,notes,date_added,date_called,date_emailed))
-            messagebox.showinfo("Added","Contact added.")
-        self.load_contacts()
-        self.clear_form()
+            self.db.submit(_insert_and_fetch, self.contacts,
+                           (name,email,phone,website,status,notes,date_added,date_called,date_emailed),
+                           callback=added, errback=failed)
 
     def delete_selected(self):
+        ids = self.table.selection()
+        if not ids:
+            messagebox.showwarning("No selection","Select a contact.")
+            return
+        if not confirm_delete(len(ids)):
+            return
+        if len(ids) == 1:
+            cid = ids[0]
+            def deleted(result):
+                if result is not None:
+                    if self._store is not None:
+                        self._store.discard([result])
+                    self.table.remove_row(cid)
+                if self.selected_contact_id.get() == cid:
+                    self.clear_form()
+            self.db.submit(self.contacts.delete, cid, callback=deleted)
+        else:
+            # one transaction for the whole selection, then re-read the visible window
+            def deleted_many(deleted):
+                if self._store is not None:
+                    self._store.discard(deleted)
+                self.clear_form()
+                self.table.refresh()
+            self.db.submit(self.contacts.delete_many, ids, callback=deleted_many)
+
+    def set_status_selected(self, status):
+        ids = self.table.selection()
+        if not ids:
+            messagebox.showwarning("No selection","Select one or more contacts.")
+            return
+
+        def updated(rows):
+            if self._store is not None:
+                for row in rows:
+                    self._store.put(row)
+            if self.selected_contact_id.get() in ids:
+                # show the new status (and any date it filled in) in the form
+                cid = self.selected_contact_id.get()
+                self.db.submit(self.contacts.get, cid, callback=lambda rec: self._fill_form(cid, rec))
+            self.table.refresh()
+        self.db.submit(_set_status_and_fetch, self.contacts, ids, status, callback=updated)
+
+    def follow_up_selected(self, days):
+        """Schedule a follow-up `days` from today for the selected rows (None clears it)."""
+        ids = self.table.selection()
+        if not ids:
+            messagebox.showwarning("No selection", "Select one or more contacts.")
+            return
+        from reminders import follow_up_time
+        self.set_follow_up(ids, follow_up_time(days) if days is not None else None)
+
+    def set_follow_up(self, ids, when):
+        """Set (when=None: clear) the next follow-up of contacts, e.g. from the reminder window."""
+        def updated(ids):
+            if self.on_follow_ups_changed:
+                self.on_follow_ups_changed(ids, when)
+            if self.selected_contact_id.get() in ids:
+                self.follow_up_label.config(text=when or "—")
+        self.db.submit(_set_follow_up, self.contacts, [str(i) for i in ids], when, callback=updated)
+
+    def show_contact(self, cid):
+        """Fill the form with a contact that may not be on screen (e.g. from a reminder)."""
+        cid = str(cid)
+        self.selected_contact_id.set(cid)
+        self.db.submit(self.contacts.get, cid, callback=lambda rec: self._fill_form(cid, rec))
+        self.winfo_toplevel().lift()
+
+    def show_history(self):
+        """Open the interaction history of the contact in the form."""
         cid = self.selected_contact_id.get()
         if not cid:
-            messagebox.showwarning("No selection","Select a contact.")
+            messagebox.showwarning("No selection", "Select a contact.")
             return
-        if confirm_delete():
-            delete_contact(self.cursor, self.conn, cid)
-            self.load_contacts()
-            self.clear_form()
+        from gui.history_view import HistoryWindow
+        HistoryWindow(self.winfo_toplevel(), self.db, cid, self.name_entry.get())
 
     # Called when selection changes (stable; single-click selects and triggers this)
     def on_tree_select(self, event):
-        sel = self.tree.selection()
+        sel = self.table.selection()
         if not sel:
             # Nothing selected
-            self.clear_form()
+            if self.selected_contact_id.get():
+                self.clear_form()
+            return
+        if len(sel) > 1:
+            # several rows: the form edits one contact, so leave it empty
+            # (Delete and Set Status act on the whole selection)
+            if self.selected_contact_id.get():
+                self._clear_fields()
             return
-        item = sel[0]
-        values = self.tree.item(item, "values")
-        if not values:
+        cid = sel[0]
+        if cid == self.selected_contact_id.get():
+            # Same row re-selected after scrolling; keep any edits in the form
             return
-        cid = values[0]
-        # populate form
         self.selected_contact_id.set(cid)
-        rec = get_contact_by_id(self.cursor, cid)
+        span = diagnostics.span("on_tree_select")
+        rec = self.contacts.cached(cid)
+        if rec is not None:
+            self._fill_form(cid, rec)
+            span.end()
+            return
+
+        def loaded(rec):
+            self._fill_form(cid, rec)
+            span.end()
+        # populate form once the record arrives (unless the selection moved on meanwhile);
+        # the rest of the visible rows come along, so arrowing through them stays off the database
+        self.db.submit(self.contacts.get, cid, self.table.visible_keys(), callback=loaded)
+
+    def _fill_form(self, cid, rec):
+        if cid != self.selected_contact_id.get():
+            return
         if rec:
-            # rec: name, email, phone, website, status, notes, date_added, date_called, date_emailed
+            # rec: name, email, phone, website, status, notes, date_added, date_called, date_emailed,
+            # next_follow_up
             self.name_entry.delete(0, tk.END); self.name_entry.insert(0, rec[0] or "")
             self.email_entry.delete(0, tk.END); self.email_entry.insert(0, rec[1] or "")
             self.phone_entry.delete(0, tk.END); self.phone_entry.insert(0, rec[2] or "")
@@ -183,12 +576,12 @@ class ContactView(tk.Frame):
             self.status_combo.set(rec[4] or "Not Contacted")
             self.notes_text.delete("1.0", tk.END); self.notes_text.insert("1.0", rec[5] or "")
             self._update_date_visibility()
+            self.follow_up_label.config(text=rec[9] or "—")
+            # stored as "YYYY-MM-DD" (see db.py, Dates); DateEntry wants a date, not its own text format
             if rec[7]:
-                try: self.date_called_entry.set_date(rec[7])
-                except Exception: pass
+                self.date_called_entry.set_date(date.fromisoformat(rec[7]))
             if rec[8]:
-                try: self.date_emailed_entry.set_date(rec[8])
-                except Exception: pass
+                self.date_emailed_entry.set_date(date.fromisoformat(rec[8]))
 
     # Handle mouse clicks to detect Action column clicks only
     def on_tree_click_for_action(self, event):
@@ -197,8 +590,8 @@ class ContactView(tk.Frame):
         col = self.tree.identify_column(event.x)
         if not item:
             return
-        # Action column is last column (10th) -> "#10"
-        if col == "#10":
+        # Action column is last column (11th) -> "#11"
+        if col == "#11":
             values = self.tree.item(item, "values")
             if not values:
                 return
@@ -207,7 +600,12 @@ class ContactView(tk.Frame):
         # else: do nothing here — selection change will be handled by <<TreeviewSelect>>
 
     def open_action(self, cid):
-        rec = get_contact_by_id(self.cursor, cid)
+        def load(cid):
+            # contact and templates in one round trip (both usually cached)
+            return self.contacts.get(cid), self.engine.list()
+        self.db.submit(load, cid, callback=lambda result: self._compose_email(cid, *result))
+
+    def _compose_email(self, cid, rec, templates):
         if not rec:
             messagebox.showwarning("Not found", "Contact not found.")
             return
@@ -215,21 +613,159 @@ class ContactView(tk.Frame):
         if not email:
             messagebox.showwarning("Missing email", "No email for this contact.")
             return
-        tpl = choose_template_dialog(self.winfo_toplevel(), self.tm)
+        tpl = choose_template_dialog(self.winfo_toplevel(), templates)
         if not tpl:
             return
-        subject, body = tpl
-        subject = (subject or "").replace("{{name}}", name or "")
-        body = (body or "").replace("{{name}}", name or "")
+        try:
+            subject, body = self.engine.compile(tpl).render_contact(rec)
+        except TemplateError as e:
+            messagebox.showwarning("Template error", str(e))
+            return
         open_email_mac_mail(email, subject, body)
+        # the contact's history and touch count record the email
+        self.db.submit(_log_and_fetch, self.contacts, cid, "email", f"Opened in Mail: {subject}",
+                       callback=self._row_changed)
+
+    def _row_changed(self, row):
+        if row is None:
+            return
+        if self._store is not None:
+            self._store.put(row)
+        if isinstance(self.table.source, SequenceSource):
+            self.table.refresh()    # the row may sort differently now
+        else:
+            self.table.update_row(row)
+
+    # ---- bulk import ----
+    def import_csv(self):
+        path = filedialog.askopenfilename(parent=self, title="Import Contacts",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        import importer
+
+        def start(conn, report):
+            report(0.0, "Reading " + path)
+            return importer.start_import_job(conn, path)
+
+        self.run_job(start, "Importing Contacts", "Import")
+
+    def export_contacts(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Export Contacts", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        import exporter
+        dlg = ProgressDialog(self.winfo_toplevel(), "Exporting Contacts", "Writing " + path)
+
+        def work(report):
+            # a pooled read-only connection: with WAL the export never holds up edits in the GUI
+            with self.db.pool.reader() as (conn, cursor):
+                total = count_contacts(cursor) or 1
+                with open(path, "w", newline="", encoding="utf-8") as out:
+                    return exporter.export_contacts(
+                        cursor, out, exporter.format_for(path),
+                        progress=lambda n: report(n / total, f"{n:,} of {total:,} contacts"),
+                        cancel=dlg.cancelled)
+
+        def done(n, error):
+            dlg.close()
+            if error:
+                messagebox.showerror("Export Error", f"Could not export contacts:\n{error}")
+            else:
+                messagebox.showinfo("Export finished", f"{n:,} contacts exported.")
+
+        run_in_thread(self, work, on_progress=dlg.update, on_done=done)
+
+    # ---- email campaign ----
+    def send_campaign(self):
+        self.db.submit(self.engine.list, callback=self._start_campaign)
+
+    def _start_campaign(self, templates):
+        import campaign
+        from gui.campaign_dialog import campaign_dialog
+        choice = campaign_dialog(self.winfo_toplevel(), templates, STATUSES)
+        if not choice:
+            return
+        tpl, status, settings, rate = choice
+        try:
+            self.engine.compile(tpl)
+        except TemplateError as e:
+            messagebox.showwarning("Template error", str(e))
+            return
+
+        def start(conn, report):
+            report(0.0, f"Sending through {settings.host}...")
+            return campaign.start_campaign_job(conn, tpl, settings, status, rate=rate)
+
+        self.run_job(start, "Email Campaign", "Campaign", password=settings.password)
+
+    # ---- background jobs (jobqueue.py) ----
+    def run_job(self, start, title, what, **options):
+        """
+        Run a durable job on a background thread with a progress window.
+        start(conn, report) returns the job id (creating the job, or an existing
+        one to resume). Cancel pauses the job; it can be resumed later, also
+        after a restart.
+        """
+        import jobqueue
+        import importer, campaign   # noqa: F401  (register their job workers)
+        dlg = ProgressDialog(self.winfo_toplevel(), title, "Starting...")
+
+        def work(report):
+            # own connection: each batch commits on its own and the GUI writer waits
+            # out those commits on the busy timeout
+            conn, _ = connect_db(self.db.pool.path)
+            try:
+                job_id = start(conn, report)
+                return jobqueue.run_job(
+                    conn, job_id, cancel=dlg.cancelled,
+                    progress=lambda job: report((job.done + job.failed) / (job.total or 1), str(job)),
+                    **options)
+            finally:
+                conn.close()
+
+        def done(job, error):
+            dlg.close()
+            self.load_contacts()
+            if error:
+                messagebox.showerror(f"{what} Error",
+                                     f"{what} stopped:\n{error}\n\nUse File > Resume Unfinished Jobs to continue.")
+            elif job.state == "paused":
+                messagebox.showinfo(f"{what} paused", f"{job}\n\nUse File > Resume Unfinished Jobs to continue.")
+            else:
+                messagebox.showinfo(f"{what} finished", str(job))
+
+        run_in_thread(self, work, on_progress=dlg.update, on_done=done)
+
+    def resume_jobs(self, quiet=False):
+        """Offer to resume unfinished imports and campaigns (quiet: say nothing if there are none)."""
+        import jobqueue
+
+        def offer(jobs):
+            if not jobs:
+                if not quiet:
+                    messagebox.showinfo("Background jobs", "There are no unfinished jobs.")
+                return
+            job = jobs[-1]  # newest first: offer the oldest
+            if not messagebox.askyesno("Resume job?", f"Unfinished {job.kind}:\n{job}\n\nResume it now?"):
+                return
+            options = {}
+            if job.kind == "campaign" and job.params["smtp"].get("user") and not os.environ.get("MINICRM_SMTP_PASSWORD"):
+                password = simpledialog.askstring("SMTP password", f"Password for {job.params['smtp']['user']}:",
+                                                  show="*", parent=self)
+                if password is None:
+                    return
+                options["password"] = password
+            self.run_job(lambda conn, report: job.id, f"Resuming {job.kind}", job.kind.title(), **options)
+
+        self.db.submit(jobqueue.unfinished_jobs, self.cursor, callback=offer)
 
-    # Method called by TemplateView when templates change; keep it safe and minimal
+    # Method called by TemplateView when templates change
     def refresh_templates(self):
         """
         Called by the TemplateView when templates are added/updated/deleted.
-        Right now we don't need to change the contact list when templates change,
-        but this method exists so the app won't crash and provides a hook for future behavior.
+        Drops the cached template list and compiled templates so the next
+        email uses the edited text.
         """
-        # For now, do nothing. If you want to reload contacts or update some UI,
-        # implement that logic here. Example: self.load_contacts()
-        return
+        self.engine.invalidate()
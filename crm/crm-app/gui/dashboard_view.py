@@ -0,0 +1,114 @@
+# gui/dashboard_view.py
+"""
+The Dashboard tab: contacts per status with their share, and a bar chart of
+calls and emails per day. Everything is read from the summary tables the
+contacts triggers keep (see dashboard.py), so a refresh costs the same with
+a hundred contacts or a million; the tab refreshes each time it is opened.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+import dashboard
+from gui.common import PALETTE
+
+RANGES = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+CALLS_COLOR = "#4A7FB5"
+EMAILS_COLOR = "#E0A040"
+
+
+class DashboardView(tk.Frame):
+    def __init__(self, parent, db, *args, **kwargs):
+        # db: gui.db_executor.DBExecutor; the summaries are read on its worker thread
+        super().__init__(parent, *args, **kwargs)
+        self.db = db
+        self._activity = []
+        self._loading = False
+        self._build_ui()
+
+    def _build_ui(self):
+        top = tk.Frame(self, padx=10, pady=8)
+        top.pack(fill="x")
+        self.total_label = tk.Label(top, anchor="w", font=("TkDefaultFont", 12, "bold"))
+        self.total_label.pack(side="left")
+        tk.Button(top, text="Refresh", bg=PALETTE.get("BTN_BG", "#D5D8DA"), fg=PALETTE.get("BTN_FG", "#202124"),
+                  command=self.refresh).pack(side="right")
+        self.range_var = tk.StringVar(value="Last 30 days")
+        box = ttk.Combobox(top, textvariable=self.range_var, values=list(RANGES), state="readonly", width=14)
+        box.pack(side="right", padx=6)
+        box.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        body = tk.Frame(self, padx=10)
+        body.pack(fill="both", expand=True)
+        self.status_tree = ttk.Treeview(body, columns=("Status", "Contacts", "Share"), show="headings", height=12)
+        for col, width, anchor in (("Status", 180, "w"), ("Contacts", 90, "e"), ("Share", 70, "e")):
+            self.status_tree.heading(col, text=col)
+            self.status_tree.column(col, width=width, anchor=anchor)
+        self.status_tree.pack(side="left", fill="y", pady=(0, 10))
+
+        right = tk.Frame(body, padx=10)
+        right.pack(side="left", fill="both", expand=True)
+        self.activity_label = tk.Label(right, anchor="w")
+        self.activity_label.pack(fill="x")
+        self.chart = tk.Canvas(right, bg=PALETTE.get("ENTRY_BG", "#FFFFFF"), highlightthickness=0, height=300)
+        self.chart.pack(fill="both", expand=True, pady=(4, 10))
+        self.chart.bind("<Configure>", lambda e: self._draw_chart())
+
+    def refresh(self):
+        if self._loading:
+            return
+        self._loading = True
+
+        def loaded(result):
+            self._loading = False
+            self._show(*result)
+
+        def failed(error):
+            self._loading = False
+        self.db.submit(dashboard.load, self.db.cursor, RANGES[self.range_var.get()],
+                       callback=loaded, errback=failed)
+
+    def _show(self, statuses, activity):
+        if not self.winfo_exists():
+            return
+        total = sum(n for _, n in statuses)
+        self.total_label.config(text=f"{total:,} contact{'s' if total != 1 else ''}")
+        self.status_tree.delete(*self.status_tree.get_children())
+        for status, n in statuses:
+            self.status_tree.insert("", "end", values=(status or "(none)", f"{n:,}", f"{n / total:.1%}"))
+        self._activity = activity
+        calls = sum(r[2] for r in activity)
+        emails = sum(r[3] for r in activity)
+        added = sum(r[1] for r in activity)
+        self.activity_label.config(text=f"{self.range_var.get()}: {added:,} added  ·  "
+                                        f"{calls:,} calls  ·  {emails:,} emails")
+        self._draw_chart()
+
+    def _draw_chart(self):
+        c = self.chart
+        c.delete("all")
+        width, height = c.winfo_width(), c.winfo_height()
+        if not self._activity or width < 50 or height < 50:
+            return
+        left, bottom, top = 40, height - 24, 24
+        peak = max(1, max(max(r[2], r[3]) for r in self._activity))
+        slot = (width - left - 10) / len(self._activity)
+        bar = max(1.0, slot * 0.4)
+        scale = (bottom - top) / peak
+        fg = PALETTE.get("MUTED_FG", "#4B4F52")
+        c.create_line(left, bottom, width - 10, bottom, fill=fg)
+        c.create_text(left - 4, top, text=f"{peak:,}", anchor="e", fill=fg)
+        c.create_text(left - 4, bottom, text="0", anchor="e", fill=fg)
+        label_every = max(1, len(self._activity) // 8)
+        for i, (day, _, calls, emails) in enumerate(self._activity):
+            x = left + i * slot + (slot - 2 * bar) / 2
+            if calls:
+                c.create_rectangle(x, bottom - calls * scale, x + bar, bottom, fill=CALLS_COLOR, width=0)
+            if emails:
+                c.create_rectangle(x + bar, bottom - emails * scale, x + 2 * bar, bottom, fill=EMAILS_COLOR, width=0)
+            if i % label_every == 0:
+                c.create_text(x + bar, bottom + 4, text=day[5:], anchor="n", fill=fg)
+        for j, (text, color) in enumerate((("Calls", CALLS_COLOR), ("Emails", EMAILS_COLOR))):
+            x = left + 10 + j * 80
+            c.create_rectangle(x, 6, x + 10, 16, fill=color, width=0)
+            c.create_text(x + 14, 11, text=text, anchor="w", fill=fg)
@@ -0,0 +1,139 @@
+# gui/db_executor.py
+"""
+Database executor: one worker thread owns the sqlite writer connection.
+
+Views never run SQL on the Tk main thread. They submit a function plus
+arguments; it runs on the worker (in submission order), and the result is
+handed back to a callback on the Tk thread by polling a result queue with
+after(). A slow query or a database on a network share therefore never
+freezes the window.
+
+    db = DBExecutor(root)
+    db.submit(get_contact_by_id, db.cursor, cid, callback=fill_form)
+
+db.conn / db.cursor are the writer connection of db.pool and belong to the
+worker thread: pass them as arguments to submitted functions, never use them
+directly from the GUI. Long read-only jobs on their own threads (exports)
+borrow a connection with db.pool.reader() instead.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from tkinter import messagebox
+
+from db import ConnectionPool
+import diagnostics
+
+
+class DBExecutor:
+    def __init__(self, widget, path=None, readers=2, poll_ms=10):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._polling = False
+        self.pool = self.conn = self.cursor = None
+
+        ready = threading.Event()
+        startup = {}
+
+        def open_connection():
+            try:
+                self.pool = ConnectionPool(path, readers)
+                self.conn, self.cursor = self.pool.conn, self.pool.cursor
+            except Exception as e:
+                startup["error"] = e
+            ready.set()
+
+        self._thread = threading.Thread(target=self._run, args=(open_connection,),
+                                        name="db-executor", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if "error" in startup:
+            raise startup["error"]
+
+    # ---- worker thread ----
+    def _run(self, open_connection):
+        open_connection()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, fn, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if diagnostics.ENABLED:
+                started = diagnostics.clock()
+                diagnostics.recorder.add("db", "queue wait", (started - future.submitted) * 1000)
+            try:
+                # the pool rolls back a failed job, leaving the connection usable for the next one
+                with self.pool.writer():
+                    result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            if diagnostics.ENABLED:
+                diagnostics.recorder.add("db", getattr(fn, "__qualname__", repr(fn)),
+                                         (diagnostics.clock() - started) * 1000)
+            if not future.sync:
+                self._results.put(future)
+        if self.pool is not None:
+            self.pool.close()
+
+    # ---- Tk thread ----
+    def submit(self, fn, *args, callback=None, errback=None):
+        """
+        Run fn(*args) on the worker. On the Tk thread, callback(result) is called
+        when it finishes, or errback(exception) if it raised (default: an error
+        dialog). Returns a concurrent.futures.Future.
+        """
+        future = Future()
+        future.callback = callback
+        future.errback = errback
+        future.sync = False
+        future.submitted = diagnostics.clock()
+        self._pending += 1
+        self._jobs.put((future, fn, args))
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+        return future
+
+    def call(self, fn, *args, timeout=None):
+        """Run fn(*args) on the worker and wait for the result (startup only: this blocks Tk)."""
+        future = Future()
+        future.sync = True
+        future.submitted = diagnostics.clock()
+        self._jobs.put((future, fn, args))
+        return future.result(timeout)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    future = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending -= 1
+                error = future.exception()
+                if error is None:
+                    if future.callback:
+                        future.callback(future.result())
+                elif future.errback:
+                    future.errback(error)
+                else:
+                    messagebox.showerror("Database Error", str(error))
+        finally:
+            # keep polling even if a callback raised (Tk reports the exception)
+            if self._pending > 0:
+                self.widget.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
+
+    def close(self):
+        """Finish queued jobs, then close the connections and stop the worker."""
+        self._jobs.put(None)
+        self._thread.join()
@@ -0,0 +1,75 @@
+# gui/diagnostics_view.py
+"""
+Help > Diagnostics: live timing summary from diagnostics.py.
+
+The top table lists every timed name (SQL statements, GUI actions, Tk
+handlers, database jobs) with count and p50/p95/p99/max in milliseconds;
+the bottom one the latest events over the slow threshold. Both refresh
+once a second while the window is open.
+"""
+
+import time
+import tkinter as tk
+from tkinter import ttk
+
+import diagnostics
+from gui.common import PALETTE
+
+REFRESH_MS = 1000
+
+
+def open_diagnostics(root, log_path=None):
+    dlg = tk.Toplevel(root)
+    dlg.title("Diagnostics")
+    dlg.geometry("960x600")
+    dlg.transient(root)
+
+    if not diagnostics.ENABLED:
+        tk.Label(dlg, justify="left", padx=16, pady=16, text=(
+            "Profiling is off.\n\n"
+            "Start the app with MINICRM_PROFILE=1 to time database statements, screen actions\n"
+            "and event handlers. Events slower than MINICRM_SLOW_MS (default 50) are also\n"
+            "written to minicrm-perf.log next to the database.")).pack(anchor="w")
+        tk.Button(dlg, text="Close", command=dlg.destroy).pack(pady=8)
+        return dlg
+
+    header = tk.Label(dlg, anchor="w", padx=10, pady=6)
+    header.pack(fill="x")
+
+    summary_cols = ("Name", "Count", "p50", "p95", "p99", "Max", "Total")
+    summary = ttk.Treeview(dlg, columns=summary_cols, show="headings", height=14)
+    for col in summary_cols:
+        summary.heading(col, text=col if col in ("Name", "Count") else col + " ms")
+        summary.column(col, width=460 if col == "Name" else 70, anchor="w" if col == "Name" else "e")
+    summary.pack(fill="both", expand=True, padx=10)
+
+    tk.Label(dlg, text=f"Slow events (over {diagnostics.recorder.slow_ms:.0f} ms), newest first:",
+             anchor="w", padx=10, pady=4).pack(fill="x")
+    slow_cols = ("Time", "Kind", "ms", "Name")
+    slow = ttk.Treeview(dlg, columns=slow_cols, show="headings", height=8)
+    for col, width in zip(slow_cols, (80, 60, 70, 720)):
+        slow.heading(col, text=col)
+        slow.column(col, width=width, anchor="e" if col == "ms" else "w")
+    slow.pack(fill="both", expand=True, padx=10)
+
+    def refresh():
+        if not dlg.winfo_exists():
+            return
+        summary.delete(*summary.get_children())
+        for name, n, p50, p95, p99, mx, total in diagnostics.recorder.summary():
+            summary.insert("", "end", values=(name, n, f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}",
+                                              f"{mx:.1f}", f"{total:.0f}"))
+        slow.delete(*slow.get_children())
+        for when, kind, name, ms in reversed(diagnostics.recorder.slow):
+            slow.insert("", "end", values=(time.strftime("%H:%M:%S", time.localtime(when)), kind,
+                                           f"{ms:.1f}", name))
+        header.config(text=f"Log: {log_path}" if log_path else "")
+        dlg.after(REFRESH_MS, refresh)
+
+    btns = tk.Frame(dlg, pady=6)
+    btns.pack(fill="x", padx=10)
+    for text, command in (("Reset", diagnostics.recorder.reset), ("Close", dlg.destroy)):
+        tk.Button(btns, text=text, bg=PALETTE.get("BTN_BG", "#D5D8DA"), fg=PALETTE.get("BTN_FG", "#202124"),
+                  command=command).pack(side="left" if text == "Reset" else "right")
+    refresh()
+    return dlg
@@ -0,0 +1,71 @@
+# gui/history_view.py
+"""
+A contact's interaction history: the summary kept on the contacts row
+(touches, last call, last email) and the timeline from the interactions log,
+newest first. Pages are read by (ts, id) keyset as "Load more" is pressed, so
+a contact with years of history opens as fast as a new one.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from db import get_interaction_summary, get_timeline
+from gui.common import PALETTE
+
+PAGE = 100
+
+
+class HistoryWindow:
+    """Non-modal; every query goes through `db` (gui.db_executor.DBExecutor)."""
+
+    def __init__(self, root, db, cid, name):
+        self.db = db
+        self.cid = int(cid)
+        self.before = None      # (ts, id) of the last row shown
+        self.win = tk.Toplevel(root)
+        self.win.title(f"History — {name or cid}")
+        self.win.geometry("620x400")
+        self.summary = tk.Label(self.win, anchor="w", padx=10, pady=6)
+        self.summary.pack(fill="x")
+        self.tree = ttk.Treeview(self.win, columns=("When", "Kind", "Detail"), show="headings", height=14)
+        for col, width in (("When", 150), ("Kind", 70), ("Detail", 360)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=10)
+
+        btns = tk.Frame(self.win, pady=6)
+        btns.pack(fill="x", padx=10)
+        self.more_btn = tk.Button(btns, text="Load more", bg=PALETTE.get("BTN_BG", "#D5D8DA"),
+                                  fg=PALETTE.get("BTN_FG", "#202124"), command=self.load_more, state="disabled")
+        self.more_btn.pack(side="left")
+        tk.Button(btns, text="Close", bg=PALETTE.get("BTN_BG", "#D5D8DA"), fg=PALETTE.get("BTN_FG", "#202124"),
+                  command=self.win.destroy).pack(side="right")
+
+        self.db.submit(get_interaction_summary, self.db.cursor, self.cid, callback=self._show_summary)
+        self.load_more()
+
+    def _show_summary(self, summary):
+        if not self.win.winfo_exists():
+            return
+        if summary is None:
+            self.summary.config(text="Contact not found.")
+            return
+        touches, last_called, last_emailed = summary
+        self.summary.config(text=f"{touches:,} touch{'es' if touches != 1 else ''}"
+                                 f"  ·  last called {last_called or '—'}"
+                                 f"  ·  last emailed {last_emailed or '—'}")
+
+    def load_more(self):
+        self.more_btn.config(state="disabled")
+        self.db.submit(get_timeline, self.db.cursor, self.cid, self.before, PAGE, callback=self._add)
+
+    def _add(self, rows):
+        if not self.win.winfo_exists():
+            return
+        for iid, ts, kind, detail in rows:
+            self.tree.insert("", "end", iid=str(iid), values=(ts, kind, detail or ""))
+        if rows:
+            self.before = (rows[-1][1], rows[-1][0])
+        elif not self.tree.get_children():
+            self.tree.insert("", "end", values=("", "", "No history yet."))
+        self.more_btn.config(state="normal" if len(rows) == PAGE else "disabled")
@@ -0,0 +1,176 @@
+# gui/reminder_view.py
+"""
+Follow-up reminders in the GUI.
+
+ReminderScheduler keeps a reminders.FollowUpQueue and one after() timer set
+for the earliest follow-up. The window is idle in between: no polling, no
+table scans. When the timer fires, the due entries are checked against the
+database (a follow-up may have been moved or cleared since it was loaded)
+and passed to on_due. Follow-ups set in this window are pushed straight into
+the queue (schedule()); commits by other connections call for reload().
+
+FollowUpsWindow lists what is due, with Open, Done and snooze buttons.
+"""
+
+import math
+import tkinter as tk
+from tkinter import ttk
+
+from db import get_follow_ups, get_follow_ups_by_ids, now_str
+from gui.common import PALETTE
+from reminders import FollowUpQueue, follow_up_time, seconds_until
+
+
+class ReminderScheduler:
+    """on_due([(time, id, name), ...]) is called on the Tk thread as follow-ups come due."""
+    MAX_SLEEP_MS = 15 * 60 * 1000   # re-arm at least this often, in case the clock jumps
+
+    def __init__(self, widget, db, on_due):
+        self.widget = widget
+        self.db = db
+        self.on_due = on_due
+        self.queue = FollowUpQueue()
+        self._timer = None
+        self._loading = False
+        self._generation = 0    # bumped by reload(), so loads started before it are ignored
+        self._fired = set()     # (id, time) already passed to on_due; a reload doesn't repeat them
+
+    def start(self):
+        self.reload()
+
+    def reload(self):
+        """Forget what is loaded and read the index again from the start."""
+        self._generation += 1
+        self._loading = False
+        self.queue.reset()
+        self._arm()
+
+    def schedule(self, ids, when):
+        """Follow-ups just set (when=None: cleared) through this window's connection."""
+        for cid in ids:
+            self.queue.schedule(int(cid), when)
+        self._arm()
+
+    def _arm(self):
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+        if self.queue.needs_load():
+            self._load()
+            return
+        when = self.queue.next_time()
+        if when is not None:
+            delay = min(self.MAX_SLEEP_MS, math.ceil(seconds_until(when) * 1000))
+            self._timer = self.widget.after(delay, self._fire)
+
+    def _load(self):
+        if self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+
+        def loaded(rows):
+            if generation == self._generation:
+                self._loading = False
+                self.queue.load(rows)
+                self._arm()
+
+        def failed(error):
+            if generation == self._generation:
+                self._loading = False   # tried again on the next reload() or schedule()
+        self.db.submit(get_follow_ups, self.db.cursor, self.queue.horizon, None, self.queue.window,
+                       callback=loaded, errback=failed)
+
+    def _fire(self):
+        self._timer = None
+        due = self.queue.pop_due()
+        if due:
+            self.db.submit(get_follow_ups_by_ids, self.db.cursor, [cid for _, cid in due],
+                           callback=lambda current: self._confirm(due, current), errback=lambda error: None)
+        self._arm()
+
+    def _confirm(self, due, current):
+        # only follow-ups still set to the time they were loaded with, once each
+        hits = []
+        for when, cid in due:
+            now = current.get(cid)
+            if now and now[0] == when and (cid, when) not in self._fired:
+                self._fired.add((cid, when))
+                hits.append((when, cid, now[1]))
+        if hits:
+            self.on_due(hits)
+
+
+class FollowUpsWindow:
+    """
+    Non-modal list of due follow-ups; add() appends while it is open.
+        - on_open(cid): show the contact
+        - on_reschedule(ids, when): set (when=None: clear) their follow-ups
+    """
+    MAX_ROWS = 500
+    SNOOZE = (("Tomorrow", 1), ("Next Week", 7))
+
+    def __init__(self, root, on_open, on_reschedule):
+        self.on_open = on_open
+        self.on_reschedule = on_reschedule
+        self.hidden = 0     # due follow-ups beyond MAX_ROWS
+        self.win = tk.Toplevel(root)
+        self.win.title("Follow-Ups Due")
+        self.win.geometry("560x360")
+        self.label = tk.Label(self.win, anchor="w", padx=10, pady=6)
+        self.label.pack(fill="x")
+        self.tree = ttk.Treeview(self.win, columns=("Due", "Name"), show="headings", height=12)
+        self.tree.heading("Due", text="Due")
+        self.tree.heading("Name", text="Name")
+        self.tree.column("Due", width=150, anchor="w")
+        self.tree.column("Name", width=360, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=10)
+        self.tree.bind("<Double-1>", lambda e: self._open())
+
+        btns = tk.Frame(self.win, pady=6)
+        btns.pack(fill="x", padx=10)
+        buttons = [("Open", self._open), ("Done", lambda: self._reschedule(None))]
+        buttons += [(text, lambda d=days: self._reschedule(follow_up_time(d))) for text, days in self.SNOOZE]
+        for text, command in buttons:
+            tk.Button(btns, text=text, bg=PALETTE.get("BTN_BG", "#D5D8DA"), fg=PALETTE.get("BTN_FG", "#202124"),
+                      command=command).pack(side="left", padx=(0, 6))
+        tk.Button(btns, text="Close", bg=PALETTE.get("BTN_BG", "#D5D8DA"), fg=PALETTE.get("BTN_FG", "#202124"),
+                  command=self.win.destroy).pack(side="right")
+
+    def exists(self):
+        return bool(self.win.winfo_exists())
+
+    def add(self, due):
+        """Show (time, id, name) rows that came due."""
+        for when, cid, name in due:
+            iid = str(cid)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=(when, name or ""))
+            elif len(self.tree.get_children()) < self.MAX_ROWS:
+                self.tree.insert("", "end", iid=iid, values=(when, name or ""))
+            else:
+                self.hidden += 1
+        self._update_label()
+        self.win.bell()
+        self.win.deiconify()
+        self.win.lift()
+
+    def _update_label(self):
+        n = len(self.tree.get_children())
+        text = f"{n + self.hidden:,} follow-up{'s' if n + self.hidden != 1 else ''} due"
+        if self.hidden:
+            text += f" (first {n:,} shown)"
+        self.label.config(text=text + f" — as of {now_str()[11:16]}")
+
+    def _open(self):
+        sel = self.tree.selection()
+        if sel:
+            self.on_open(sel[0])
+
+    def _reschedule(self, when):
+        ids = list(self.tree.selection())
+        if not ids:
+            return
+        self.on_reschedule(ids, when)
+        self.tree.delete(*ids)
+        self._update_label()
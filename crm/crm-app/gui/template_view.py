@@ -2,10 +2,14 @@
 import tkinter as tk
 from tkinter import messagebox
 from gui.common import style_tk_widget
+from template_engine import CompiledTemplate, TemplateError
+import diagnostics
 
 class TemplateView(tk.Frame):
-    def __init__(self, parent, template_manager, on_templates_changed=None, *args, **kwargs):
+    def __init__(self, parent, db, template_manager, on_templates_changed=None, *args, **kwargs):
+        # db: gui.db_executor.DBExecutor; TemplateManager calls are submitted to its worker thread
         super().__init__(parent, *args, **kwargs)
+        self.db = db
         self.tm = template_manager
         self.on_templates_changed = on_templates_changed
         self.current_tpl_id = tk.StringVar(value="")
@@ -43,13 +47,28 @@ class TemplateView(tk.Frame):
         self.tpl_body.grid(row=2, column=1, padx=5, pady=3)
         style_tk_widget(self.tpl_body)
 
-    def refresh_tpl_list(self):
+    def refresh_tpl_list(self, select_id=None):
+        span = diagnostics.span("refresh_tpl_list")
+
+        def loaded(rows):
+            self._fill_tpl_list(rows, select_id)
+            span.end()
+        self.db.submit(self.tm.list, callback=loaded)
+
+    def _fill_tpl_list(self, rows, select_id=None):
         self.tpl_list.delete(0, tk.END)
         self._ids = []
-        for row in self.tm.list():
+        for row in rows:
             tid, name, subject, body = row
             self._ids.append(tid)
             self.tpl_list.insert(tk.END, name)
+        # select created/updated
+        for i, t in enumerate(self._ids):
+            if select_id is not None and str(t) == str(select_id):
+                self.tpl_list.selection_clear(0, tk.END)
+                self.tpl_list.selection_set(i)
+                self.tpl_list.see(i)
+                break
 
     def _on_select(self, event=None):
         sel = self.tpl_list.curselection()
@@ -58,7 +77,9 @@ class TemplateView(tk.Frame):
             return
         idx = sel[0]
         tid = self._ids[idx]
-        rec = self.tm.get(tid)
+        self.db.submit(self.tm.get, tid, callback=self._fill_fields)
+
+    def _fill_fields(self, rec):
         if rec:
             _id, name, subject, body = rec
             self.current_tpl_id.set(str(_id))
@@ -83,24 +104,28 @@ class TemplateView(tk.Frame):
         if not name:
             messagebox.showwarning("Missing name", "Please provide a template name.")
             return
+        try:
+            # catch unknown {{placeholders}} now rather than when an email is sent
+            CompiledTemplate(None, name, subject, body)
+        except TemplateError as e:
+            messagebox.showwarning("Template error", str(e))
+            return
         tid = self.current_tpl_id.get()
+
+        def saved(new_id):
+            if tid:
+                messagebox.showinfo("Saved", "Template updated.")
+            else:
+                self.current_tpl_id.set(str(new_id))
+                messagebox.showinfo("Saved", "Template created.")
+            self.refresh_tpl_list(select_id=tid or new_id)
+            if self.on_templates_changed:
+                self.on_templates_changed()
+
         if tid:
-            self.tm.update(int(tid), name, subject, body)
-            messagebox.showinfo("Saved", "Template updated.")
+            self.db.submit(self.tm.update, int(tid), name, subject, body, callback=saved)
         else:
-            new_id = self.tm.create(name, subject, body)
-            self.current_tpl_id.set(str(new_id))
-            messagebox.showinfo("Saved", "Template created.")
-        self.refresh_tpl_list()
-        # select created/updated
-        for i, t in enumerate(self._ids):
-            if str(t) == self.current_tpl_id.get():
-                self.tpl_list.selection_clear(0, tk.END)
-                self.tpl_list.selection_set(i)
-                self.tpl_list.see(i)
-                break
-        if self.on_templates_changed:
-            self.on_templates_changed()
+            self.db.submit(self.tm.create, name, subject, body, callback=saved)
 
     def delete_tpl(self):
         tid = self.current_tpl_id.get()
@@ -108,8 +133,9 @@ class TemplateView(tk.Frame):
             messagebox.showwarning("No template", "Select a template to delete.")
             return
         if messagebox.askyesno("Delete?", "Delete this template?"):
-            self.tm.delete(int(tid))
-            self.new_tpl()
-            self.refresh_tpl_list()
-            if self.on_templates_changed:
-                self.on_templates_changed()
+            def deleted(_):
+                self.new_tpl()
+                self.refresh_tpl_list()
+                if self.on_templates_changed:
+                    self.on_templates_changed()
+            self.db.submit(self.tm.delete, int(tid), callback=deleted)
@@ -0,0 +1,498 @@
+# gui/virtual_tree.py
+"""
+Virtualized Treeview helpers.
+
+A ttk.Treeview keeps every inserted item alive, so loading the whole contacts
+table makes each refresh O(N). VirtualTree drives the scrollbar itself and only
+keeps the rows that fit on screen as real Treeview items; everything else is
+fetched from a row source on demand as the user scrolls.
+
+A row source needs:
+ - refresh(done)        re-read the row count and drop cached rows, then call done()
+ - __len__()            total number of rows
+ - rows(offset, limit)  rows for a window of list positions, or None while they
+                        are being fetched (the source then calls on_ready())
+ - key(row)             stable key for a row, used as the Treeview iid
+ - on_ready             attribute set by VirtualTree
+and, for single-row edits without a reload:
+ - inserted(offset, row), updated(row), removed(key) -> offset or None
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+class KeysetSource:
+    """
+    Row source backed by keyset-paginated queries.
+
+    Arguments are callables (usually db.py functions with the cursor bound):
+        - count()                    -> total rows
+        - page_below(key, limit)     -> rows after `key` in list order (key=None: from the top)
+        - page_above(key, limit)     -> rows before `key` in list order
+        - key_at(offset)             -> key of the row at a list position (used for jumps)
+
+    A contiguous buffer of rows around the visible window is kept, so scrolling
+    by lines or pages extends the buffer with one keyset query and dragging the
+    scrollbar costs one key lookup plus one keyset query.
+
+    With an `executor` (gui.db_executor.DBExecutor) the queries run on the
+    database thread: rows() returns None for a window that is not buffered yet
+    and calls on_ready() once it is. Without one, queries run inline.
+    """
+
+    def __init__(self, count, page_below, page_above, key_at, page_size=200,
+                 key=lambda r: r[0], executor=None):
+        self._count = count
+        self._page_below = page_below
+        self._page_above = page_above
+        self._key_at = key_at
+        self.page_size = page_size
+        self.key = key
+        self.executor = executor
+        self.on_ready = None
+        self._total = 0
+        self._buf = []
+        self._buf_start = 0
+        self._gen = 0           # bumped by refresh(); older fetch results are dropped
+        self._pending = False
+
+    def _call(self, fn, arg, callback):
+        if self.executor is None:
+            callback(fn(arg) if arg is not None else fn())
+        elif arg is None:
+            self.executor.submit(fn, callback=callback)
+        else:
+            self.executor.submit(fn, arg, callback=callback)
+
+    def refresh(self, done=None):
+        self._gen += 1
+        gen = self._gen
+
+        def apply(total):
+            if gen != self._gen:
+                return
+            self._total = total
+            self._buf = []
+            self._buf_start = 0
+            self._pending = False
+            if done:
+                done()
+        self._call(self._count, None, apply)
+
+    def __len__(self):
+        return self._total
+
+    def rows(self, offset, limit):
+        end = min(offset + limit, self._total)
+        if offset >= end:
+            return []
+        if self._buf and self._buf_start <= offset and end <= self._buf_start + len(self._buf):
+            self._trim(offset, end)
+            lo = offset - self._buf_start
+            return self._buf[lo:lo + (end - offset)]
+        if self._pending:
+            return None
+        plan = self._plan(offset, end, limit)
+        gen = self._gen
+        self._pending = True
+
+        def apply(rows):
+            if gen != self._gen:
+                return
+            self._pending = False
+            self._apply(plan, list(rows))
+            if self.executor is not None and self.on_ready:
+                self.on_ready()
+        self._call(self._fetch, plan, apply)
+        if self.executor is None:
+            lo = max(0, offset - self._buf_start)
+            return self._buf[lo:lo + (end - offset)]
+        return None
+
+    def _plan(self, offset, end, limit):
+        buf_end = self._buf_start + len(self._buf)
+        if not self._buf or offset > buf_end or end < self._buf_start:
+            return ("jump", offset, max(limit, self.page_size))
+        if end > buf_end:
+            return ("below", self.key(self._buf[-1]), max(end - buf_end, self.page_size))
+        want = min(max(self._buf_start - offset, self.page_size), self._buf_start)
+        return ("above", self.key(self._buf[0]), want)
+
+    def _fetch(self, plan):
+        # runs on the database thread when there is an executor
+        kind, arg, n = plan
+        if kind == "jump":
+            # seek to the key just above the window, then read down from it
+            if arg == 0:
+                return self._page_below(None, n)
+            before = self._key_at(arg - 1)
+            return self._page_below(before, n) if before is not None else []
+        if kind == "below":
+            return self._page_below(arg, n)
+        return self._page_above(arg, n)
+
+    def _apply(self, plan, rows):
+        kind, arg, n = plan
+        if kind == "jump":
+            self._buf = rows
+            self._buf_start = arg
+        elif kind == "below":
+            self._buf.extend(rows)
+        else:
+            self._buf[:0] = rows
+            self._buf_start -= len(rows)
+            if len(rows) < n:
+                # fewer rows above than counted: rows were deleted elsewhere
+                self._total -= self._buf_start
+                self._buf_start = 0
+            return
+        if len(rows) < n:
+            # the list ends here (rows were deleted elsewhere since the count)
+            self._total = min(self._total, self._buf_start + len(self._buf))
+
+    # ---- single-row edits (keep the buffer in step without re-querying) ----
+    def _drop_fetch(self):
+        # An in-flight fetch was planned against the old offsets: ignore its
+        # result and ask the view to render (and fetch) again afterwards.
+        if self._pending:
+            self._gen += 1
+            self._pending = False
+            if self.executor is not None and self.on_ready:
+                self.executor.submit(int, callback=lambda _: self.on_ready())
+
+    def inserted(self, offset, row):
+        self._drop_fetch()
+        self._total += 1
+        buf_end = self._buf_start + len(self._buf)
+        if self._buf_start <= offset <= buf_end:
+            self._buf.insert(offset - self._buf_start, row)
+        elif offset < self._buf_start:
+            self._buf_start += 1
+
+    def updated(self, row):
+        k = self.key(row)
+        for i, r in enumerate(self._buf):
+            if self.key(r) == k:
+                self._buf[i] = row
+                return
+
+    def removed(self, key):
+        """Returns the list offset of the removed row, or None if it was not buffered."""
+        self._drop_fetch()
+        self._total = max(0, self._total - 1)
+        for i, r in enumerate(self._buf):
+            if str(self.key(r)) == str(key):
+                del self._buf[i]
+                return self._buf_start + i
+        # position unknown: drop the buffer, the next rows() call seeks again
+        self._buf = []
+        return None
+
+    def _trim(self, offset, end):
+        # keep at most a few pages around the requested window
+        keep = 3 * self.page_size
+        if len(self._buf) <= keep:
+            return
+        lo = max(offset - self.page_size, self._buf_start)
+        hi = min(max(end + self.page_size, lo + keep), self._buf_start + len(self._buf))
+        self._buf = self._buf[lo - self._buf_start:hi - self._buf_start]
+        self._buf_start = lo
+
+
+class SequenceSource:
+    """
+    Row source over rows already in memory (e.g. a sorted contact_store view).
+
+    `index()` returns the list order as a sequence of handles and is called
+    again by refresh() and after edits; `row(handle)` builds the row for one
+    handle. Nothing is fetched, so rows() never returns None.
+    """
+
+    def __init__(self, index, row, key=lambda r: r[0]):
+        self._index_of = index
+        self._row = row
+        self.key = key
+        self.on_ready = None
+        self._index = ()
+
+    def refresh(self, done=None):
+        self._index = self._index_of()
+        if done:
+            done()
+
+    def __len__(self):
+        return len(self._index)
+
+    def rows(self, offset, limit):
+        row = self._row
+        return [row(h) for h in self._index[offset:offset + limit]]
+
+    def inserted(self, offset, row):
+        self._index = self._index_of()
+
+    def updated(self, row):
+        pass
+
+    def removed(self, key):
+        # the position is not tracked; VirtualTree re-renders the window
+        self._index = self._index_of()
+        return None
+
+
+class VirtualTree:
+    """
+    Wraps an existing Treeview + Scrollbar and renders only the visible rows.
+
+    Selection is remembered by key, so a selected row that scrolls out of view
+    stays selected and is re-selected when it comes back. Use selection() /
+    clear_selection() here instead of the Treeview methods. `on_select` is
+    called (with the Tk event) after the remembered selection is updated.
+    """
+
+    def __init__(self, tree, scrollbar, source=None, on_select=None,
+                 even_bg="#FFFFFF", odd_bg="#F3F3F3"):
+        self.tree = tree
+        self.vsb = scrollbar
+        self.source = source
+        self.on_select = on_select
+        self.first = 0
+        self.visible = int(tree.cget("height") or 14)
+        self._selected = {}     # iid -> None, ordered
+        self._rendered = ()
+        self._stale = False     # True while the rows for self.first are loading
+        self._on_render = []    # refresh() callbacks waiting for their rows
+
+        tree.tag_configure("evenrow", background=even_bg)
+        tree.tag_configure("oddrow", background=odd_bg)
+        scrollbar.configure(command=self.yview)
+
+        tree.bind("<<TreeviewSelect>>", self._on_tree_select, add="+")
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<MouseWheel>", self._on_mousewheel)
+        tree.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        tree.bind("<Button-5>", lambda e: self._scroll_units(3))
+        tree.bind("<Up>", lambda e: self._move_focus(-1))
+        tree.bind("<Down>", lambda e: self._move_focus(1))
+        tree.bind("<Prior>", lambda e: self._move_focus(-self.visible))
+        tree.bind("<Next>", lambda e: self._move_focus(self.visible))
+        tree.bind("<Home>", lambda e: self._move_focus(-len(self)))
+        tree.bind("<End>", lambda e: self._move_focus(len(self)))
+
+    def __len__(self):
+        return len(self.source) if self.source is not None else 0
+
+    # ---- data ----
+    def set_source(self, source, done=None):
+        self.source = source
+        self.first = 0
+        self.refresh(done)
+
+    def refresh(self, done=None):
+        """Re-count and re-read the visible window, keeping the scroll position.
+        done() is called once those rows are on screen."""
+        if self.source is None:
+            return
+        source = self.source
+        source.on_ready = self.render
+
+        def counted():
+            if source is self.source:
+                if done:
+                    self._on_render.append(done)
+                self.render()
+        source.refresh(counted)
+
+    def render(self):
+        """Show the window at self.first. Returns False while its rows are still loading."""
+        if self.source is None:
+            return False
+        total = len(self)
+        self.first = max(0, min(self.first, total - self.visible))
+        rows = self.source.rows(self.first, self.visible)
+        if rows is None:
+            # keep showing the old rows; the source calls render() when the new ones arrive
+            self._stale = True
+            self._update_scrollbar()
+            return False
+        self._stale = False
+
+        tree = self.tree
+        tree.delete(*tree.get_children())
+        for r in rows:
+            tree.insert("", "end", iid=str(self.source.key(r)), values=r)
+        self._rendered = tree.get_children()
+        self._restripe()
+
+        keep = [iid for iid in self._selected if tree.exists(iid)]
+        if keep:
+            tree.selection_set(keep)
+        self._update_scrollbar()
+        if self._on_render:
+            callbacks, self._on_render = self._on_render, []
+            for callback in callbacks:
+                callback()
+        return True
+
+    # ---- single-row edits: O(visible) Treeview work instead of a full reload ----
+    def insert_row(self, row, offset=0):
+        """Show a newly added row at a list position (offset 0 is the top)."""
+        self.source.inserted(offset, row)
+        if self._stale:
+            # the window on screen is not the one at self.first yet
+            if offset < self.first:
+                self.first += 1
+            self.render()
+        elif offset < self.first:
+            # keep the same rows on screen; their list positions moved by one
+            self.first += 1
+            self._restripe()
+        elif offset < self.first + self.visible:
+            idx = offset - self.first
+            self.tree.insert("", idx, iid=str(self.source.key(row)), values=row)
+            children = self.tree.get_children()
+            if len(children) > self.visible:
+                self.tree.delete(children[-1])
+            self._rendered = self.tree.get_children()
+            self._restripe(idx)
+        self._update_scrollbar()
+
+    def update_row(self, row):
+        """Refresh one row in place if it is on screen."""
+        self.source.updated(row)
+        iid = str(self.source.key(row))
+        if iid in self._rendered:
+            self.tree.item(iid, values=row)
+
+    def remove_row(self, key):
+        """Drop one row and pull the next one up into the window."""
+        iid = str(key)
+        offset = self.source.removed(key)
+        self._selected.pop(iid, None)
+        if offset is None or self._stale:
+            if offset is not None and offset < self.first:
+                self.first -= 1
+            self.render()
+            return
+        if iid in self._rendered:
+            if self.first + self.visible > len(self) and self.first > 0:
+                # at the bottom of the list: the window has to move up
+                self.render()
+                return
+            idx = self._rendered.index(iid)
+            self.tree.delete(iid)
+            last = self.first + len(self._rendered) - 1
+            # None while loading: the source re-renders when the row arrives
+            for r in self.source.rows(last, 1) or ():
+                self.tree.insert("", "end", iid=str(self.source.key(r)), values=r)
+            self._rendered = self.tree.get_children()
+            self._restripe(idx)
+        elif offset < self.first:
+            self.first -= 1
+            self._restripe()
+        self._update_scrollbar()
+
+    def _restripe(self, start=0):
+        # only rows at or after `start` change parity
+        for i in range(start, len(self._rendered)):
+            tag = "evenrow" if (self.first + i) % 2 == 0 else "oddrow"
+            self.tree.item(self._rendered[i], tags=(tag,))
+
+    def _update_scrollbar(self):
+        total = len(self)
+        if total <= 0:
+            self.vsb.set(0.0, 1.0)
+        else:
+            self.vsb.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+
+    def visible_keys(self):
+        """iids of the rows on screen, top to bottom."""
+        return tuple(self._rendered)
+
+    # ---- selection ----
+    def selection(self):
+        return tuple(self._selected)
+
+    def clear_selection(self):
+        self._selected = {}
+        self.tree.selection_remove(*self.tree.selection())
+
+    def _on_tree_select(self, event=None):
+        # Rows in the window follow the Treeview; rows scrolled away keep their state.
+        current = self.tree.selection()
+        rendered = set(self._rendered)
+        kept = {iid: None for iid in self._selected if iid not in rendered}
+        kept.update((iid, None) for iid in current)
+        self._selected = kept
+        if self.on_select:
+            self.on_select(event)
+
+    # ---- scrolling ----
+    def yview(self, *args):
+        total = len(self)
+        if not args or total <= 0:
+            return
+        if args[0] == "moveto":
+            self.first = int(round(float(args[1]) * total))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, self.visible - 1)
+            self.first += step
+        self.render()
+
+    def _scroll_units(self, n):
+        self.yview("scroll", n, "units")
+        return "break"
+
+    def _on_mousewheel(self, event):
+        delta = event.delta
+        if abs(delta) >= 120:      # Windows reports multiples of 120
+            delta //= 120
+        return self._scroll_units(-delta)
+
+    def _move_focus(self, step):
+        """Keyboard navigation: move the cursor row, scrolling the window as needed."""
+        total = len(self)
+        if total <= 0:
+            return "break"
+        focus = self.tree.focus()
+        if focus in self._rendered:
+            pos = self.first + self._rendered.index(focus)
+        else:
+            pos = self.first if step > 0 else self.first + len(self._rendered) - 1
+            step = 0
+        pos = max(0, min(total - 1, pos + step))
+        if pos < self.first or pos >= self.first + self.visible:
+            self.first = pos if pos < self.first else pos - self.visible + 1
+            if not self.render():
+                # rows are loading; the window moves when they arrive
+                return "break"
+        idx = pos - self.first
+        if 0 <= idx < len(self._rendered):
+            iid = self._rendered[idx]
+            self.tree.focus(iid)
+            self.tree.selection_set(iid)
+        return "break"
+
+    def _on_configure(self, event=None):
+        # second pass picks up the real row height once a row has been drawn
+        for _ in range(2):
+            visible = self._rows_that_fit()
+            if visible == self.visible:
+                break
+            self.visible = visible
+            self.render()
+
+    def _rows_that_fit(self):
+        tree = self.tree
+        try:
+            rowheight = int(ttk.Style(tree).lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            rowheight = 20
+        top = 25
+        if self._rendered:
+            bbox = tree.bbox(self._rendered[0])
+            if bbox:
+                top, rowheight = bbox[1], bbox[3]
+        return max(1, (tree.winfo_height() - top) // max(1, rowheight))
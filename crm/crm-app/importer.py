@@ -0,0 +1,259 @@
+# importer.py
+"""
+Bulk CSV import.
+
+Streams the file row by row (constant memory), inserts in large
+single-transaction batches and skips contacts whose email is already in the
+database or earlier in the file.
+
+    python3 importer.py contacts.csv [--db contacts.db] [--batch-size 20000]
+
+The command line (and the GUI) run the import as a durable job (see
+jobqueue.py): the file is first split into batches by byte offset, and each
+batch is committed together with its job item, so an interrupted import
+resumes at the first batch that wasn't committed:
+
+    python3 importer.py --resume
+"""
+
+import argparse, csv, io, itertools, os, sys
+
+from db import connect_db, now_str, existing_emails, insert_contacts_many
+import jobqueue
+
+FIELDS = ("name", "email", "phone", "website", "status", "notes",
+          "date_added", "date_called", "date_emailed")
+
+# Common header spellings -> contacts column
+HEADER_ALIASES = {
+    "full name": "name", "contact": "name", "contact name": "name",
+    "e-mail": "email", "email address": "email", "e-mail address": "email",
+    "phone number": "phone", "tel": "phone", "telephone": "phone", "mobile": "phone",
+    "url": "website", "web": "website", "site": "website", "web site": "website",
+    "note": "notes", "comments": "notes",
+    "added": "date_added", "date called": "date_called", "date emailed": "date_emailed",
+    "date added": "date_added",
+}
+
+DEFAULT_BATCH = 20000
+
+
+class ImportStats:
+    __slots__ = ("read", "inserted", "duplicates", "empty")
+
+    def __init__(self):
+        self.read = self.inserted = self.duplicates = self.empty = 0
+
+    def __str__(self):
+        return (f"{self.inserted:,} imported, {self.duplicates:,} duplicates skipped, "
+                f"{self.empty:,} empty rows skipped ({self.read:,} rows read)")
+
+
+def map_header(header):
+    """CSV header -> list of column names (None for columns we don't import)."""
+    cols = []
+    for h in header:
+        key = (h or "").strip().lower().replace("_", " ")
+        key = HEADER_ALIASES.get(key, key.replace(" ", "_"))
+        cols.append(key if key in FIELDS else None)
+    if "name" not in cols and "email" not in cols:
+        raise ValueError("The CSV needs a header row with at least a name or email column.")
+    return cols
+
+
+def iter_contacts(f):
+    """Yields contact tuples (insert_contact order) from an open CSV text file; None for empty rows."""
+    reader = csv.reader(f)
+    cols = map_header(next(reader, []))
+    yield from _contact_rows(reader, cols)
+
+
+def _contact_rows(reader, cols):
+    # for each contacts field, the CSV column it comes from (or None)
+    where = [cols.index(c) if c in cols else None for c in FIELDS]
+    width = len(cols)
+    added = now_str()
+    for record in reader:
+        if len(record) < width:
+            record += [""] * (width - len(record))
+        row = [record[i].strip() or None if i is not None else None for i in where]
+        if not row[0] and not row[1]:
+            yield None
+            continue
+        row[1] = row[1] or ""
+        row[4] = row[4] or "Not Contacted"
+        row[6] = row[6] or added
+        yield tuple(row)
+
+
+def import_csv(conn, path, batch_size=DEFAULT_BATCH, progress=None, cancel=None):
+    """
+    Import contacts from a CSV file into `conn`.
+        - progress(bytes_done, bytes_total, stats) is called after each batch
+        - cancel: optional threading.Event; the import stops after the current batch
+    Returns ImportStats. Each committed batch stays committed if the import stops.
+    """
+    cursor = conn.cursor()
+    stats = ImportStats()
+    total = os.path.getsize(path)
+    with open(path, "rb") as raw:
+        f = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        batch = []
+        for row in iter_contacts(f):
+            stats.read += 1
+            if row is None:
+                stats.empty += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _import_batch(conn, cursor, batch, stats)
+                batch = []
+                if progress:
+                    progress(raw.tell(), total, stats)
+                if cancel is not None and cancel.is_set():
+                    return stats
+        if batch:
+            _import_batch(conn, cursor, batch, stats)
+        if progress:
+            progress(total, total, stats)
+    return stats
+
+
+def _import_batch(conn, cursor, batch, stats):
+    # dedupe against the database (email index) and within the batch
+    seen = existing_emails(cursor, [r[1] for r in batch])
+    rows = []
+    for r in batch:
+        email = r[1].lower()
+        if email:
+            if email in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(email)
+        rows.append(r)
+    inserted = insert_contacts_many(cursor, conn, rows)
+    stats.inserted += inserted
+    stats.duplicates += len(rows) - inserted
+
+
+# ---- as a resumable job ----
+def _records(raw):
+    """csv records from a binary file, each with the byte offset just past it."""
+    pos = raw.tell()
+    first = pos == 0
+
+    def lines():
+        nonlocal pos, first
+        for line in raw:
+            pos += len(line)
+            yield line.decode("utf-8-sig" if first else "utf-8")
+            first = False
+
+    for record in csv.reader(lines()):
+        yield pos, record
+
+
+def plan_import(path, batch_size=DEFAULT_BATCH):
+    """(header, [(offset, records), ...]) splitting the file into batches of data rows."""
+    batches = []
+    with open(path, "rb") as raw:
+        records = _records(raw)
+        start, header = next(records, (0, []))
+        map_header(header)  # fail early on a file we can't import
+        count = 0
+        for end, _ in records:
+            count += 1
+            if count == batch_size:
+                batches.append((start, count))
+                start, count = end, 0
+        if count:
+            batches.append((start, count))
+    return header, batches
+
+
+def start_import_job(conn, path, batch_size=DEFAULT_BATCH):
+    """Plan `path` into batches and queue an import job; returns the job id."""
+    path = os.path.abspath(path)
+    header, batches = plan_import(path, batch_size)
+    st = os.stat(path)
+    # one batch per transaction: batches are already large
+    params = {"path": path, "header": header, "size": st.st_size, "mtime": st.st_mtime,
+              "items_per_batch": 1}
+    return jobqueue.create_job(conn.cursor(), conn, "import", params,
+                               ((offset, {"offset": offset, "rows": n}) for offset, n in batches))
+
+
+@jobqueue.register("import")
+def import_worker(conn, job):
+    path = job.params["path"]
+    st = os.stat(path)
+    if (st.st_size, st.st_mtime) != (job.params["size"], job.params["mtime"]):
+        raise ValueError(f"{path} changed since the import started; start a new import.")
+    cols = map_header(job.params["header"])
+    raw = open(path, "rb")
+
+    def process(items):
+        batch, empty = [], 0
+        for _, _, payload, _ in items:
+            raw.seek(payload["offset"])
+            reader = (r for _, r in _records(raw))
+            for row in _contact_rows(itertools.islice(reader, payload["rows"]), cols):
+                if row is None:
+                    empty += 1
+                else:
+                    batch.append(row)
+
+        def apply(cursor, conn):
+            stats = ImportStats()
+            _import_batch(conn, cursor, batch, stats)
+            return {"inserted": stats.inserted, "duplicates": stats.duplicates, "empty": empty}
+        return [(item_id, None) for item_id, _, _, _ in items], apply
+
+    process.close = raw.close
+    return process
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import contacts from a CSV file.")
+    ap.add_argument("csv", nargs="?", help="CSV file with a header row (name, email, phone, website, status, notes, ...)")
+    ap.add_argument("--resume", action="store_true", help="finish interrupted imports instead")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    args = ap.parse_args(argv)
+    if not args.csv and not args.resume:
+        ap.error("give a CSV file, or --resume")
+
+    conn, cursor = connect_db(args.db)
+
+    def report(job):
+        pct = 100 * (job.done + job.failed) // job.total if job.total else 100
+        print(f"\r{pct:3d}%  {_stats(job)}", end="", file=sys.stderr, flush=True)
+
+    try:
+        if args.resume:
+            ids = [j.id for j in reversed(jobqueue.unfinished_jobs(cursor, "import"))]
+        else:
+            ids = [start_import_job(conn, args.csv, args.batch_size)]
+        for job_id in ids:
+            job = jobqueue.run_job(conn, job_id, progress=report)
+            print(file=sys.stderr)
+            print(_stats(job))
+    except (ValueError, OSError, jobqueue.JobBusy) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+def _stats(job):
+    stats = ImportStats()
+    stats.inserted = job.stats.get("inserted", 0)
+    stats.duplicates = job.stats.get("duplicates", 0)
+    stats.empty = job.stats.get("empty", 0)
+    stats.read = stats.inserted + stats.duplicates + stats.empty
+    return stats
+
+
+if __name__ == "__main__":
+    sys.exit(main())
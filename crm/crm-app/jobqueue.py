@@ -0,0 +1,362 @@
+# jobqueue.py
+"""
+Durable job queue in contacts.db (tables `jobs` and `job_items`).
+
+A job is a kind ("import", "campaign", ...), JSON params and a list of
+items, the units of work. run_job() leases a batch of pending items, hands
+it to the job's worker, then records the outcome and the worker's database
+writes in one transaction. A crash therefore loses at most the batch in
+flight: database-only work (imports) happens exactly once, and work with
+outside effects (sending email) at least once.
+
+Only one process runs a job at a time. run_job() takes a lease on the job
+row and renews it every batch; a job whose lease has expired (its worker
+died) can be resumed anywhere, and its half-done batch runs again. On the
+machine where it died, it can be resumed straight away.
+
+Workers are registered per kind:
+
+    @register("import")
+    def import_worker(conn, job):
+        def process(items):          # [(item_id, key, payload, attempts)]
+            ...                      # slow work, outside any transaction
+            def apply(cursor, conn): # runs in the completion transaction
+                ...
+                return {"inserted": n}       # optional counters for job.stats
+            return [(item_id, None or "error text"), ...], apply
+        return process               # may also have a close() method, called at the end
+
+process() may leave out items it is still working on (a send waiting to be
+retried); they stay leased and are reported from a later call. Once no
+pending items are left it is called with [] until it has reported them all.
+
+    python3 jobqueue.py                 # list jobs
+    python3 jobqueue.py run [ID ...]    # resume unfinished jobs
+    python3 jobqueue.py cancel ID
+"""
+
+import argparse, json, os, socket, sys, time
+
+from db import connect_db, transaction, now_str, _chunks
+
+ACTIVE = ("queued", "running", "paused", "failed")     # can be (re)started
+FINISHED = ("done", "cancelled")
+
+DEFAULT_LEASE = 120     # seconds a run holds a job between batches
+WORKERS = {}
+
+
+class JobBusy(RuntimeError):
+    pass
+
+
+def register(kind):
+    """Decorator: worker factory for jobs of `kind`, called as factory(conn, job)."""
+    def deco(factory):
+        WORKERS[kind] = factory
+        return factory
+    return deco
+
+
+class Job:
+    __slots__ = ("id", "kind", "params", "state", "total", "done", "failed", "stats", "error")
+    COLUMNS = "id, kind, params, state, total, done, failed, stats, error"
+
+    def __init__(self, row):
+        (self.id, self.kind, params, self.state, self.total,
+         self.done, self.failed, stats, self.error) = row
+        self.params = json.loads(params or "{}")
+        self.stats = json.loads(stats or "{}")
+
+    @property
+    def remaining(self):
+        return self.total - self.done - self.failed
+
+    def __str__(self):
+        text = f"#{self.id} {self.kind} {self.state}: {self.done:,} of {self.total:,} done"
+        if self.failed:
+            text += f", {self.failed:,} failed"
+        if self.stats:
+            text += " (" + ", ".join(f"{k} {v:,}" for k, v in self.stats.items()) + ")"
+        if self.error and self.state != "done":
+            text += f"\n  {self.error}"
+        return text
+
+
+# ---- creating and inspecting jobs ----
+def create_job(cursor, conn, kind, params, items=(), query=None):
+    """
+    Create a queued job; returns its id. Items are (key, payload) pairs, or
+    `query` is (sql, params) for a SELECT returning (key, payload) rows, so
+    large item lists never pass through Python. payloads are JSON-encoded.
+    """
+    with transaction(conn):
+        now = now_str()
+        cursor.execute("INSERT INTO jobs (kind, params, created, updated) VALUES (?, ?, ?, ?)",
+                       (kind, json.dumps(params), now, now))
+        job_id = cursor.lastrowid
+        if query:
+            sql, args = query
+            cursor.execute(f"INSERT INTO job_items (job_id, key, payload) SELECT ?, * FROM ({sql})",
+                           (job_id, *args))
+        else:
+            cursor.executemany("INSERT INTO job_items (job_id, key, payload) VALUES (?, ?, ?)",
+                               ((job_id, str(k), None if p is None else json.dumps(p)) for k, p in items))
+        cursor.execute("UPDATE jobs SET total=(SELECT COUNT(*) FROM job_items WHERE job_id=?) WHERE id=?",
+                       (job_id, job_id))
+    return job_id
+
+
+def get_job(cursor, job_id):
+    cursor.execute(f"SELECT {Job.COLUMNS} FROM jobs WHERE id=?", (job_id,))
+    row = cursor.fetchone()
+    return Job(row) if row else None
+
+
+def list_jobs(cursor, states=None, kind=None, limit=50):
+    where, params = [], []
+    if states:
+        where.append(f"state IN ({','.join('?' * len(states))})"); params.extend(states)
+    if kind:
+        where.append("kind = ?"); params.append(kind)
+    sql = f"SELECT {Job.COLUMNS} FROM jobs" + (" WHERE " + " AND ".join(where) if where else "")
+    cursor.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, limit))
+    return [Job(r) for r in cursor.fetchall()]
+
+
+def unfinished_jobs(cursor, kind=None):
+    return list_jobs(cursor, ACTIVE, kind)
+
+
+def cancel_job(cursor, conn, job_id):
+    """Stop a job for good (a running worker notices at its next batch)."""
+    with transaction(conn):
+        cursor.execute("UPDATE jobs SET state='cancelled', updated=? WHERE id=? AND state NOT IN ('done', 'cancelled')",
+                       (now_str(), job_id))
+        return cursor.rowcount > 0
+
+
+def delete_finished_jobs(cursor, conn, older_than=None):
+    """Drop finished jobs and their items (optionally only those last updated before `older_than`)."""
+    with transaction(conn):
+        sql = "SELECT id FROM jobs WHERE state IN ('done', 'cancelled')"
+        args = ()
+        if older_than:
+            sql += " AND updated < ?"; args = (older_than,)
+        cursor.execute(sql, args)
+        ids = [r[0] for r in cursor.fetchall()]
+        for chunk in _chunks(ids):
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(f"DELETE FROM job_items WHERE job_id IN ({marks})", chunk)
+            cursor.execute(f"DELETE FROM jobs WHERE id IN ({marks})", chunk)
+    return len(ids)
+
+
+# ---- running ----
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dead_owner(owner):
+    """True if `owner` is a process on this host that is no longer running."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return False    # another machine, or Windows (where os.kill(pid, 0) is not a probe)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass            # running, as another user
+    return False
+
+
+def _take_lease(cursor, conn, job_id, owner, seconds):
+    now = time.time()
+    with transaction(conn):
+        # a run on this host that crashed leaves its lease behind; it needn't be waited out
+        cursor.execute("SELECT lease_owner FROM jobs WHERE id=?", (job_id,))
+        row = cursor.fetchone()
+        stale = row[0] if row and _dead_owner(row[0]) else None
+        cursor.execute("""
+            UPDATE jobs SET state='running', lease_owner=?, lease_until=?, error=NULL, updated=?
+            WHERE id=? AND state NOT IN ('done', 'cancelled')
+              AND (lease_until IS NULL OR lease_until < ? OR lease_owner IN (?, ?))
+        """, (owner, now + seconds, now_str(), job_id, now, owner, stale))
+        if cursor.rowcount:
+            # we hold the job, so items left 'leased' belong to a run that died
+            cursor.execute("UPDATE job_items SET state='pending' WHERE job_id=? AND state='leased'", (job_id,))
+            return True
+    return False
+
+
+def _lease_items(cursor, conn, job_id, owner, limit, seconds):
+    """Renew the job lease and lease up to `limit` pending items (None if the job was cancelled/taken)."""
+    with transaction(conn):
+        cursor.execute("UPDATE jobs SET lease_until=? WHERE id=? AND lease_owner=? AND state='running'",
+                       (time.time() + seconds, job_id, owner))
+        if not cursor.rowcount:
+            return None
+        cursor.execute("""
+            UPDATE job_items SET state='leased', attempts=attempts+1
+            WHERE id IN (SELECT id FROM job_items WHERE job_id=? AND state='pending' ORDER BY id LIMIT ?)
+            RETURNING id, key, payload, attempts
+        """, (job_id, limit))
+        rows = sorted(cursor.fetchall())
+    return [(i, k, None if p is None else json.loads(p), a) for i, k, p, a in rows]
+
+
+def _complete(cursor, job_id, results, attempts, max_attempts):
+    done = [i for i, err in results if err is None]
+    retry = [(err, i) for i, err in results if err is not None and attempts[i] < max_attempts]
+    failed = [(err, i) for i, err in results if err is not None and attempts[i] >= max_attempts]
+    for chunk in _chunks(done):
+        cursor.execute(f"UPDATE job_items SET state='done', error=NULL WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+    cursor.executemany("UPDATE job_items SET state='pending', error=? WHERE id=?", retry)
+    cursor.executemany("UPDATE job_items SET state='failed', error=? WHERE id=?", failed)
+    cursor.execute("UPDATE jobs SET done=done+?, failed=failed+?, updated=? WHERE id=?",
+                   (len(done), len(failed), now_str(), job_id))
+
+
+def _add_stats(cursor, job_id, counters):
+    cursor.execute("SELECT stats FROM jobs WHERE id=?", (job_id,))
+    stats = json.loads(cursor.fetchone()[0] or "{}")
+    for k, v in counters.items():
+        stats[k] = stats.get(k, 0) + v
+    cursor.execute("UPDATE jobs SET stats=? WHERE id=?", (json.dumps(stats), job_id))
+
+
+def _release(cursor, conn, job_id, owner, state, error=None):
+    # give back leased items (the attempt didn't count) and the job lease
+    with transaction(conn):
+        cursor.execute("""
+            UPDATE job_items SET state='pending', attempts=MAX(attempts-1, 0)
+            WHERE job_id=? AND state='leased'
+        """, (job_id,))
+        cursor.execute("""
+            UPDATE jobs SET state=CASE WHEN state='cancelled' THEN state ELSE ? END,
+                            error=?, lease_owner=NULL, lease_until=NULL, updated=?
+            WHERE id=? AND lease_owner=?
+        """, (state, error, now_str(), job_id, owner))
+
+
+def run_job(conn, job_id, batch_size=None, rate=None, max_attempts=None, lease_seconds=DEFAULT_LEASE,
+            progress=None, cancel=None, **options):
+    """
+    Process a job's pending items until none are left; returns the final Job.
+        - batch_size: items per transaction (default: the job's "items_per_batch" param, else 100)
+        - rate: at most this many items per second (default: the job's "rate" param, else no limit)
+        - max_attempts: an item that fails this many times is marked failed (default: the
+          job's "max_attempts" param, else 3)
+        - progress(job) after each batch; cancel: threading.Event that pauses the job
+        - options are passed to the worker factory (e.g. a password that isn't stored)
+    Raises JobBusy if another process holds the job (one on this host that
+    is no longer running doesn't count; one elsewhere holds it until its
+    lease expires). If the worker raises, the job is left 'failed'
+    (resumable) and the error re-raised.
+    """
+    cursor = conn.cursor()
+    job = get_job(cursor, job_id)
+    if job is None:
+        raise KeyError(f"No job #{job_id}")
+    if job.state in FINISHED:
+        return job
+    if job.kind not in WORKERS:
+        raise KeyError(f"No worker registered for {job.kind!r} jobs")
+    batch_size = batch_size or job.params.get("items_per_batch", 100)
+    rate = rate or job.params.get("rate")
+    max_attempts = max_attempts or job.params.get("max_attempts", 3)
+    owner = _owner()
+    if not _take_lease(cursor, conn, job_id, owner, lease_seconds):
+        cursor.execute("SELECT lease_owner, lease_until FROM jobs WHERE id=?", (job_id,))
+        holder, until = cursor.fetchone() or (None, None)
+        if until is None:
+            raise JobBusy(f"Job #{job_id} is being run by another process.")
+        raise JobBusy(f"Job #{job_id} is being run by {holder}. If that process is gone, the job "
+                      f"can be resumed once its lease expires, in {max(0, int(until - time.time())) + 1} s.")
+
+    state, error = "done", None
+    process = None
+    attempts = {}   # item id -> attempts, for items leased and not yet reported
+    try:
+        process = WORKERS[job.kind](conn, get_job(cursor, job_id), **options)
+        while True:
+            if cancel is not None and cancel.is_set():
+                state = "paused"
+                break
+            started = time.monotonic()
+            items = _lease_items(cursor, conn, job_id, owner, batch_size, lease_seconds)
+            if items is None:
+                state = "cancelled"
+                break
+            if not items and not attempts:
+                break
+            results, apply = process(items)
+            if not items and not results:
+                break   # the worker kept items it will never report; _release returns them
+            attempts.update((i, a) for i, _, _, a in items)
+            with transaction(conn):
+                if apply is not None:
+                    counters = apply(cursor, conn)
+                    if counters:
+                        _add_stats(cursor, job_id, counters)
+                _complete(cursor, job_id, results, attempts, max_attempts)
+            for i, _ in results:
+                del attempts[i]
+            if progress:
+                progress(get_job(cursor, job_id))
+            if rate:
+                pause = len(items) / rate - (time.monotonic() - started)
+                if pause > 0:
+                    if cancel is not None:
+                        cancel.wait(pause)
+                    else:
+                        time.sleep(pause)
+    except BaseException as e:
+        state, error = "failed", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        close = getattr(process, "close", None)
+        if close:
+            close()
+        _release(cursor, conn, job_id, owner, state, error)
+    return get_job(cursor, job_id)
+
+
+def main(argv=None):
+    # worker kinds register themselves on import
+    import importer, campaign   # noqa: F401
+
+    ap = argparse.ArgumentParser(description="List, resume or cancel background jobs.")
+    ap.add_argument("command", nargs="?", default="list", choices=("list", "run", "cancel", "clean"))
+    ap.add_argument("ids", nargs="*", type=int)
+    ap.add_argument("--rate", type=float, help="max items per second")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    conn, cursor = connect_db(args.db)
+    try:
+        if args.command == "list":
+            for job in list_jobs(cursor):
+                print(job)
+        elif args.command == "cancel":
+            for job_id in args.ids:
+                print(f"#{job_id}", "cancelled" if cancel_job(cursor, conn, job_id) else "not running")
+        elif args.command == "clean":
+            print(f"{delete_finished_jobs(cursor, conn):,} finished jobs removed")
+        else:
+            for job_id in args.ids or [j.id for j in reversed(unfinished_jobs(cursor))]:
+                job = run_job(conn, job_id, rate=args.rate,
+                              progress=lambda j: print(f"\r{j}", end="", file=sys.stderr, flush=True))
+                print(file=sys.stderr)
+                print(job)
+    except (JobBusy, KeyError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# reminders.py
+"""
+Follow-up reminders.
+
+Each contact can have a next_follow_up time ("YYYY-MM-DD HH:MM:SS"), kept in
+a partial index of scheduled contacts only. Nothing scans the table for due
+work: FollowUpQueue holds the earliest follow-ups as a min-heap, loaded from
+the index one window at a time, so the next due time is always heap[0] and
+memory stays the same for a hundred or a million scheduled contacts.
+
+The GUI (gui/reminder_view.py) sleeps with after() until that time, then
+shows what is due. From a terminal:
+
+    python3 reminders.py                # follow-ups due now
+    python3 reminders.py --days 7       # ... and in the next 7 days
+"""
+
+import argparse, heapq, sys
+from datetime import datetime, timedelta
+
+from db import connect_db, get_follow_ups, now_str
+
+WINDOW = 500            # follow-ups read from the index per load
+FOLLOW_UP_HOUR = 9      # "tomorrow" means tomorrow at 9:00
+
+
+def follow_up_time(days, hour=FOLLOW_UP_HOUR, now=None):
+    """The follow-up time `days` from today, at `hour` o'clock."""
+    day = (now or datetime.now()).date() + timedelta(days=days)
+    return f"{day:%Y-%m-%d} {hour:02d}:00:00"
+
+
+def seconds_until(when, now=None):
+    """Seconds from now until a stored follow-up time (0 if past or unreadable)."""
+    try:
+        due = datetime.fromisoformat(when)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, (due - (now or datetime.now())).total_seconds())
+
+
+class FollowUpQueue:
+    """
+    Min-heap of (time, id) for the earliest scheduled follow-ups.
+
+    Every follow-up up to `horizon`, the (time, id) key of the last row loaded,
+    is in the heap; later ones are only in the index until the heap runs dry
+    and the next window is loaded (needs_load()). Entries can go stale when a
+    follow-up is moved or cleared: whoever pops them checks the contact's
+    current next_follow_up before acting on it.
+    """
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.heap = []
+        self.horizon = None     # (time, id) of the last row loaded, None before the first load
+        self.complete = False   # True once the index has nothing after horizon
+
+    def needs_load(self):
+        return not self.heap and not self.complete
+
+    def load(self, rows):
+        """Add the next window: get_follow_ups(cursor, after=queue.horizon, limit=queue.window) rows."""
+        for when, cid, *_ in rows:
+            heapq.heappush(self.heap, (when, cid))
+        if rows:
+            self.horizon = tuple(rows[-1][:2])
+        if len(rows) < self.window:
+            self.complete = True
+
+    def schedule(self, cid, when):
+        """A follow-up set after loading; kept if it falls inside what was loaded, else the index has it."""
+        cid = int(cid)     # ids from the Treeview are strings; the heap and horizon hold ints
+        if when is None:
+            return
+        if self.complete or (self.horizon is not None and (when, cid) <= self.horizon):
+            heapq.heappush(self.heap, (when, cid))
+
+    def next_time(self):
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now=None):
+        """(time, id) of every loaded follow-up due by `now` (default: now), earliest first."""
+        now = now or now_str()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+        return due
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="List follow-ups that are due.")
+    ap.add_argument("--days", type=int, default=0, help="also list the ones due in the next DAYS days")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    until = (datetime.now() + timedelta(days=args.days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn, cursor = connect_db(args.db)
+    n, after = 0, None
+    try:
+        while True:
+            rows = get_follow_ups(cursor, after, until, WINDOW)
+            for when, cid, name in rows:
+                print(f"{when}  #{cid}  {name or ''}")
+            n += len(rows)
+            if len(rows) < WINDOW:
+                break
+            after = rows[-1][:2]
+    finally:
+        conn.close()
+    print(f"{n:,} follow-ups due", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
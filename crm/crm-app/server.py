@@ -0,0 +1,471 @@
+# server.py
+"""
+Headless MiniCRM: contacts and templates over a local HTTP/JSON API, for
+dialers, web forms and scripts that used to open contacts.db themselves.
+
+    python3 server.py                           # http://127.0.0.1:8765/
+    python3 server.py --port 9000 --readers 8 --db other.db
+
+    GET    /contacts?limit=&before=&status=&from=&to=   newest first; "next" is the before= of the next page
+    GET    /contacts?q=text&limit=&before=              search, like the search box in the app
+    GET    /contacts/ID                                 every column, plus the interaction summary
+    POST   /contacts                                    {"name": ..., "email": ..., ...}
+    PATCH  /contacts/ID                                 only the fields given change
+    DELETE /contacts/ID
+    GET    /contacts/ID/timeline?limit=&before=         interaction history, newest first
+    POST   /contacts/ID/interactions                    {"kind": "call", "detail": ...}
+    POST   /contacts/bulk                               {"contacts": [{...}, ...]}; duplicate emails are skipped
+    POST   /contacts/lookup                             {"ids": [...]}
+    POST   /contacts/status                             {"ids": [...], "status": "Called"}
+    POST   /contacts/delete                             {"ids": [...]}
+    GET    /dashboard?days=                             contacts per status, added / calls / emails per day
+    GET    /templates
+    GET    /templates/ID
+    POST   /templates/ID/render                         {"ids": [...]}: subject and body per contact
+
+Reads run in worker threads on a pool of read-only connections
+(db.ConnectionPool), writes on the pool's one writer, so the event loop only
+parses and routes. Every GET answer has an ETag made from PRAGMA data_version
+on a watcher connection, which moves with any commit: this server's, the
+app's, an import's. A client that sends it back in If-None-Match gets
+304 Not Modified without a query, and repeated GETs of a URL are answered
+from memory until the next commit.
+
+There is no authentication: it listens on 127.0.0.1 unless --host says
+otherwise, and anything that can reach the port can change the data.
+"""
+
+import argparse, asyncio, json, os, re, sqlite3, sys, traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import dashboard, db
+from db import ConnectionPool, connect_db, now_str, EXPORT_COLUMNS, LIST_COLUMNS, PAGE_SIZE
+from template_engine import CompiledTemplate, TemplateError
+from templates import TemplateManager
+
+DEFAULT_PORT = 8765
+DEFAULT_READERS = 4
+MAX_LIMIT = 1000            # rows per page
+MAX_BULK = 10_000           # contacts or ids per bulk request
+MAX_BODY = 16 * 1024 * 1024
+CACHE_SIZE = 1000           # GET responses kept for the current data version
+FIELDS = ("name", "email", "phone", "website", "status", "notes", "date_called", "date_emailed")
+SUMMARY_COLUMNS = ("touch_count", "last_called", "last_emailed")
+TIMELINE_COLUMNS = ("id", "ts", "kind", "detail")
+TEMPLATE_COLUMNS = ("id", "name", "subject", "body")
+REASONS = {200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with `status` and {"error": message}."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("params", "query", "body")
+
+    def __init__(self, params, query, body):
+        self.params = params    # the groups of the route pattern
+        self.query = query      # query string as a dict (last value wins)
+        self.body = body
+
+    def arg(self, name, type=str, default=None):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return type(value)
+        except ValueError:
+            raise HTTPError(400, f"bad value for {name}: {value!r}") from None
+
+    def limit(self):
+        limit = self.arg("limit", int, PAGE_SIZE)
+        if not 1 <= limit <= MAX_LIMIT:
+            raise HTTPError(400, f"limit must be 1 to {MAX_LIMIT}")
+        return limit
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"null")
+        except ValueError:
+            raise HTTPError(400, "the body is not valid JSON") from None
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected a JSON object")
+        return data
+
+
+# ---- routes ----
+# handler(cursor, conn, request) -> (status, JSON-able payload), run in a worker
+# thread on a reader connection, or on the writer for write=True
+ROUTES = []
+
+def route(method, pattern, write=False):
+    def register(fn):
+        ROUTES.append((method, re.compile(pattern + r"\Z"), fn, write))
+        return fn
+    return register
+
+
+def _objects(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+def _contact(cursor, cid):
+    rows = db.get_contacts_by_ids(cursor, [cid])
+    if not rows:
+        raise HTTPError(404, f"no contact {cid}")
+    contact = dict(zip(EXPORT_COLUMNS, rows[0]))
+    contact.update(zip(SUMMARY_COLUMNS, db.get_interaction_summary(cursor, cid)))
+    return contact
+
+def _fields(data, base):
+    """Contact fields from a request object laid over `base`; checks types and names."""
+    unknown = set(data) - set(FIELDS)
+    if unknown:
+        raise HTTPError(400, "unknown or read-only fields: " + ", ".join(sorted(unknown)))
+    values = dict(base)
+    for name, value in data.items():
+        if value is not None and not isinstance(value, str):
+            raise HTTPError(400, f"{name} must be a string or null")
+        values[name] = value.strip() if value is not None else None
+        if name in db.DATE_COLUMNS:
+            try:
+                values[name] = db.canonical_date(values[name])
+            except ValueError:
+                raise HTTPError(400, f"{name} must be a date (YYYY-MM-DD)") from None
+    if not values["name"] and not values["email"]:
+        raise HTTPError(400, "provide at least a name or email")
+    return values
+
+def _new_contact(data, date_added):
+    v = _fields(data, dict(dict.fromkeys(FIELDS), status="Not Contacted"))
+    return (v["name"], v["email"], v["phone"], v["website"], v["status"], v["notes"],
+            date_added, v["date_called"], v["date_emailed"])
+
+def _ids(data):
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise HTTPError(400, "ids must be a list of integers")
+    if len(ids) > MAX_BULK:
+        raise HTTPError(413, f"at most {MAX_BULK:,} ids per request")
+    return ids
+
+def _template(cursor, conn, tid):
+    row = TemplateManager(conn, cursor).get(tid)
+    if row is None:
+        raise HTTPError(404, f"no template {tid}")
+    return row
+
+
+@route("GET", r"/contacts")
+def list_contacts(cursor, conn, req):
+    limit, before, text = req.limit(), req.arg("before", int), req.arg("q")
+    if text:
+        if any(req.arg(name) for name in ("status", "from", "to")):
+            raise HTTPError(400, "q can't be combined with status, from or to")
+        rows = [row[:-1] for row in db.search_contacts_page(cursor, text, before, limit)]
+    else:
+        rows = db.list_contacts_page(cursor, before, limit, req.arg("status"), req.arg("from", db.canonical_date),
+                                     req.arg("to", db.canonical_date))
+    return 200, {"contacts": _objects(LIST_COLUMNS, rows), "next": rows[-1][0] if len(rows) == limit else None}
+
+@route("GET", r"/contacts/(\d+)")
+def get_contact(cursor, conn, req):
+    return 200, _contact(cursor, int(req.params[0]))
+
+@route("POST", r"/contacts", write=True)
+def create_contact(cursor, conn, req):
+    cid = db.insert_contact(cursor, conn, _new_contact(req.json(), now_str()))
+    return 201, _contact(cursor, cid)
+
+@route("PATCH", r"/contacts/(\d+)", write=True)
+def update_contact(cursor, conn, req):
+    cid = int(req.params[0])
+    data = req.json()
+    with db.transaction(conn):
+        rows = db.get_contacts_by_ids(cursor, [cid])
+        if not rows:
+            raise HTTPError(404, f"no contact {cid}")
+        current = dict(zip(EXPORT_COLUMNS, rows[0]))
+        v = _fields(data, {name: current[name] for name in FIELDS})
+        db.update_contact(cursor, conn, (v["name"], v["email"], v["phone"], v["website"], v["status"], v["notes"],
+                                         v["date_called"], v["date_emailed"], cid))
+    return 200, _contact(cursor, cid)
+
+@route("DELETE", r"/contacts/(\d+)", write=True)
+def delete_contact(cursor, conn, req):
+    cid = db.delete_contact(cursor, conn, int(req.params[0]))
+    if cid is None:
+        raise HTTPError(404, f"no contact {req.params[0]}")
+    return 200, {"deleted": cid}
+
+@route("GET", r"/contacts/(\d+)/timeline")
+def get_timeline(cursor, conn, req):
+    cid, limit = int(req.params[0]), req.limit()
+    before = req.arg("before")
+    if before is not None:
+        # "next" of the previous page: "<ts>|<id>"
+        ts, _, iid = before.rpartition("|")
+        if not ts or not iid.isdigit():
+            raise HTTPError(400, f"bad value for before: {before!r}")
+        before = (ts, int(iid))
+    elif db.get_interaction_summary(cursor, cid) is None:
+        raise HTTPError(404, f"no contact {cid}")
+    rows = db.get_timeline(cursor, cid, before, limit)
+    return 200, {"interactions": _objects(TIMELINE_COLUMNS, rows),
+                 "next": f"{rows[-1][1]}|{rows[-1][0]}" if len(rows) == limit else None}
+
+@route("POST", r"/contacts/(\d+)/interactions", write=True)
+def log_interaction(cursor, conn, req):
+    cid, data = int(req.params[0]), req.json()
+    kind, detail = data.get("kind"), data.get("detail")
+    if not isinstance(kind, str) or not kind.strip():
+        raise HTTPError(400, "kind must be a non-empty string")
+    if detail is not None and not isinstance(detail, str):
+        raise HTTPError(400, "detail must be a string or null")
+    with db.transaction(conn):
+        if db.get_interaction_summary(cursor, cid) is None:
+            raise HTTPError(404, f"no contact {cid}")
+        iid = db.log_interaction(cursor, conn, cid, kind.strip(), detail)
+    return 201, {"id": iid}
+
+@route("POST", r"/contacts/bulk", write=True)
+def bulk_insert(cursor, conn, req):
+    contacts = req.json().get("contacts")
+    if not isinstance(contacts, list) or not all(isinstance(c, dict) for c in contacts):
+        raise HTTPError(400, "contacts must be a list of objects")
+    if len(contacts) > MAX_BULK:
+        raise HTTPError(413, f"at most {MAX_BULK:,} contacts per request")
+    stamp = now_str()
+    rows = [_new_contact(c, stamp) for c in contacts]
+    inserted = db.insert_contacts_many(cursor, conn, rows)
+    return 200, {"inserted": inserted, "skipped": len(rows) - inserted}
+
+@route("POST", r"/contacts/lookup")
+def bulk_lookup(cursor, conn, req):
+    return 200, {"contacts": _objects(EXPORT_COLUMNS, db.get_contacts_by_ids(cursor, _ids(req.json())))}
+
+@route("POST", r"/contacts/status", write=True)
+def bulk_status(cursor, conn, req):
+    data = req.json()
+    ids, status = _ids(data), data.get("status")
+    if not isinstance(status, str) or not status.strip():
+        raise HTTPError(400, "status must be a non-empty string")
+    return 200, {"updated": db.update_status_many(cursor, conn, ids, status.strip())}
+
+@route("POST", r"/contacts/delete", write=True)
+def bulk_delete(cursor, conn, req):
+    return 200, {"deleted": db.delete_contacts_many(cursor, conn, _ids(req.json()))}
+
+@route("GET", r"/dashboard")
+def get_dashboard(cursor, conn, req):
+    days = req.arg("days", int, dashboard.DAYS)
+    if not 1 <= days <= 366:
+        raise HTTPError(400, "days must be 1 to 366")
+    statuses, activity = dashboard.load(cursor, days)
+    return 200, {"statuses": [{"status": s, "contacts": n} for s, n in statuses],
+                 "activity": [dict(zip(("day", "added", "calls", "emails"), r)) for r in activity]}
+
+@route("GET", r"/templates")
+def list_templates(cursor, conn, req):
+    return 200, {"templates": _objects(TEMPLATE_COLUMNS, TemplateManager(conn, cursor).list())}
+
+@route("GET", r"/templates/(\d+)")
+def get_template(cursor, conn, req):
+    return 200, dict(zip(TEMPLATE_COLUMNS, _template(cursor, conn, int(req.params[0]))))
+
+@route("POST", r"/templates/(\d+)/render")
+def render_template(cursor, conn, req):
+    ids = _ids(req.json())
+    try:
+        render = CompiledTemplate(*_template(cursor, conn, int(req.params[0]))).bind(EXPORT_COLUMNS)
+    except TemplateError as e:
+        raise HTTPError(400, f"template error: {e}") from None
+    messages = []
+    for row in db.get_contacts_by_ids(cursor, ids):
+        subject, body = render(row)
+        messages.append({"id": row[0], "email": row[2], "subject": subject, "body": body})
+    return 200, {"messages": messages}
+
+
+def _match(method, path):
+    """(handler, params, write) for a request, or raises 404/405."""
+    allowed = []
+    for m, pattern, fn, write in ROUTES:
+        found = pattern.match(path)
+        if found:
+            if m == method:
+                return fn, found.groups(), write
+            allowed.append(m)
+    if allowed:
+        raise HTTPError(405, f"{method} not allowed here (use {', '.join(allowed)})")
+    raise HTTPError(404, f"no such resource: {path}")
+
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class APIServer:
+    """
+    The API on one database. start() binds the socket (port 0 picks a free
+    one) and returns (host, port); the caller runs the event loop.
+    """
+    def __init__(self, path=None, readers=DEFAULT_READERS):
+        self.pool = ConnectionPool(path, readers)
+        self.server = None
+        self._reads = ThreadPoolExecutor(readers, thread_name_prefix="api-read")
+        self._write = ThreadPoolExecutor(1, thread_name_prefix="api-write")
+        self._watcher = None
+        self._boot = os.urandom(4).hex()    # keeps ETags from an earlier run from matching
+        self._cache = OrderedDict()         # GET target -> body, for _cache_version
+        self._cache_version = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        # the watcher is only used on the event loop's thread
+        self._watcher = connect_db(self.pool.path, readonly=True)
+        self.server = await asyncio.start_server(self._serve_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self._reads.shutdown()
+        self._write.shutdown()
+        if self._watcher is not None:
+            self._watcher[0].close()
+        self.pool.close()
+
+    def _data_version(self):
+        cursor = self._watcher[1]
+        cursor.execute("PRAGMA data_version")
+        return cursor.fetchone()[0]
+
+    # ---- HTTP ----
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    writer.write(self._response(400, _encode({"error": "malformed request line"}), keep_alive=False))
+                    break
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    writer.write(self._response(413, _encode({"error": "request body too large"}), keep_alive=False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload, etag = await self._handle(method, target, headers, body)
+                writer.write(self._response(status, payload, etag, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass    # the client went away, or a line overran the stream limit
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _response(status, body, etag=None, keep_alive=True):
+        head = [f"HTTP/1.1 {status} {REASONS[status]}"]
+        if etag:
+            head += [f"ETag: {etag}", "Cache-Control: no-cache"]
+        if status != 304:
+            head += ["Content-Type: application/json; charset=utf-8", f"Content-Length: {len(body)}"]
+        if not keep_alive:
+            head.append("Connection: close")
+        data = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1")
+        return data + body if status != 304 else data
+
+    async def _handle(self, method, target, headers, body):
+        """-> (status, body bytes, etag or None)"""
+        url = urlsplit(target)
+        try:
+            fn, params, write = _match(method, url.path.rstrip("/") or "/")
+            request = Request(params, dict(parse_qsl(url.query)), body)
+            if method != "GET":
+                return (*await self._run(fn, write, request), None)
+
+            version = self._data_version()
+            etag = f'"{self._boot}-{version}"'
+            sent = headers.get("if-none-match")
+            if sent and (sent.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in sent.split(","))):
+                return 304, b"", etag
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+            cached = self._cache.get(target)
+            if cached is not None:
+                self._cache.move_to_end(target)
+                return 200, cached, etag
+            status, data = await self._run(fn, write, request)
+            if status == 200 and version == self._cache_version:
+                self._cache[target] = data
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            return status, data, etag if status == 200 else None
+        except HTTPError as e:
+            return e.status, _encode({"error": str(e)}), None
+
+    async def _run(self, fn, write, request):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write if write else self._reads, self._call, fn, write, request)
+
+    def _call(self, fn, write, request):
+        # on a worker thread; the JSON is encoded here too, off the event loop
+        try:
+            with (self.pool.writer() if write else self.pool.reader()) as (conn, cursor):
+                status, payload = fn(cursor, conn, request)
+            return status, _encode(payload)
+        except HTTPError as e:
+            return e.status, _encode({"error": str(e)})
+        except sqlite3.IntegrityError as e:
+            return 409, _encode({"error": f"conflicts with an existing contact: {e}"})
+        except Exception as e:
+            traceback.print_exc()
+            return 500, _encode({"error": f"{type(e).__name__}: {e}"})
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve contacts and templates as a local HTTP/JSON API.")
+    ap.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default {DEFAULT_PORT})")
+    ap.add_argument("--readers", type=int, default=DEFAULT_READERS,
+                    help=f"read-only connections, one thread each (default {DEFAULT_READERS})")
+    ap.add_argument("--db", help="database file (default: contacts.db next to the app)")
+    args = ap.parse_args(argv)
+
+    async def serve():
+        api = APIServer(args.db, args.readers)
+        try:
+            host, port = await api.start(args.host, args.port)
+            print(f"Serving {api.pool.path} on http://{host}:{port}/ (Ctrl+C to stop)", file=sys.stderr)
+            await api.server.serve_forever()
+        finally:
+            await api.close()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
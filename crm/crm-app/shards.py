@@ -0,0 +1,519 @@
+# shards.py
+"""
+Sharded contact storage: one tenant's contacts spread over several SQLite
+files, so list, count, search and export queries can use every core.
+
+    python3 shards.py split contacts.db contacts.shards --shards 4
+    python3 shards.py stats contacts.shards              # counts per shard and status, timed
+    python3 shards.py export contacts.shards -o all.csv
+    MINICRM_SHARDS=contacts.shards python3 crm.py    # run the app (or any tool) on it
+
+A sharded database is a directory:
+
+    catalog.db      templates, jobs, the shard count and the next contact id
+    shard-00.db     a complete MiniCRM database holding the contacts whose
+    shard-01.db     id % shards is 0, 1, ... with their search index,
+    ...             interactions and follow-ups
+
+Ids come from one counter in the catalog and are handed out in order, so
+contacts land on the shards round-robin and every shard keeps the id
+ordering the keyset pages rely on. ShardedDB mirrors the db.py functions
+(same names and arguments, without cursor and conn): a single contact is
+read or written on its own shard; list pages, searches, counts and exports
+run on every shard at once, in a process pool, and the sorted per-shard
+results are combined with a k-way merge (heapq.merge), reading no more than
+a page from each.
+
+With MINICRM_SHARDS set, connect_db() opens the directory instead of
+contacts.db: it returns the catalog connection, and the db.py contact
+functions called on it run as the ShardedDB method of the same name, so the
+GUI, the API server, the exporter and the dashboard use the shards without
+changes. Code that queries the contacts table with its own SQL (dedupe.py,
+the recipient list of a new campaign, backup.py) still sees only the
+catalog, which holds no contacts.
+
+Writes take the catalog's write lock, so new ids and the one-contact-per-email
+rule hold across shards and processes. Each shard commits on its own: a bulk
+write that spans shards and fails part way may have been applied to some of
+them.
+"""
+
+import argparse, heapq, os, sqlite3, sys, time
+from functools import lru_cache
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby, islice
+from operator import itemgetter
+
+import db, diagnostics
+from db import connect_db, transaction, EXPORT_COLUMNS, PAGE_SIZE, SEARCH_LIMIT
+from templates import TemplateManager
+
+CATALOG = "catalog.db"
+STREAM_PAGE = 5000      # rows per shard per round trip when streaming
+_ID = itemgetter(0)
+
+
+def shard_name(index):
+    return f"shard-{index:02d}.db"
+
+
+# ---- pool workers: read-only connections to every shard, opened once per process ----
+_worker_cursors = None
+
+def _init_worker(paths):
+    global _worker_cursors
+    _worker_cursors = [connect_db(path, readonly=True)[1] for path in paths]
+
+def _run(index, name, args):
+    return getattr(db, name)(_worker_cursors[index], *args)
+
+def _run_ids(index, name, args):
+    return [r[0] for r in getattr(db, name)(_worker_cursors[index], *args)]
+
+def _stream_page(index, after_id, limit, filters, columns):
+    return list(islice(db.stream_contacts(_worker_cursors[index], *filters, chunk_size=limit, columns=columns,
+                                          after_id=after_id), limit))
+
+
+def _merge_desc(results, limit):
+    """The first `limit` rows of per-shard lists that are each newest first."""
+    return list(islice(heapq.merge(*results, key=_ID, reverse=True), limit))
+
+
+@lru_cache(maxsize=None)
+def _catalog_class(base):
+    class Catalog(base):
+        """The catalog connection; db.py functions called on it go to `shards`."""
+        shards = None
+
+        def close(self):
+            store, self.shards = self.shards, None
+            if store is not None:
+                store._close_shards()
+            super().close()
+    return Catalog
+
+
+class ShardedDB:
+    """
+    Open a directory made by create() or split(). processes: pool size for
+    the fan-out queries (default: one per CPU, up to the shard count; 0 runs
+    them one shard after another in this process). Use it from one thread at
+    a time; readonly and check_same_thread are as for connect_db(). Closing
+    the catalog connection closes the store.
+    """
+    def __init__(self, path, processes=None, readonly=False, check_same_thread=True):
+        self.path = path
+        self.readonly = readonly
+        self.check_same_thread = check_same_thread
+        self.catalog, self._catalog_cursor = connect_db(os.path.join(path, CATALOG), readonly, check_same_thread,
+                                                        factory=_catalog_class(diagnostics.connection_factory()))
+        self.catalog.shards = self
+        self.n = self._info("shards")
+        self.paths = [os.path.join(path, shard_name(i)) for i in range(self.n)]
+        self._writers = [None] * self.n
+        self._readers = [None] * self.n
+        if processes is None:
+            processes = min(self.n, os.cpu_count() or 1)
+        self._pool = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self.paths,)) \
+            if processes > 0 else None
+
+    @classmethod
+    def create(cls, path, shards, next_id=1, processes=None):
+        """A new, empty sharded database in directory `path`."""
+        os.makedirs(path)
+        conn, cursor = connect_db(os.path.join(path, CATALOG))
+        try:
+            with transaction(conn):
+                cursor.execute("CREATE TABLE shard_info (key TEXT PRIMARY KEY, value)")
+                cursor.executemany("INSERT INTO shard_info VALUES (?, ?)",
+                                   [("shards", shards), ("next_id", next_id)])
+        finally:
+            conn.close()
+        for i in range(shards):
+            connect_db(os.path.join(path, shard_name(i)))[0].close()
+        return cls(path, processes)
+
+    def close(self):
+        self.catalog.close()
+
+    def _close_shards(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+        for conns in (self._writers, self._readers):
+            for c in conns:
+                if c is not None:
+                    c[0].close()
+
+    def _info(self, key):
+        self._catalog_cursor.execute("SELECT value FROM shard_info WHERE key=?", (key,))
+        return self._catalog_cursor.fetchone()[0]
+
+    # ---- connections ----
+    def shard_of(self, cid):
+        return int(cid) % self.n
+
+    def _reader(self, index):
+        if self._readers[index] is None:
+            self._readers[index] = connect_db(self.paths[index], readonly=True,
+                                              check_same_thread=self.check_same_thread)
+        return self._readers[index][1]
+
+    def _writer(self, index):
+        if self.readonly:
+            raise sqlite3.OperationalError("attempt to write a readonly database")
+        if self._writers[index] is None:
+            self._writers[index] = connect_db(self.paths[index], check_same_thread=self.check_same_thread)
+        return self._writers[index]
+
+    @contextmanager
+    def _locked(self):
+        """The catalog's write lock, held to the end of the block: one sharded writer at a time."""
+        if not self.catalog.in_transaction:
+            self.catalog.execute("BEGIN IMMEDIATE")
+        with transaction(self.catalog):
+            yield self._catalog_cursor
+
+    def _allocate(self, cursor, count):
+        """First of `count` new ids (call inside _locked())."""
+        cursor.execute("UPDATE shard_info SET value = value + ? WHERE key = 'next_id' RETURNING value - ?",
+                       (count, count))
+        return cursor.fetchone()[0]
+
+    def _by_shard(self, ids):
+        groups = defaultdict(list)
+        for cid in ids:
+            groups[self.shard_of(cid)].append(int(cid))
+        return groups
+
+    def _fan_out(self, name, *args):
+        """db.<name>(cursor, *args) on every shard at once; results in shard order."""
+        if self._pool is None:
+            return [getattr(db, name)(self._reader(i), *args) for i in range(self.n)]
+        futures = [self._pool.submit(_run, i, name, args) for i in range(self.n)]
+        return [f.result() for f in futures]
+
+    def _id_at(self, name, offset, *args):
+        """
+        Id of the row at `offset` in the merged, newest-first db.<name>(cursor,
+        *args, before_id, limit) lists. Every shard reads offset + 1 rows (only
+        their ids are sent back), so this costs more the further down it lands.
+        """
+        args = (*args, None, offset + 1)
+        if self._pool is None:
+            results = [[r[0] for r in getattr(db, name)(self._reader(i), *args)] for i in range(self.n)]
+        else:
+            futures = [self._pool.submit(_run_ids, i, name, args) for i in range(self.n)]
+            results = [f.result() for f in futures]
+        return next(islice(heapq.merge(*results, reverse=True), offset, None), None)
+
+    # ---- reads across shards ----
+    def count_contacts(self):
+        return sum(self._fan_out("count_contacts"))
+
+    def count_by_status(self):
+        # each shard's list is ordered by status (NULL first, as in SQLite); merge, then add up
+        merged = heapq.merge(*self._fan_out("count_by_status"), key=lambda r: (r[0] is not None, r[0] or ""))
+        return [(status, sum(n for _, n in rows)) for status, rows in groupby(merged, key=_ID)]
+
+    def get_daily_activity(self, since=None, until=None):
+        merged = heapq.merge(*self._fan_out("get_daily_activity", since, until), key=_ID)
+        return [(day, *map(sum, zip(*(r[1:] for r in rows)))) for day, rows in groupby(merged, key=_ID)]
+
+    def check_summaries(self):
+        return [f"{shard_name(i)}: {line}" for i, lines in enumerate(self._fan_out("check_summaries"))
+                for line in lines]
+
+    def rebuild_summaries(self):
+        with self._locked():
+            for i in range(self.n):
+                conn, cursor = self._writer(i)
+                db.rebuild_summaries(cursor, conn)
+
+    def get_contacts_page(self, before_id=None, limit=PAGE_SIZE):
+        return _merge_desc(self._fan_out("get_contacts_page", before_id, limit), limit)
+
+    def get_contacts_page_above(self, after_id, limit=PAGE_SIZE):
+        # each shard has its `limit` ids just above after_id; the smallest `limit` of all of them, newest first
+        results = [rows[::-1] for rows in self._fan_out("get_contacts_page_above", after_id, limit)]
+        return list(islice(heapq.merge(*results, key=_ID), limit))[::-1]
+
+    def list_contacts_page(self, before_id=None, limit=PAGE_SIZE, status=None, date_from=None, date_to=None):
+        return _merge_desc(self._fan_out("list_contacts_page", before_id, limit, status, date_from, date_to), limit)
+
+    def get_contact_id_at(self, offset):
+        return self._id_at("get_contacts_page", offset)
+
+    def count_search(self, text, limit=SEARCH_LIMIT):
+        return min(limit, sum(self._fan_out("count_search", text, limit)))
+
+    def search_contacts_page(self, text, before_id=None, limit=PAGE_SIZE):
+        return _merge_desc(self._fan_out("search_contacts_page", text, before_id, limit), limit)
+
+    def search_contacts_page_above(self, text, after_id, limit=PAGE_SIZE):
+        results = [rows[::-1] for rows in self._fan_out("search_contacts_page_above", text, after_id, limit)]
+        return list(islice(heapq.merge(*results, key=_ID), limit))[::-1]
+
+    def search_contact_id_at(self, text, offset):
+        return self._id_at("search_contacts_page", offset, text)
+
+    def get_follow_ups(self, after=None, until=None, limit=PAGE_SIZE):
+        results = self._fan_out("get_follow_ups", after, until, limit)
+        return list(islice(heapq.merge(*results, key=itemgetter(0, 1)), limit))
+
+    def stream_contacts(self, status=None, date_from=None, date_to=None, chunk_size=STREAM_PAGE,
+                        columns=EXPORT_COLUMNS, after_id=None):
+        """Like db.stream_contacts(): rows in id order (columns must start with id), merged from every shard."""
+        if columns[0] != "id":
+            raise ValueError("columns must start with id")
+        filters = (status, date_from, date_to)
+        return heapq.merge(*(self._shard_stream(i, filters, chunk_size, columns, after_id) for i in range(self.n)),
+                           key=_ID)
+
+    def _shard_stream(self, index, filters, limit, columns, after_id):
+        # one page in flight per shard while the previous one is being merged
+        if self._pool is None:
+            yield from db.stream_contacts(self._reader(index), *filters, chunk_size=limit, columns=columns,
+                                          after_id=after_id)
+            return
+        future = self._pool.submit(_stream_page, index, after_id, limit, filters, columns)
+        while True:
+            rows = future.result()
+            if len(rows) == limit:
+                future = self._pool.submit(_stream_page, index, rows[-1][0], limit, filters, columns)
+            yield from rows
+            if len(rows) < limit:
+                return
+
+    def find_contact_by_email(self, email):
+        for i in range(self.n):
+            cid = db.find_contact_by_email(self._reader(i), email)
+            if cid is not None:
+                return cid
+        return None
+
+    def existing_emails(self, emails):
+        emails = list(emails)
+        return set().union(*(db.existing_emails(self._reader(i), emails) for i in range(self.n)))
+
+    # ---- reads on one shard ----
+    def get_contact_by_id(self, cid):
+        return db.get_contact_by_id(self._reader(self.shard_of(cid)), cid)
+
+    def get_contact_row(self, cid):
+        return db.get_contact_row(self._reader(self.shard_of(cid)), cid)
+
+    def get_contacts_by_ids(self, ids):
+        rows = [db.get_contacts_by_ids(self._reader(i), group) for i, group in self._by_shard(ids).items()]
+        return list(heapq.merge(*rows, key=_ID))
+
+    def get_timeline(self, cid, before=None, limit=PAGE_SIZE):
+        return db.get_timeline(self._reader(self.shard_of(cid)), cid, before, limit)
+
+    def get_interaction_summary(self, cid):
+        return db.get_interaction_summary(self._reader(self.shard_of(cid)), cid)
+
+    def templates(self):
+        """TemplateManager on the catalog, where templates are kept."""
+        return TemplateManager(self.catalog, self._catalog_cursor)
+
+    # ---- writes ----
+    def _email_taken(self, email, cid=None):
+        """True if another contact on any shard has this email."""
+        if not email:
+            return False
+        for i in range(self.n):
+            found = db.find_contact_by_email(self._writer(i)[1], email)
+            if found is not None and found != cid:
+                return True
+        return False
+
+    def insert_contact(self, data):
+        with self._locked() as cursor:
+            if self._email_taken(data[1]):
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: index 'idx_contacts_email'")
+            cid = self._allocate(cursor, 1)
+            conn, shard_cursor = self._writer(self.shard_of(cid))
+            return db.insert_contact(shard_cursor, conn, data, cid)
+
+    def insert_contacts_many(self, rows):
+        """Insert contact tuples; rows whose email is already used (here or on any shard) are skipped."""
+        with self._locked() as cursor:
+            emails = [r[1] for r in rows if r[1]]
+            seen = set()
+            for i in range(self.n):
+                seen |= db.existing_emails(self._writer(i)[1], emails)
+            keep = []
+            for row in rows:
+                email = (row[1] or "").lower()
+                if email:
+                    if email in seen:
+                        continue
+                    seen.add(email)
+                keep.append(row)
+            first = self._allocate(cursor, len(keep))
+            groups = defaultdict(lambda: ([], []))
+            for cid, row in enumerate(keep, first):
+                ids, shard_rows = groups[self.shard_of(cid)]
+                ids.append(cid)
+                shard_rows.append(row)
+            inserted = 0
+            for i, (ids, shard_rows) in groups.items():
+                conn, shard_cursor = self._writer(i)
+                inserted += db.insert_contacts_many(shard_cursor, conn, shard_rows, ids)
+            return inserted
+
+    def update_contact(self, data):
+        with self._locked():
+            if self._email_taken(data[1], int(data[-1])):
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: index 'idx_contacts_email'")
+            conn, cursor = self._writer(self.shard_of(data[-1]))
+            return db.update_contact(cursor, conn, data)
+
+    def _each_shard(self, name, ids, *args):
+        results = []
+        with self._locked():
+            for i, group in self._by_shard(ids).items():
+                conn, cursor = self._writer(i)
+                results.append(getattr(db, name)(cursor, conn, group, *args))
+        return results
+
+    def update_status_many(self, ids, status, date=None):
+        return sum(self._each_shard("update_status_many", ids, status, date))
+
+    def mark_emailed(self, ids, date=None, detail=None):
+        return sum(self._each_shard("mark_emailed", ids, date, detail))
+
+    def set_follow_up(self, ids, when):
+        return sum(self._each_shard("set_follow_up", ids, when))
+
+    def delete_contacts_many(self, ids):
+        return sorted(cid for deleted in self._each_shard("delete_contacts_many", ids) for cid in deleted)
+
+    def delete_contact(self, cid):
+        with self._locked():
+            conn, cursor = self._writer(self.shard_of(cid))
+            return db.delete_contact(cursor, conn, cid)
+
+    def log_interaction(self, cid, kind, detail=None, ts=None):
+        conn, cursor = self._writer(self.shard_of(cid))
+        return db.log_interaction(cursor, conn, cid, kind, detail, ts)
+
+
+def split(source, path, shards, processes=None):
+    """
+    Copy a contacts.db into a new sharded database at `path`: contacts with
+    their ids, interactions and follow-ups go to their shards, templates to
+    the catalog. Returns the ShardedDB.
+    """
+    src_conn, src = connect_db(source)     # brings the source schema up to date
+    try:
+        src.execute("SELECT COALESCE(MAX(id), 0) FROM contacts")
+        last_id = src.fetchone()[0]
+        src.execute("SELECT seq FROM sqlite_sequence WHERE name='contacts'")
+        row = src.fetchone()
+        next_id = max(last_id, row[0] if row else 0) + 1
+        src.execute("SELECT id, name, subject, body FROM templates ORDER BY id")
+        templates = src.fetchall()
+    finally:
+        src_conn.close()
+    store = ShardedDB.create(path, shards, next_id, processes)
+    with transaction(store.catalog):
+        # the source's templates replace the catalog's starter ones
+        store.catalog.execute("DELETE FROM templates")
+        store.catalog.executemany("INSERT INTO templates (id, name, subject, body) VALUES (?, ?, ?, ?)", templates)
+    for i in range(shards):
+        _copy_shard(source, store.paths[i], i, shards)
+    return store
+
+
+def _copy_shard(source, path, index, shards):
+    conn, cursor = connect_db(path)
+    try:
+        cursor.execute("PRAGMA table_info(contacts)")
+        columns = ", ".join(r[1] for r in cursor.fetchall())
+        cursor.execute("ATTACH DATABASE ? AS src", (source,))
+        with transaction(conn):
+            # copy with the per-row triggers off, then index and summarise in bulk;
+            # touch_count and the last dates come along with the contacts
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' "
+                           "AND name IN ('contacts_fts_ai', 'contacts_summary_ai', 'interactions_summary')")
+            triggers = cursor.fetchall()
+            for name, _ in triggers:
+                cursor.execute(f"DROP TRIGGER {name}")
+            cursor.execute(f"INSERT INTO contacts ({columns}) SELECT {columns} FROM src.contacts "
+                           f"WHERE id % ? = ? ORDER BY id", (shards, index))
+            cursor.execute("""
+                INSERT INTO interactions (contact_id, ts, kind, detail)
+                SELECT contact_id, ts, kind, detail FROM src.interactions WHERE contact_id % ? = ? ORDER BY id
+            """, (shards, index))
+            if db.has_search_index(cursor):
+                cursor.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+            db.rebuild_summaries(cursor, conn)
+            for name, sql in triggers:
+                cursor.execute(sql)
+        cursor.execute("DETACH DATABASE src")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Split contacts over several database files and query them.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("split", help="copy a contacts.db into a new sharded directory")
+    p.add_argument("source")
+    p.add_argument("path")
+    p.add_argument("--shards", type=int, default=os.cpu_count() or 2, help="number of files (default: one per CPU)")
+    p = sub.add_parser("stats", help="contacts per shard and per status")
+    p.add_argument("path")
+    p = sub.add_parser("export", help="every contact as CSV or JSON Lines, in id order")
+    p.add_argument("path")
+    p.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    p.add_argument("--status", help='only contacts with this status, e.g. "Not Contacted"')
+    for p in sub.choices.values():
+        p.add_argument("--processes", type=int, help="worker processes (default: one per CPU, up to the shards)")
+    args = ap.parse_args(argv)
+
+    if args.command == "split":
+        if os.path.exists(args.path):
+            ap.error(f"{args.path} already exists")
+        t = time.perf_counter()
+        store = split(args.source, args.path, args.shards, 0)
+        try:
+            print(f"{store.count_contacts():,} contacts in {store.n} shards, {time.perf_counter() - t:.1f} s",
+                  file=sys.stderr)
+        finally:
+            store.close()
+        return 0
+
+    store = ShardedDB(args.path, args.processes)
+    try:
+        if args.command == "stats":
+            for i in range(store.n):
+                print(f"{shard_name(i)}  {db.count_contacts(store._reader(i)):>12,}")
+            t = time.perf_counter()
+            counts = store.count_by_status()
+            elapsed = (time.perf_counter() - t) * 1000
+            for status, n in counts:
+                print(f"{status or '(none)':<24}{n:>12,}")
+            print(f"count by status: {elapsed:.1f} ms", file=sys.stderr)
+        else:
+            import exporter
+            fmt = exporter.format_for(args.output)
+            rows = store.stream_contacts(args.status)
+            if args.output == "-":
+                n = exporter.write_rows(rows, sys.stdout, fmt)
+            else:
+                with open(args.output, "w", newline="", encoding="utf-8") as out:
+                    n = exporter.write_rows(rows, out, fmt)
+            print(f"{n:,} contacts exported", file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# smtp_outbox.py
+"""
+Local stand-in SMTP server for trying email campaigns without sending mail.
+
+    python3 smtp_outbox.py                       # 127.0.0.1:1025, saves outbox/*.eml
+    python3 smtp_outbox.py --discard             # only count messages
+    python3 smtp_outbox.py --fail-rate 0.1       # answer 451 to 10% of messages (exercises retries)
+
+It speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT): no TLS, no AUTH. From Python it can also run on a background
+thread, which is how the campaign code is tried out end to end:
+
+    outbox = Outbox()
+    port = outbox.run_in_background()
+    ...
+    outbox.stop(); outbox.messages   # [(sender, recipients, raw bytes), ...]
+"""
+
+import argparse, asyncio, itertools, os, random, sys, threading, time
+
+
+class Outbox:
+    def __init__(self, directory=None, fail_rate=0.0, keep=True):
+        """
+        directory: save each message there as an .eml file (otherwise kept in
+        self.messages when keep=True). fail_rate: share of messages answered
+        with a temporary 451 failure.
+        """
+        self.directory = directory
+        self.fail_rate = fail_rate
+        self.keep = keep
+        self.messages = []
+        self.received = self.rejected = 0
+        self._seq = itertools.count(1)
+        self._loop = self._server = None
+        self._writers = set()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def deliver(self, sender, recipients, data):
+        self.received += 1
+        if self.directory:
+            path = os.path.join(self.directory, f"{int(time.time())}-{next(self._seq):06d}.eml")
+            with open(path, "wb") as f:
+                f.write(data)
+        elif self.keep:
+            self.messages.append((sender, recipients, data))
+
+    async def handle(self, reader, writer):
+        def reply(line):
+            writer.write(line.encode() + b"\r\n")
+
+        self._writers.add(writer)
+        reply("220 MiniCRM outbox ready")
+        sender, recipients = None, []
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode("utf-8", "replace").strip()
+                verb = cmd[:4].upper()
+                if verb == "EHLO":
+                    reply("250-MiniCRM outbox"); reply("250-8BITMIME"); reply("250 SMTPUTF8")
+                elif verb == "HELO":
+                    reply("250 MiniCRM outbox")
+                elif verb == "MAIL":
+                    sender, recipients = _address(cmd), []
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    if sender is None:
+                        reply("503 MAIL first")
+                        continue
+                    recipients.append(_address(cmd))
+                    reply("250 OK")
+                elif verb == "DATA":
+                    if not recipients:
+                        reply("503 RCPT first")
+                        continue
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        line = await reader.readline()
+                        if not line or line in (b".\r\n", b".\n"):
+                            break
+                        lines.append(line[1:] if line.startswith(b"..") else line)
+                    if random.random() < self.fail_rate:
+                        self.rejected += 1
+                        reply("451 Try again later")
+                    else:
+                        self.deliver(sender, recipients, b"".join(lines))
+                        reply("250 OK queued")
+                    sender, recipients = None, []
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    reply("250 OK")
+                elif verb == "NOOP":
+                    reply("250 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=1025):
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    def run_in_background(self, host="127.0.0.1", port=0):
+        """Serve on a daemon thread; returns the port (port=0 picks a free one)."""
+        started = threading.Event()
+        result = {}
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            result["port"] = self._loop.run_until_complete(self.start(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, name="smtp-outbox", daemon=True).start()
+        started.wait()
+        return result["port"]
+
+    def stop(self):
+        """Stop a run_in_background() server, dropping open client connections."""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _address(cmd):
+    # "MAIL FROM:<a@b> SIZE=12" -> "a@b"
+    value = cmd.split(":", 1)[1] if ":" in cmd else ""
+    value = value.strip().split(" ", 1)[0]
+    return value.strip("<>")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local stand-in SMTP server.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1025)
+    ap.add_argument("--dir", default="outbox", help="where to save messages (default: ./outbox)")
+    ap.add_argument("--discard", action="store_true", help="don't save messages, only count them")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of messages to answer with 451")
+    args = ap.parse_args(argv)
+
+    outbox = Outbox(None if args.discard else args.dir, args.fail_rate, keep=False)
+
+    async def serve():
+        port = await outbox.start(args.host, args.port)
+        print(f"Listening on {args.host}:{port}" + ("" if args.discard else f", saving to {args.dir}/"),
+              file=sys.stderr)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    print(f"\n{outbox.received:,} messages received, {outbox.rejected:,} rejected", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# template_engine.py
+"""
+Mail-merge template engine on top of TemplateManager.
+
+Placeholders are {{field}} or {{field|default}} for any contact column
+(name, email, phone, website, status, notes, date_added, date_called,
+date_emailed) plus first_name. Empty fields render as the default, or "":
+
+    Hi {{first_name|there}},
+
+Each template is parsed once into a str.format pattern and a list of column
+lookups, and cached until TemplateEngine.invalidate() (wired to the Templates
+tab's on_templates_changed hook). Rendering is then one format() call per
+contact, with no parsing and no database access:
+
+    render = engine.get(tid).bind(EXPORT_COLUMNS)
+    for row in stream_contacts(cursor):
+        subject, body = render(row)
+"""
+
+import re
+
+# get_contact_by_id() row order
+CONTACT_FIELDS = ("name", "email", "phone", "website", "status", "notes",
+                  "date_added", "date_called", "date_emailed")
+FIELDS = CONTACT_FIELDS + ("first_name",)
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*(?:\|([^}]*))?\}\}")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledText:
+    """One parsed string: `pattern` for str.format, `fields` as (field, default) per slot."""
+    __slots__ = ("pattern", "fields")
+
+    def __init__(self, text):
+        text = text or ""
+        parts, fields, pos = [], [], 0
+        for m in PLACEHOLDER.finditer(text):
+            field = m.group(1).lower()
+            if field not in FIELDS:
+                raise TemplateError(f"Unknown placeholder {m.group(0)} (fields: {', '.join(FIELDS)})")
+            parts.append(_escape(text[pos:m.start()]))
+            parts.append("{%d}" % len(fields))
+            fields.append((field, (m.group(2) or "").strip()))
+            pos = m.end()
+        parts.append(_escape(text[pos:]))
+        self.pattern = "".join(parts)
+        self.fields = tuple(fields)
+
+    def bind(self, columns):
+        """row -> rendered text, for rows whose values are in `columns` order."""
+        where = {c: i for i, c in enumerate(columns)}
+        specs = []
+        for field, default in self.fields:
+            column = "name" if field == "first_name" else field
+            if column not in where:
+                raise TemplateError(f"Rows have no {column} column for {{{{{field}}}}}")
+            specs.append((where[column], default, field == "first_name"))
+        fmt = self.pattern.format
+        if not specs:
+            text = fmt()
+            return lambda row: text
+
+        def render(row):
+            values = []
+            for i, default, first in specs:
+                v = row[i]
+                if first and v:
+                    v = v.split(None, 1)[0] if v.strip() else None
+                values.append(v if v else default)
+            return fmt(*values)
+        return render
+
+
+def _escape(literal):
+    return literal.replace("{", "{{").replace("}", "}}")
+
+
+class CompiledTemplate:
+    def __init__(self, tid, name, subject, body):
+        self.id = tid
+        self.name = name
+        self.subject = CompiledText(subject)
+        self.body = CompiledText(body)
+        self._contact_render = None
+
+    def bind(self, columns):
+        """Returns render(row) -> (subject, body) for rows in `columns` order."""
+        subject, body = self.subject.bind(columns), self.body.bind(columns)
+        return lambda row: (subject(row), body(row))
+
+    def render_contact(self, rec):
+        """(subject, body) for a get_contact_by_id() row."""
+        if self._contact_render is None:
+            self._contact_render = self.bind(CONTACT_FIELDS)
+        return self._contact_render(rec)
+
+
+class TemplateEngine:
+    """
+    Compiled-template cache keyed by (template id, version). invalidate() bumps
+    the version, so anything loaded before a template edit is never reused.
+    Cache misses read through the TemplateManager, so call list()/get() on the
+    thread that owns its connection; compile() never touches the database.
+    """
+    def __init__(self, template_manager):
+        self.tm = template_manager
+        self.version = 0
+        self._compiled = {}         # (tid, version) -> CompiledTemplate
+        self._templates = None      # (version, rows)
+
+    def invalidate(self):
+        self.version += 1
+        self._compiled = {}
+        self._templates = None
+
+    def list(self):
+        """Template rows (id, name, subject, body), cached until invalidate()."""
+        cached = self._templates
+        if cached and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        rows = self.tm.list()
+        if version == self.version:
+            self._templates = (version, rows)
+        return rows
+
+    def get(self, tid):
+        """CompiledTemplate for a template id, or None if it doesn't exist."""
+        compiled = self._compiled.get((int(tid), self.version))
+        if compiled is None:
+            row = self.tm.get(tid)
+            if row is None:
+                return None
+            compiled = self.compile(row)
+        return compiled
+
+    def compile(self, row):
+        """CompiledTemplate for an (id, name, subject, body) row, cached by id."""
+        key = (row[0], self.version)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = CompiledTemplate(*row)
+            if row[0] is not None:
+                self._compiled[key] = compiled
+        return compiled
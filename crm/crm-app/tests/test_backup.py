@@ -0,0 +1,76 @@
+# tests/test_backup.py
+"""
+Two snapshots of a database with a change in between: restoring the first
+brings its rows back, and pruning it removes only the chunks the second
+one doesn't use.
+"""
+
+import os, shutil, sqlite3, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import backup  # noqa: E402
+
+N = 3000
+
+
+class SnapshotRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "contacts.db")
+        self.store = os.path.join(self.dir, "backups")
+        self.conn, self.cursor = db.connect_db(self.path)
+        db.insert_contacts_many(self.cursor, self.conn, [
+            (f"Contact {i}", f"c{i}@example.com", f"555-{i:04d}", "", "Not Contacted", f"notes for contact {i} " * 4,
+             "2024-01-01 09:00:00", None, None)
+            for i in range(N)])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.dir)
+
+    def rows(self):
+        self.cursor.execute("SELECT id, name, email, status FROM contacts ORDER BY id")
+        return self.cursor.fetchall()
+
+    def objects(self):
+        return {p.parent.name + p.name for p in Path(self.store, "objects").glob("*/*")}
+
+    def test_restore_and_prune(self):
+        original = self.rows()
+        first = backup.take_snapshot(self.conn, self.store, pause=0)
+        db.update_status_many(self.cursor, self.conn, range(1, 51), "Called")
+        db.delete_contact(self.cursor, self.conn, 7)
+        second = backup.take_snapshot(self.conn, self.store, pause=0)
+        changed = self.rows()
+
+        self.assertEqual(sorted(os.listdir(self.store)), ["objects", "snapshots"])    # no staging file left
+        self.assertGreater(len(first["chunks"]), 4)
+        self.assertEqual(second["new_chunks"], len(set(second["chunks"]) - set(first["chunks"])))
+        self.assertGreater(second["new_chunks"], 0)
+        self.assertLess(second["new_chunks"], len(second["chunks"]))
+        self.assertEqual(self.objects(), set(first["chunks"]) | set(second["chunks"]))
+        self.assertEqual([m["name"] for m in backup.list_snapshots(self.store)], [first["name"], second["name"]])
+
+        self.assertEqual(backup.restore(self.store, self.path, name=first["name"])["name"], first["name"])
+        self.assertEqual(self.rows(), original)
+        self.assertEqual(db.check_summaries(self.cursor), [])
+        check = sqlite3.connect(self.path)
+        try:
+            self.assertEqual(check.execute("PRAGMA quick_check").fetchone()[0], "ok")
+        finally:
+            check.close()
+
+        removed, chunks, freed = backup.prune(self.store, keep=1)
+        self.assertEqual((removed, chunks), (1, len(set(first["chunks"]) - set(second["chunks"]))))
+        self.assertGreater(freed, 0)
+        self.assertEqual(self.objects(), set(second["chunks"]))
+        self.assertEqual(backup.list_snapshots(self.store), [second])
+
+        backup.restore(self.store, self.path)
+        self.assertEqual(self.rows(), changed)
+
+
+if __name__ == "__main__":
+    unittest.main()
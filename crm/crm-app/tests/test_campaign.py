@@ -0,0 +1,63 @@
+# tests/test_campaign.py
+"""
+A campaign sent to the local stand-in server (smtp_outbox.py) that turns
+away part of the messages with 451.
+"""
+
+import os, random, shutil, sys, tempfile, unittest
+from email import message_from_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import campaign, jobqueue  # noqa: E402
+from smtp_outbox import Outbox  # noqa: E402
+
+TEMPLATE = (1, "Follow-up", "Hello {{name}}", "Hi {{name}},\n\nFollowing up.\n")
+
+
+class CampaignAgainstOutbox(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+        self.dir = tempfile.mkdtemp()
+        self.conn, self.cursor = db.connect_db(os.path.join(self.dir, "contacts.db"))
+        db.insert_contacts_many(self.cursor, self.conn, [
+            (f"Contact {i}", f"c{i}@example.com", "", "", "Called" if i % 4 == 0 else "Not Contacted", "",
+             "2024-01-01 09:00:00", "2024-01-02" if i % 4 == 0 else None, None)
+            for i in range(62)])
+        self.outbox = Outbox(fail_rate=0.3)
+        self.settings = campaign.SMTPSettings("127.0.0.1", self.outbox.run_in_background(), "me@example.com")
+
+    def tearDown(self):
+        self.outbox.stop()
+        self.conn.close()
+        shutil.rmtree(self.dir)
+
+    def test_every_recipient_gets_one_message(self):
+        job_id = campaign.start_campaign_job(self.conn, TEMPLATE, self.settings, batch_size=5)
+        db.delete_contact(self.cursor, self.conn, 62)     # gone before its batch: skipped
+        job = jobqueue.run_job(self.conn, job_id, backoff=0, max_retries=20)
+
+        self.assertGreater(self.outbox.rejected, 0)
+        recipients = sorted(r for _, rcpt, _ in self.outbox.messages for r in rcpt)
+        self.assertEqual(recipients, sorted(f"c{i}@example.com" for i in range(61)))
+        msg = message_from_bytes(self.outbox.messages[0][2])
+        self.assertEqual(msg["Subject"], "Hello " + msg["To"].split(" <")[0])
+
+        self.assertEqual(job.state, "done")
+        self.assertEqual((job.done, job.failed), (62, 0))
+        self.assertEqual(job.stats, {"sent": 61, "failed": 0, "skipped": 1})
+        self.cursor.execute("SELECT state, COUNT(*) FROM job_items GROUP BY state")
+        self.assertEqual(self.cursor.fetchall(), [("done", 62)])
+
+        self.cursor.execute("SELECT id, status, date_emailed FROM contacts ORDER BY id")
+        for cid, status, emailed in self.cursor.fetchall():
+            self.assertEqual(status, "Called and Emailed" if (cid - 1) % 4 == 0 else "Emailed")
+            self.assertEqual(emailed, db.days_ago(0))
+        self.cursor.execute("SELECT COUNT(*), COUNT(DISTINCT contact_id) FROM interactions "
+                            "WHERE kind='email' AND detail='Campaign: Follow-up'")
+        self.assertEqual(self.cursor.fetchone(), (61, 61))
+        self.assertEqual(db.check_summaries(self.cursor), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_dedupe.py
+"""
+Finding and merging duplicates in a small database, through the process pool.
+"""
+
+import os, shutil, sqlite3, sys, tempfile, unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import dedupe  # noqa: E402
+
+# (name, email, phone, website, status)
+CONTACTS = [
+    ("Ada Lovelace", "ada@example.com", "", "", "Called"),                      # 1
+    ("ada lovelace", "ADA@Example.com", "", "", "Emailed"),                     # 2  email, other case
+    ("Alan Turing", "", "+1 (555) 010-9999", "", "Not Contacted"),              # 3
+    ("Turing, Alan", "", "555.010.9999", "", "Not Contacted"),                  # 4  phone, other format
+    ("Grace Hopper", "grace@navy.mil", "", "https://www.hopper.dev/", "Called"),  # 5
+    ("Grace M Hopper", "", "", "hopper.dev", "Not Contacted"),                  # 6  website, similar name
+    ("Edsger Dijkstra", "", "", "", "Not Contacted"),                           # 7
+    ("Edsger Dijkstr", "", "", "", "Not Contacted"),                            # 8  name only, a typo
+    ("Barbara Liskov", "barbara@mit.edu", "555-111-2222", "", "Not Contacted"),  # 9
+    ("Barbara Liskov", "b.liskov@other.org", "555-333-4444", "", "Not Contacted"),  # 10 same name, not her
+    ("Donald Knuth", "", "555-777-8888", "", "Not Contacted"),                  # 11
+    ("Ken Thompson", "", "555-777-8888", "", "Not Contacted"),                  # 12 switchboard, other name
+    ("Margaret Hamilton", "margaret@mit.edu", "", "", "Not Contacted"),         # 13
+]
+
+
+class Dedupe(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "contacts.db")
+        # an old file: ADA@ and ada@ predate the unique email index
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT, website TEXT,
+                status TEXT, notes TEXT, date_added TEXT, date_called TEXT, date_emailed TEXT
+            )
+        """)
+        conn.executemany("""
+            INSERT INTO contacts (name, email, phone, website, status, notes, date_added)
+            VALUES (?, ?, ?, ?, ?, '', ?)
+        """, [(*c, f"2024-01-{i + 1:02d} 09:00:00") for i, c in enumerate(CONTACTS)])
+        conn.commit()
+        conn.close()
+        with self.assertLogs("minicrm.db", "WARNING"):
+            self.conn, self.cursor = db.connect_db(self.path)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.dir)
+
+    def find(self):
+        # small chunks, so the keys and the blocks are spread over several pool tasks
+        with mock.patch.object(dedupe, "KEY_CHUNK", 4), mock.patch.object(dedupe, "COMPARE_CHUNK", 2):
+            return dedupe.find_duplicates(self.path, workers=2)
+
+    def test_finds_the_intended_pairs(self):
+        groups, stats = self.find()
+        self.assertEqual([(g["ids"], g["reasons"]) for g in groups], [
+            ([1, 2], ["email"]),
+            ([3, 4], ["phone"]),
+            ([5, 6], ["website"]),
+            ([7, 8], ["name"]),
+        ])
+        self.assertTrue(all(0.88 <= g["score"] <= 1.0 for g in groups))
+        self.assertEqual((stats.contacts, stats.groups, stats.duplicates), (13, 4, 4))
+        self.assertGreater(stats.pairs, 4)      # the Liskovs and the switchboard were compared too
+
+    def test_apply_merges(self):
+        groups, _ = self.find()
+        self.assertEqual(dedupe.apply_merges(self.conn, self.cursor, [g["ids"] for g in groups]), (4, 4))
+        self.assertEqual(db.count_contacts(self.cursor), 9)
+        ada = db.get_contacts_by_ids(self.cursor, [1])[0]
+        self.assertEqual(ada[5], "Called and Emailed")
+        self.assertIn("Merged duplicate #2", ada[6])
+        hopper = db.get_contacts_by_ids(self.cursor, [5])[0]
+        self.assertEqual((hopper[2], hopper[4]), ("grace@navy.mil", "https://www.hopper.dev/"))
+        self.assertEqual(db.check_summaries(self.cursor), [])
+        self.assertTrue(db.ensure_unique_email_index(self.cursor))
+        self.assertEqual(self.find()[0], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
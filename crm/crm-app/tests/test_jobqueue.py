@@ -0,0 +1,79 @@
+# tests/test_jobqueue.py
+"""
+Resuming a job after the process running it died.
+"""
+
+import os, shutil, socket, subprocess, sys, tempfile, time, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import jobqueue  # noqa: E402
+
+processed = []
+
+
+@jobqueue.register("test-record")
+def record_worker(conn, job):
+    def process(items):
+        processed.extend(key for _, key, _, _ in items)
+        return [(item_id, None) for item_id, _, _, _ in items], None
+    return process
+
+
+def dead_pid():
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+class ResumeAfterCrash(unittest.TestCase):
+    def setUp(self):
+        processed.clear()
+        self.dir = tempfile.mkdtemp()
+        self.conn, self.cursor = db.connect_db(os.path.join(self.dir, "contacts.db"))
+        self.job_id = jobqueue.create_job(self.cursor, self.conn, "test-record", {"items_per_batch": 3},
+                                          items=[(k, None) for k in range(10)])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.dir)
+
+    def crash(self, owner, lease_until):
+        # as a run dies: 4 items done, a batch of 2 leased, its lease left on the job
+        with db.transaction(self.conn):
+            self.cursor.execute("UPDATE job_items SET state='done', attempts=1 WHERE job_id=? AND key IN "
+                                "('0', '1', '2', '3')", (self.job_id,))
+            self.cursor.execute("UPDATE job_items SET state='leased', attempts=1 WHERE job_id=? AND key IN "
+                                "('4', '5')", (self.job_id,))
+            self.cursor.execute("UPDATE jobs SET state='running', done=4, lease_owner=?, lease_until=? WHERE id=?",
+                                (owner, lease_until, self.job_id))
+
+    def check_resumed(self, job):
+        self.assertEqual(sorted(processed, key=int), [str(k) for k in range(4, 10)])
+        self.assertEqual((job.state, job.done, job.failed), ("done", 10, 0))
+        self.cursor.execute("SELECT lease_owner FROM jobs WHERE id=?", (self.job_id,))
+        self.assertIsNone(self.cursor.fetchone()[0])
+
+    @unittest.skipIf(os.name == "nt", "dead owners are only detected on POSIX")
+    def test_dead_owner_on_this_host(self):
+        self.crash(f"{socket.gethostname()}:{dead_pid()}", time.time() + 120)
+        self.check_resumed(jobqueue.run_job(self.conn, self.job_id))
+
+    def test_expired_lease(self):
+        self.crash("elsewhere:1", time.time() - 1)
+        self.check_resumed(jobqueue.run_job(self.conn, self.job_id))
+
+    def test_live_lease_elsewhere(self):
+        self.crash("elsewhere:1", time.time() + 120)
+        with self.assertRaisesRegex(jobqueue.JobBusy, "elsewhere:1"):
+            jobqueue.run_job(self.conn, self.job_id)
+        self.assertEqual(processed, [])
+
+    def test_live_owner_on_this_host(self):
+        self.crash(f"{socket.gethostname()}:{os.getppid()}", time.time() + 120)
+        with self.assertRaises(jobqueue.JobBusy):
+            jobqueue.run_job(self.conn, self.job_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
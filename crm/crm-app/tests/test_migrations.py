@@ -0,0 +1,98 @@
+# tests/test_migrations.py
+"""
+Upgrading old contacts.db files. Run from crm-app:
+
+    python3 -m unittest discover tests
+"""
+
+import os, sqlite3, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import dedupe  # noqa: E402
+
+# contacts as the first release wrote them: '' for no date, dates as typed
+BASELINE_CONTACTS = [
+    ("Ada", "ada@example.com", "", "", "Called", "", "2024-01-01 10:00:00", "", ""),
+    ("Bob", "bob@example.com", "", "", "Emailed", "", "2024-01-01 11:00:00", "", "3/4/2024"),
+    ("Cy", "cy@example.com", "", "", "Called and Emailed", "", "2024-01-02 09:00:00", "2024-01-05", " "),
+]
+
+
+class BaselineUpgrade(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT, website TEXT,
+                status TEXT, notes TEXT, date_added TEXT, date_called TEXT, date_emailed TEXT
+            )
+        """)
+        conn.executemany("""
+            INSERT INTO contacts (name, email, phone, website, status, notes, date_added, date_called, date_emailed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, BASELINE_CONTACTS)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def check_upgraded(self, cursor):
+        self.assertEqual(db.schema_version(cursor), db.SCHEMA_VERSION)
+        cursor.execute("SELECT id, date_called, date_emailed, touch_count, last_called, last_emailed "
+                       "FROM contacts ORDER BY id")
+        self.assertEqual(cursor.fetchall(), [
+            (1, None, None, 0, None, None),
+            (2, None, "2024-03-04", 1, None, "2024-03-04"),
+            (3, "2024-01-05", None, 1, "2024-01-05", None),
+        ])
+        cursor.execute("SELECT contact_id, ts, kind FROM interactions ORDER BY contact_id")
+        self.assertEqual(cursor.fetchall(), [(2, "2024-03-04", "email"), (3, "2024-01-05", "call")])
+        self.assertEqual(db.check_summaries(cursor), [])
+
+    def test_blank_dates_upgrade_to_latest(self):
+        conn, cursor = db.connect_db(self.path)
+        try:
+            self.check_upgraded(cursor)
+        finally:
+            conn.close()
+
+    def test_blank_history_from_version_7(self):
+        # files upgraded before blank dates were skipped hold call/email entries with ts ''
+        conn = sqlite3.connect(self.path)
+        cursor = conn.cursor()
+        db.migrate(conn, cursor, 7)
+        cursor.execute("INSERT INTO interactions (contact_id, ts, kind, detail) VALUES (1, '', 'call', NULL), "
+                       "(1, '', 'email', NULL)")
+        conn.commit()
+        conn.close()
+        conn, cursor = db.connect_db(self.path)
+        try:
+            self.check_upgraded(cursor)
+        finally:
+            conn.close()
+
+    def test_email_index_made_unique_after_merge(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE contacts SET email='ADA@example.com' WHERE id=2")
+        conn.commit()
+        conn.close()
+        with self.assertLogs("minicrm.db", "WARNING"):
+            conn, cursor = db.connect_db(self.path)
+        try:
+            self.assertFalse(db.ensure_unique_email_index(cursor))
+            self.assertEqual(dedupe.apply_merges(conn, cursor, [[1, 2]]), (1, 1))
+            self.assertTrue(db.ensure_unique_email_index(cursor))
+            with self.assertRaises(sqlite3.IntegrityError):
+                cursor.execute("UPDATE contacts SET email='ada@EXAMPLE.com' WHERE id=3")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+# tests/test_server.py
+"""
+server.py in-process on a free port, the event loop in a thread as in
+benchmark.run_server(), with one keep-alive client.
+"""
+
+import asyncio, http.client, json, os, shutil, sys, tempfile, threading, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+from server import APIServer  # noqa: E402
+
+N = 57
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "contacts.db")
+        self.conn, self.cursor = db.connect_db(self.path)
+        db.insert_contacts_many(self.cursor, self.conn, [
+            (f"Contact {i}", f"c{i}@example.com", "", "", "Not Contacted", "", "2024-01-01 09:00:00", None, None)
+            for i in range(N)])
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.api = APIServer(self.path, readers=2)
+        host, port = asyncio.run_coroutine_threadsafe(self.api.start("127.0.0.1", 0), self.loop).result()
+        self.client = http.client.HTTPConnection(host, port, timeout=10)
+
+    def tearDown(self):
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self.api.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.conn.close()
+        shutil.rmtree(self.dir)
+
+    def request(self, method, url, body=None, headers={}):
+        """-> (status, ETag or None, decoded JSON or None)"""
+        data = json.dumps(body).encode() if body is not None else None
+        self.client.request(method, url, data, headers)
+        response = self.client.getresponse()
+        payload = response.read()
+        return response.status, response.getheader("ETag"), json.loads(payload) if payload else None
+
+    def test_next_links_walk_every_page(self):
+        pages, url = [], "/contacts?limit=10"
+        while url:
+            status, _, payload = self.request("GET", url)
+            self.assertEqual(status, 200)
+            pages.append([c["id"] for c in payload["contacts"]])
+            url = payload["next"] and f"/contacts?limit=10&before={payload['next']}"
+
+        expected, before = [], None
+        while True:
+            ids = [row[0] for row in db.get_contacts_page(self.cursor, before, 10)]
+            expected.append(ids)
+            if len(ids) < 10:
+                break
+            before = ids[-1]
+        self.assertEqual(pages, expected)
+        self.assertEqual(sorted(sum(pages, [])), list(range(1, N + 1)))
+
+    def test_if_none_match_answers_304(self):
+        status, etag, _ = self.request("GET", "/contacts/3")
+        self.assertEqual(status, 200)
+        self.assertIsNotNone(etag)
+        status, again, payload = self.request("GET", "/contacts/3", headers={"If-None-Match": etag})
+        self.assertEqual((status, again, payload), (304, etag, None))
+        status, _, _ = self.request("GET", "/contacts/3", headers={"If-None-Match": '"elsewhere-1"'})
+        self.assertEqual(status, 200)
+
+    def test_etag_moves_with_a_write_from_another_connection(self):
+        _, etag, before = self.request("GET", "/contacts/5")
+        db.update_status_many(self.cursor, self.conn, [5], "Called")
+        status, moved, after = self.request("GET", "/contacts/5", headers={"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(moved, etag)
+        self.assertEqual((before["status"], after["status"]), ("Not Contacted", "Called"))
+
+    def test_duplicate_email_is_a_conflict(self):
+        status, _, created = self.request("POST", "/contacts", {"name": "New", "email": "new@example.com"})
+        self.assertEqual(status, 201)
+        status, _, payload = self.request("POST", "/contacts", {"name": "Again", "email": "c4@example.com"})
+        self.assertEqual(status, 409)
+        self.assertIn("error", payload)
+        self.assertEqual(db.count_contacts(self.cursor), N + 1)
+        self.assertEqual(self.request("GET", f"/contacts/{created['id']}")[2]["email"], "new@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# tests/test_shards.py
+"""
+A sharded copy of a database answers the db.py queries the way the file does.
+"""
+
+import os, shutil, sqlite3, sys, tempfile, unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+import shards  # noqa: E402
+
+STATUSES = ("Not Contacted", "Called", "Emailed", "Called and Emailed", None)
+NAMES = ("Ada Lovelace", "Alan Turing", "Grace Hopper", "Edsger Dijkstra", "Barbara Liskov")
+
+
+def contact(i):
+    return (f"{NAMES[i % 5]} {i}", f"user{i}@example.com", f"555-{i:04d}", "", STATUSES[i % 5], "",
+            f"2024-01-{i % 28 + 1:02d} 09:00:00", f"2024-02-{i % 28 + 1:02d}" if i % 3 == 0 else None, None)
+
+
+class ShardedQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        source = os.path.join(cls.dir, "contacts.db")
+        conn, cursor = db.connect_db(source)
+        db.insert_contacts_many(cursor, conn, [contact(i) for i in range(300)])
+        db.delete_contacts_many(cursor, conn, range(10, 40))     # gaps in the ids
+        conn.close()
+        shards.split(source, os.path.join(cls.dir, "contacts.shards"), 3, processes=0).close()
+        cls.plain = db.connect_db(source)
+        with mock.patch.object(db, "SHARDS_PATH", os.path.join(cls.dir, "contacts.shards")):
+            cls.sharded = db.connect_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.plain[0].close()
+        cls.sharded[0].close()
+        shutil.rmtree(cls.dir)
+
+    def both(self, name, *args):
+        return getattr(db, name)(self.plain[1], *args), getattr(db, name)(self.sharded[1], *args)
+
+    def test_routed_to_the_shards(self):
+        self.assertIsInstance(self.sharded[0].shards, shards.ShardedDB)
+        self.sharded[1].execute("SELECT COUNT(*) FROM contacts")
+        self.assertEqual(self.sharded[1].fetchone()[0], 0)     # the catalog itself holds none
+
+    def test_counts(self):
+        for name in ("count_contacts", "count_by_status", "check_summaries"):
+            plain, sharded = self.both(name)
+            self.assertEqual(plain, sharded, name)
+        plain, sharded = self.both("get_daily_activity", "2024-01-01", "2024-03-01")
+        self.assertEqual(plain, sharded)
+
+    def test_pages(self):
+        before = None
+        while True:
+            plain, sharded = self.both("get_contacts_page", before, 70)
+            self.assertEqual(plain, sharded)
+            if not plain:
+                break
+            before = plain[-1][0]
+        self.assertEqual(*self.both("get_contacts_page_above", 100, 50))
+        self.assertEqual(*self.both("list_contacts_page", None, 40, "Called"))
+        for offset in (0, 1, 99, 269, 270):
+            self.assertEqual(*self.both("get_contact_id_at", offset))
+
+    def test_search(self):
+        for text in ("grace", "ali", "555-01", "nobody"):
+            self.assertEqual(*self.both("count_search", text))
+            self.assertEqual(*self.both("search_contacts_page", text, None, 25))
+            self.assertEqual(*self.both("search_contacts_page", text, 200, 25))
+            self.assertEqual(*self.both("search_contact_id_at", text, 7))
+
+    def test_export_stream(self):
+        plain, sharded = self.both("stream_contacts", "Emailed")
+        self.assertEqual(list(plain), list(sharded))
+        self.assertEqual(list(db.stream_contacts(self.plain[1], after_id=250)),
+                         list(db.stream_contacts(self.sharded[1], after_id=250)))
+
+    def test_writes(self):
+        conn, cursor = self.sharded
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.insert_contact(cursor, conn, contact(5))     # its email is on another shard
+        cid = db.insert_contact(cursor, conn, contact(1000))
+        self.assertEqual(cid, 301)
+        self.assertEqual(db.get_contact_by_id(cursor, cid)[0], contact(1000)[0])
+        self.assertEqual(db.mark_emailed(cursor, conn, [cid, 2]), 2)
+        self.assertEqual([r[5] for r in db.get_contacts_by_ids(cursor, [2, cid])], ["Called and Emailed", "Emailed"])
+        self.assertEqual(db.delete_contacts_many(cursor, conn, [cid]), [cid])
+        self.assertEqual(db.check_summaries(cursor), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
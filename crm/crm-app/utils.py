@@ -20,5 +20,6 @@ def open_email_mac_mail(recipient, subject, body):
         except Exception as e:
             messagebox.showerror("Email Error", f"Could not open email client.\n{e}")
 
-def confirm_delete():
-    return messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this contact?")
+def confirm_delete(count=1):
+    what = "this contact" if count == 1 else f"these {count:,} contacts"
+    return messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {what}?")